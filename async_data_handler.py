@@ -0,0 +1,94 @@
+import asyncio
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+from data_handler import DataHandler
+
+class AsyncDataHandler:
+    """Awaitable facade over a DataHandler for asyncio services.
+
+    Every public DataHandler method is available as a coroutine of the same name
+    and arguments, e.g. await data.get_all_ingredients(), await data.search_recipes(
+    "choc") or await data.calculate_recipe_cost(name, items, save_recipe=True).
+    Calls run on a bounded thread pool, so storage reads and writes never block
+    the event loop, and the handler's own locking keeps them consistent.
+
+    Concurrent identical reads are coalesced: while one is running, the same call
+    made again awaits its result instead of loading anything twice. Those callers
+    share the returned objects, so treat them as read-only. A read made after a
+    write was started never joins a read made before it. Iterators, like those of
+    iter_ingredients, are drained into lists on the pool.
+
+    Results the handler keeps per thread, like recosted_recipes, and batch() blocks
+    only make sense within one thread, so use run() for such call sequences."""
+
+    MAX_WORKERS = 4
+
+    def __init__(self, data_handler: Optional[DataHandler] = None, max_workers: int = MAX_WORKERS):
+        self.data_handler = data_handler if data_handler is not None else DataHandler()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="data-handler")
+        # Writes started so far, and (writes, method, arguments) -> the read running for them
+        self._writes = 0
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+
+    def __getattr__(self, name: str) -> Callable:
+        """Return an awaitable version of a public DataHandler method"""
+        if name == "batch":
+            raise AttributeError("batch() must be opened on the thread using it; do so in a function passed to run()")
+        if name.startswith("_"):
+            raise AttributeError(f"{type(self).__name__} has no attribute {name!r}")
+        method = getattr(self.data_handler, name)
+        if not callable(method):
+            raise AttributeError(f"{name!r} is not a DataHandler method")
+
+        async def call(*args, **kwargs):
+            return await self._call(name, method, args, kwargs)
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        return call
+
+    async def run(self, function: Callable[[DataHandler], Any]) -> Any:
+        """Run function(data_handler) on the pool, for calls that belong together.
+
+            def import_all(data_handler):
+                with data_handler.batch():
+                    for ingredient in ingredients:
+                        data_handler.add_ingredient(ingredient)
+            await data.run(import_all)
+        """
+        self._writes += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(self._invoke, function, (self.data_handler,), {})
+        )
+
+    def close(self):
+        """Wait for running calls to finish and shut the pool down"""
+        self._executor.shutdown(wait=True)
+
+    async def _call(self, name: str, method: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        call = partial(self._invoke, method, args, kwargs)
+        if not getattr(method, "read_only", False):
+            # Anything but a plain read may change the data, so later reads start afresh
+            self._writes += 1
+            return await loop.run_in_executor(self._executor, call)
+
+        key = (self._writes, name, args, tuple(sorted(kwargs.items())))
+        try:
+            future = self._in_flight.get(key)
+        except TypeError:
+            # Unhashable arguments, e.g. lists, can't be matched with other calls
+            return await loop.run_in_executor(self._executor, call)
+        if future is None:
+            future = loop.run_in_executor(self._executor, call)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller giving up doesn't cancel the read for the others
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _invoke(function: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        result = function(*args, **kwargs)
+        # An iterator would read storage on the event loop as it is consumed
+        return list(result) if isinstance(result, Iterator) else result
@@ -0,0 +1,69 @@
+import math
+from typing import Dict, List, Optional
+from records import Ingredient
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; costing falls back to plain Python without it
+    np = None
+
+
+class IngredientColumns:
+    """Columnar copy of the ingredient catalog for vectorized costing.
+
+    Holds one NumPy float array per numeric field, aligned with table order,
+    plus an ID lookup that maps to row positions. Blank values are stored as
+    0.0 and values that aren't numbers as NaN."""
+    NUMERIC = ("price", "grams", "price_per_gram", "grams_needed", "cost_per_recipe")
+
+    def __init__(self, ingredients: List[Ingredient]):
+        self.records = list(ingredients)
+        count = len(self.records)
+        for attr in self.NUMERIC:
+            setattr(self, attr, np.fromiter(
+                (self._as_float(getattr(ingredient, attr)) for ingredient in self.records),
+                dtype=np.float64, count=count
+            ))
+        self.positions: Dict[int, int] = {}
+        # id() of each record object -> its position, to recognize the catalog's own records
+        self._record_positions: Dict[int, int] = {}
+        for position, ingredient in enumerate(self.records):
+            self.positions[ingredient.id] = position
+            self._record_positions[id(ingredient)] = position
+
+    @staticmethod
+    def _as_float(value) -> float:
+        if value is None:
+            return 0.0
+        return float(value) if isinstance(value, (int, float)) else float("nan")
+
+    def replace(self, ingredient: Ingredient) -> bool:
+        """Overwrite a row in place after an update; False if its ID isn't present"""
+        position = self.positions.get(ingredient.id)
+        if position is None:
+            return False
+        del self._record_positions[id(self.records[position])]
+        self.records[position] = ingredient
+        self._record_positions[id(ingredient)] = position
+        for attr in self.NUMERIC:
+            getattr(self, attr)[position] = self._as_float(getattr(ingredient, attr))
+        return True
+
+    def row_positions(self, ingredients: List) -> Optional[List[int]]:
+        """Return the row positions of ingredients if all of them are catalog records, else None.
+
+        Only the catalog's own record objects count, so the columns are known to
+        hold exactly their values."""
+        # The records list keeps every indexed object alive, so their id()s stay unique
+        positions = list(map(self._record_positions.get, map(id, ingredients)))
+        return None if None in positions else positions
+
+    def total_cost(self, positions: List[int]) -> Optional[float]:
+        """Sum Cost per Recipe over the given rows, or None if any of them isn't numeric.
+
+        Adds left to right, as the plain-Python path does, so results round
+        identically; np.sum would add pairwise."""
+        if not positions:
+            return 0.0
+        total = float(np.cumsum(self.cost_per_recipe[positions])[-1])
+        return None if math.isnan(total) else total
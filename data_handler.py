@@ -1,278 +1,1447 @@
 import csv
-import os
-from typing import List, Dict, Optional
+import math
+import threading
+from bisect import bisect_left, insort
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from itertools import chain, islice
+from typing import Callable, Iterator, List, Dict, Optional, Sequence, TextIO, Tuple, Hashable, Set, Union
+from columnar import IngredientColumns, np
+from records import Record, Ingredient, Recipe, RecipeLine, RECORD_TYPES, number
+from search_index import TrigramIndex
+from locking import ReadWriteLock
+from storage import CsvStorage, RECIPE_FIELDS
+
+def _reads(method):
+    """Run a DataHandler method holding its lock shared with other readers"""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock.reading():
+            return method(self, *args, **kwargs)
+    # Tells callers like AsyncDataHandler that concurrent identical calls may share a result
+    locked.read_only = True
+    return locked
+
+def _streams(method):
+    """Run a DataHandler method returning an iterator, whose items are then produced
+    holding the lock shared with other readers, from the first item until the iterator
+    is exhausted or closed"""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock.reading():
+            items = method(self, *args, **kwargs)
+        return self._read_locked(items)
+    locked.read_only = True
+    return locked
+
+def _writes(method):
+    """Run a DataHandler method holding its lock, and the storage's, exclusively"""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._writing():
+            return method(self, *args, **kwargs)
+    return locked
 
 class DataHandler:
-    def __init__(self):
-        self.ingredients_file = "ingredients.csv"
-        self.recipes_file = "recipes.csv"
-        self._ensure_files_exist()
-    
-    def _ensure_files_exist(self):
-        """Create CSV files with headers if they don't exist"""
-        # Ingredients file
-        if not os.path.exists(self.ingredients_file):
-            with open(self.ingredients_file, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow([
-                    "Ingredient Name", "Price", "Grams", "Price per Gram", 
-                    "Grams Needed in Recipe", "Cost per Recipe"
-                ])
-        
-        # Recipes file
-        if not os.path.exists(self.recipes_file):
-            with open(self.recipes_file, 'w', newline='', encoding='utf-8') as file:
+    """Reads and writes the ingredient and recipe tables through a storage engine.
+    
+    One handler may be shared by many threads: reads run side by side on the cached
+    tables while writes, and whole batch() blocks, run one at a time with no reads
+    in between, so a reader never sees half a change and writes never interleave.
+    Writes also hold the storage's file lock, so handlers in other processes sharing
+    the files take turns with them, and each write starts from the stored rows."""
+    
+    def __init__(self, storage=None):
+        # Storage engine persisting the tables; CSV files unless e.g. a SqliteStorage is given
+        self.storage = storage if storage is not None else CsvStorage()
+        # Loaded rows per table: storage signature at load time and the records keyed by ID,
+        # in table order
+        self._cache: Dict[str, Tuple[Hashable, Dict[int, Record]]] = {}
+        # Next free ID per loaded table, past any row ever deleted from it
+        self._next_ids: Dict[str, int] = {}
+        # Open batch() blocks, the changes buffered by them and the tables they pinned
+        self._batch_depth = 0
+        self._batch_changes: List[tuple] = []
+        self._batch_tables: Set[str] = set()
+        # Each index below is published as one tuple together with the table it was built
+        # from, so a reader never sees one half-built by another reader.
+        # Per named table: the rows indexed and normalized name -> rows with that name
+        self._name_indexes: Dict[str, Tuple[Dict[int, Record], Dict[str, List[Record]]]] = {}
+        # The ingredients table and its columnar arrays when NumPy is available
+        self._columns: Tuple[Optional[Dict[int, Ingredient]], Optional[IngredientColumns]] = (None, None)
+        # The lines table, recipe ID -> its recipe lines, ingredient ID -> the lines using
+        # it and sub-recipe ID -> the lines using it
+        self._lines_indexes: Tuple[Optional[Dict[int, RecipeLine]], Dict[int, List[RecipeLine]],
+                                   Dict[int, List[RecipeLine]], Dict[int, List[RecipeLine]]] = (None, {}, {}, {})
+        # Per table: the rows indexed and column -> (rank, value, ID) entries sorted by it
+        self._sorted_indexes: Dict[str, Tuple[Dict[int, Record], Dict[str, List[tuple]]]] = {}
+        # Per named table: the rows indexed and the trigram index of their names
+        self._trigram_indexes: Dict[str, Tuple[Dict[int, Record], TrigramIndex]] = {}
+        # Changes made per table through this handler, and per table the last name search:
+        # (rows, version, sort key, descending), the query and its matches
+        self._table_versions: Dict[str, int] = {}
+        self._name_searches: Dict[str, tuple] = {}
+        # Per table: (rows, version, sort key, descending) and record ID -> position in that order
+        self._query_orders: Dict[str, Tuple[Dict[int, Record], tuple, Dict[int, int]]] = {}
+        # Shared by reads, held alone by writes; results meant for the calling thread only
+        self._lock = ReadWriteLock()
+        self._thread_state = threading.local()
+    
+    @property
+    def recosted_recipes(self) -> List[Recipe]:
+        """Recipes recosted by this thread's last ingredient update or price list import"""
+        return getattr(self._thread_state, "recosted_recipes", [])
+    
+    @recosted_recipes.setter
+    def recosted_recipes(self, recipes: List[Recipe]):
+        self._thread_state.recosted_recipes = recipes
+    
+    @property
+    def uncosted_recipes(self) -> List[Recipe]:
+        """Recipes this thread's last recost had to leave stale, as they use an ingredient
+        or sub-recipe that no longer exists"""
+        return getattr(self._thread_state, "uncosted_recipes", [])
+    
+    @uncosted_recipes.setter
+    def uncosted_recipes(self, recipes: List[Recipe]):
+        self._thread_state.uncosted_recipes = recipes
+    
+    @contextmanager
+    def _writing(self):
+        """Hold the handler's lock exclusively and the storage's lock against other processes.
+        
+        Tables changed by another process while the lock was free are reloaded by
+        their next _load_table, so the write builds on what is stored."""
+        with self._lock.writing(), self.storage.locked():
+            yield
+    
+    def close(self):
+        """Close the storage once pending calls finish, e.g. folding CSV journals into
+        their files; the handler isn't used afterwards"""
+        # Not the storage lock too: a background compaction needs it to finish
+        with self._lock.writing():
+            self.storage.close()
+    
+    def data_version(self) -> Hashable:
+        """Return a token that changes whenever any process writes the data, cheap enough
+        to poll so views refresh only when something changed"""
+        return self.storage.version()
+    
+    # ===== CACHE =====
+    
+    def _load_table(self, table: str) -> Dict[int, Record]:
+        """Return the cached records of a table keyed by ID, reloading them only if storage changed"""
+        if self._batch_depth:
+            # Inside a batch the cached rows hold unwritten changes and must not be reloaded
+            if table in self._batch_tables:
+                return self._cache[table][1]
+            self._batch_tables.add(table)
+        signature = self.storage.signature(table)
+        cached = self._cache.get(table)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        # Parse every value once here rather than on each use
+        from_row = RECORD_TYPES[table].from_row
+        rows = {}
+        for row in self.storage.load(table):
+            record = from_row(row)
+            rows[record.id] = record
+        self._cache[table] = (signature, rows)
+        # Deleted IDs stay retired, so lines or exports naming them never match a new row
+        self._next_ids[table] = max(max(rows, default=0) + 1, self.storage.next_id(table))
+        return rows
+    
+    def _commit_cache(self, table: str, rows: Optional[Dict[int, Record]]):
+        """Record rows as the cached state of a table that was just written.
+        
+        Passing None drops the cache entry so the next read reloads the table."""
+        if rows is None:
+            self._cache.pop(table, None)
+            return
+        self._cache[table] = (self.storage.signature(table), rows)
+    
+    def _append_row(self, table: str, row: Record) -> int:
+        """Give a record a new ID and append it to the cached table and to storage"""
+        rows = self._load_table(table)
+        row_id = self._next_ids[table]
+        self._next_ids[table] = row_id + 1
+        row.id = row_id
+        if self._batch_depth:
+            rows[row_id] = row
+            self._reindex(table, rows, added=[row])
+            self._batch_changes.append(("append", table, row.to_row()))
+            return row_id
+        try:
+            self.storage.append_row(table, row.to_row())
+            rows[row_id] = row
+            self._reindex(table, rows, added=[row])
+            self._commit_cache(table, rows)
+        except Exception:
+            self._commit_cache(table, None)
+            raise
+        return row_id
+    
+    def _update_row(self, table: str, row_id: int, row: Record):
+        """Replace the record with the given ID in the cached table and in storage"""
+        rows = self._load_table(table)
+        row.id = row_id
+        self._reindex(table, rows, added=[row], removed=[rows[row_id]])
+        rows[row_id] = row
+        if self._batch_depth:
+            self._batch_changes.append(("update", table, row.to_row()))
+            return
+        try:
+            self.storage.update_row(table, row.to_row())
+            self._commit_cache(table, rows)
+        except Exception:
+            self._commit_cache(table, None)
+            raise
+    
+    def _delete_rows(self, table: str, row_ids: List[int]):
+        """Remove the rows with the given IDs from the cached table and from storage"""
+        rows = self._load_table(table)
+        self._reindex(table, rows, removed=[rows.pop(row_id) for row_id in row_ids])
+        if self._batch_depth:
+            self._batch_changes.append(("delete", table, list(row_ids)))
+            return
+        try:
+            self.storage.delete_rows(table, list(row_ids))
+            self._commit_cache(table, rows)
+        except Exception:
+            self._commit_cache(table, None)
+            raise
+    
+    def _id_at(self, table: str, index: int) -> Optional[int]:
+        """Return the ID of the row at a position in table order, for index-based callers"""
+        rows = self._load_table(table)
+        if 0 <= index < len(rows):
+            return next(islice(rows, index, None))
+        return None
+    
+    @_reads
+    def table_version(self, table: str) -> Hashable:
+        """Return a token that changes whenever a table changes, through this handler or
+        in storage, so views can skip refreshing when nothing changed"""
+        return (self.storage.signature(table), self._table_versions.get(table, 0))
+    
+    # ===== NAME INDEX =====
+    
+    @staticmethod
+    def _normalize_name(name: str) -> str:
+        """Normalize a name for lookups: case-insensitive, whitespace collapsed"""
+        return " ".join(str(name).split()).casefold()
+    
+    def _name_index(self, table: str) -> Dict[str, List[Record]]:
+        """Return the ingredient or recipe name index, rebuilding it only if the table
+        was reloaded"""
+        rows = self._load_table(table)
+        cached = self._name_indexes.get(table)
+        if cached is None or cached[0] is not rows:
+            index = {}
+            for row in rows.values():
+                index.setdefault(self._normalize_name(row.name), []).append(row)
+            cached = (rows, index)
+            self._name_indexes[table] = cached
+        return cached[1]
+    
+    def _ingredient_name_index(self) -> Dict[str, List[Ingredient]]:
+        """Return the ingredient name index"""
+        return self._name_index("ingredients")
+    
+    def _reindex(self, table: str, rows: Dict[int, Record],
+                 added: List[Record] = (), removed: List[Record] = ()):
+        """Keep the name and trigram indexes, ingredient columns, sorted indexes and recipe
+        lines index in step with rows being added to or removed from a table"""
+        self._table_versions[table] = self._table_versions.get(table, 0) + 1
+        self._reindex_sorted(table, rows, added, removed)
+        cached = self._trigram_indexes.get(table)
+        if cached is not None and cached[0] is rows:
+            for row in removed:
+                cached[1].remove(row)
+            for row in added:
+                cached[1].add(row)
+        if table == "recipe_lines":
+            self._reindex_lines(rows, added, removed)
+            return
+        # Writes run alone, so the indexes may be changed in place here
+        columns_rows, columns = self._columns
+        if table == "ingredients" and rows is columns_rows:
+            # An in-place update keeps its row; any other change rebuilds the columns on use
+            if not (len(added) == len(removed) == 1 and added[0].id == removed[0].id
+                    and columns.replace(added[0])):
+                self._columns = (None, None)
+        cached = self._name_indexes.get(table)
+        if cached is None or cached[0] is not rows:
+            # Not indexed yet, or indexed for a stale table that will be rebuilt on use
+            return
+        index = cached[1]
+        for row in removed:
+            key = self._normalize_name(row.name)
+            matches = [other for other in index.get(key, []) if other is not row]
+            if matches:
+                index[key] = matches
+            else:
+                index.pop(key, None)
+        for row in added:
+            index.setdefault(self._normalize_name(row.name), []).append(row)
+    
+    def _trigram_index(self, table: str) -> TrigramIndex:
+        """Return the trigram index of the ingredient or recipe names, rebuilding it only
+        if the table was reloaded"""
+        rows = self._load_table(table)
+        cached = self._trigram_indexes.get(table)
+        if cached is None or cached[0] is not rows:
+            cached = (rows, TrigramIndex(rows.values(), self._normalize_name))
+            self._trigram_indexes[table] = cached
+        return cached[1]
+    
+    def _ingredient_columns(self) -> Optional[IngredientColumns]:
+        """Return the columnar ingredient table, or None without NumPy; rebuilt only
+        after the table was reloaded or gained or lost rows"""
+        if np is None:
+            return None
+        rows = self._load_table("ingredients")
+        columns_rows, columns = self._columns
+        if rows is not columns_rows:
+            columns = IngredientColumns(list(rows.values()))
+            self._columns = (rows, columns)
+        return columns
+    
+    @_reads
+    def ingredient_exists(self, name: str) -> bool:
+        """Return True if an ingredient with this name exists (ignoring case and spacing)"""
+        return self.get_ingredient_by_name(name) is not None
+    
+    @_reads
+    def get_ingredient_by_name(self, name: str) -> Optional[Ingredient]:
+        """Return the first ingredient with this name (ignoring case and spacing), or None"""
+        try:
+            matches = self._ingredient_name_index().get(self._normalize_name(name))
+        except Exception as e:
+            print(f"Error reading ingredients: {e}")
+            return None
+        return matches[0] if matches else None
+    
+    # ===== RECIPE LINES =====
+    
+    def _recipe_lines_indexes(self) -> tuple:
+        """Return the lines table with its recipe, ingredient and sub-recipe indexes,
+        rebuilding them only if the table was reloaded"""
+        rows = self._load_table("recipe_lines")
+        indexes = self._lines_indexes
+        if rows is not indexes[0]:
+            indexes = (rows, {}, {}, {})
+            self._file_lines(indexes, added=rows.values())
+            self._lines_indexes = indexes
+        return indexes
+    
+    def _recipe_lines_index(self) -> Dict[int, List[RecipeLine]]:
+        """Return the recipe ID -> lines index"""
+        return self._recipe_lines_indexes()[1]
+    
+    def _ingredient_lines(self, ingredient_id: int) -> List[RecipeLine]:
+        """Return the recipe lines that use an ingredient, via the reverse index"""
+        return self._recipe_lines_indexes()[2].get(ingredient_id, [])
+    
+    def _sub_recipe_lines(self, recipe_id: int) -> List[RecipeLine]:
+        """Return the recipe lines that use a recipe as a sub-recipe, via the reverse index"""
+        return self._recipe_lines_indexes()[3].get(recipe_id, [])
+    
+    @staticmethod
+    def _line_keys(indexes: tuple, line: RecipeLine) -> List[Tuple[Dict[int, List[RecipeLine]], int]]:
+        """Return the (index, key) pairs a line is filed under"""
+        keys = [(indexes[1], line.recipe_id)]
+        if line.ingredient_id is not None:
+            keys.append((indexes[2], line.ingredient_id))
+        if line.sub_recipe_id is not None:
+            keys.append((indexes[3], line.sub_recipe_id))
+        return keys
+    
+    def _reindex_lines(self, rows: Dict[int, RecipeLine],
+                       added: List[RecipeLine] = (), removed: List[RecipeLine] = ()):
+        if rows is self._lines_indexes[0]:
+            self._file_lines(self._lines_indexes, added, removed)
+    
+    def _file_lines(self, indexes: tuple, added: List[RecipeLine] = (), removed: List[RecipeLine] = ()):
+        """File added lines into the indexes and take removed ones out"""
+        for line in removed:
+            for index, key in self._line_keys(indexes, line):
+                others = [other for other in index.get(key, []) if other is not line]
+                if others:
+                    index[key] = others
+                else:
+                    index.pop(key, None)
+        for line in added:
+            for index, key in self._line_keys(indexes, line):
+                index.setdefault(key, []).append(line)
+    
+    @_reads
+    def get_recipe_lines(self, recipe_id: int) -> List[RecipeLine]:
+        """Return the ingredient lines (ingredient ID and grams) of a recipe"""
+        try:
+            return list(self._recipe_lines_index().get(int(recipe_id), []))
+        except Exception as e:
+            print(f"Error reading recipe lines: {e}")
+            return []
+    
+    def _add_recipe_lines(self, recipe_id: int, ingredients_used: List[Dict[str, str]]):
+        """Record a line per catalog ingredient of a recipe, with the grams it uses, and
+        per sub-recipe, with the quantity it uses"""
+        ingredients = self._load_table("ingredients")
+        for ingredient in ingredients_used:
+            if "Sub-Recipe ID" in ingredient:
+                sub_recipe_id = int(ingredient["Sub-Recipe ID"])
+                if sub_recipe_id == recipe_id or recipe_id in self._sub_recipe_closure([sub_recipe_id]):
+                    raise ValueError(f"'{ingredient.get('Ingredient Name', '')}' already uses this recipe")
+                self._append_row("recipe_lines", RecipeLine(
+                    recipe_id=recipe_id,
+                    sub_recipe_id=sub_recipe_id,
+                    quantity=self._line_amount(ingredient, "Quantity", 1.0)
+                ))
+                continue
+            # The catalog gives the ID; the grams are those the recipe was costed with
+            match = ingredient
+            if not (isinstance(match, Ingredient) and ingredients.get(match.id) is match):
+                match = self.get_ingredient_by_name(ingredient.get("Ingredient Name", ""))
+            if match is not None:
+                self._append_row("recipe_lines", RecipeLine(
+                    recipe_id=recipe_id,
+                    ingredient_id=match.id,
+                    grams=self._line_amount(ingredient, "Grams Needed in Recipe")
+                ))
+    
+    @staticmethod
+    def _line_amount(ingredient: Dict[str, str], field: str, default: float = 0.0) -> float:
+        """Return the grams or quantity a recipe line uses, raising ValueError unless above 0"""
+        amount = number(ingredient, field, default)
+        if not amount > 0:
+            raise ValueError(f"'{ingredient.get('Ingredient Name', '')}' needs a {field} above 0")
+        return amount
+    
+    def _delete_recipe_lines(self, recipe_ids: List[int]):
+        """Remove the lines of the given recipes"""
+        index = self._recipe_lines_index()
+        line_ids = [line.id for recipe_id in recipe_ids for line in index.get(recipe_id, [])]
+        if line_ids:
+            self._delete_rows("recipe_lines", line_ids)
+    
+    # ===== SUB-RECIPES AND RECOSTING =====
+    
+    @_reads
+    def sub_recipe_item(self, recipe_id: int, quantity: float = 1.0) -> Optional[Dict[str, str]]:
+        """Return an ingredients_used entry for quantity batches of a saved recipe, or None.
+        
+        Passing it to calculate_recipe_cost or calculate_many makes the recipe a
+        sub-recipe: its Total Ingredient Cost counts towards the new recipe and
+        later changes to it roll up into the new recipe's costs."""
+        recipe = self._load_table("recipes").get(int(recipe_id))
+        if recipe is None:
+            return None
+        return {
+            "Ingredient Name": recipe.name,
+            "Sub-Recipe ID": str(recipe.id),
+            "Quantity": str(quantity),
+            "Cost per Recipe": str(self._sub_recipe_cost(number(recipe, "Total Ingredient Cost"), quantity))
+        }
+    
+    @staticmethod
+    def _sub_recipe_cost(total_ingredient_cost: float, quantity) -> float:
+        """Cost of using quantity batches of a sub-recipe, rounded like Cost per Recipe"""
+        return round(round(total_ingredient_cost, 2) * (quantity or 0), 2)
+    
+    def _sub_recipe_closure(self, recipe_ids: List[int]) -> Set[int]:
+        """Return the given recipes and every recipe they use, directly or indirectly"""
+        index = self._recipe_lines_index()
+        seen: Set[int] = set()
+        pending = list(recipe_ids)
+        while pending:
+            recipe_id = pending.pop()
+            if recipe_id not in seen:
+                seen.add(recipe_id)
+                pending.extend(line.sub_recipe_id for line in index.get(recipe_id, [])
+                               if line.sub_recipe_id is not None)
+        return seen
+    
+    def _dependent_closure(self, recipe_ids: Set[int]) -> Set[int]:
+        """Return the given recipes and every recipe using them, directly or indirectly"""
+        seen: Set[int] = set()
+        pending = list(recipe_ids)
+        while pending:
+            recipe_id = pending.pop()
+            if recipe_id not in seen:
+                seen.add(recipe_id)
+                pending.extend(line.recipe_id for line in self._sub_recipe_lines(recipe_id))
+        return seen
+    
+    def _rollup(self, dirty: Set[int]) -> Dict[int, Optional[float]]:
+        """Evaluate the total ingredient cost of the dirty recipes over the sub-recipe DAG.
+        
+        Each dirty recipe is computed once and memoized, so shared sub-recipes aren't
+        re-walked; clean sub-recipes contribute their stored Total Ingredient Cost. A
+        recipe using an ingredient or sub-recipe that no longer exists maps to None.
+        Raises ValueError if the recipes use each other in a cycle."""
+        recipes = self._load_table("recipes")
+        ingredients = self._load_table("ingredients")
+        index = self._recipe_lines_index()
+        memo: Dict[int, Optional[float]] = {}
+        in_progress: Set[int] = set()
+        
+        def cost(recipe_id: int) -> Optional[float]:
+            if recipe_id in memo:
+                return memo[recipe_id]
+            if recipe_id not in dirty:
+                recipe = recipes.get(recipe_id)
+                value = recipe.total_ingredient_cost if recipe is not None else None
+                return value if isinstance(value, float) else None
+            if recipe_id in in_progress:
+                raise ValueError(f"Recipe '{recipes[recipe_id].name}' uses itself through its sub-recipes")
+            in_progress.add(recipe_id)
+            total = 0
+            for line in index.get(recipe_id, []):
+                if line.sub_recipe_id is not None:
+                    sub_total = cost(line.sub_recipe_id)
+                    if sub_total is None:
+                        total = None
+                        break
+                    total += self._sub_recipe_cost(sub_total, line.quantity)
+                elif line.ingredient_id in ingredients:
+                    total += self._line_cost(ingredients[line.ingredient_id], line.grams)
+                else:
+                    total = None
+                    break
+            in_progress.discard(recipe_id)
+            memo[recipe_id] = total
+            return total
+        
+        for recipe_id in dirty:
+            if recipe_id in recipes:
+                cost(recipe_id)
+        return memo
+    
+    def _recost(self, recipe_ids: Set[int]) -> List[Recipe]:
+        """Recompute and persist recipes and everything using them as a sub-recipe.
+        
+        Only that dirty subtree is evaluated; each recipe keeps its stored Margin
+        Percentage (150% if it has none). Recipes that can't be costed are left alone
+        and reported in uncosted_recipes. Returns the recipes whose costs changed, in
+        ID order."""
+        dirty = self._dependent_closure(set(recipe_ids))
+        totals = self._rollup(dirty)
+        recipes = self._load_table("recipes")
+        changed = []
+        uncosted = [recipes[recipe_id] for recipe_id in sorted(totals) if totals[recipe_id] is None]
+        self.uncosted_recipes = uncosted
+        if uncosted:
+            print(f"Error recosting {', '.join(recipe.name for recipe in uncosted)}: "
+                  f"they use an ingredient or sub-recipe that no longer exists")
+        with self.batch():
+            for recipe_id in sorted(totals):
+                total_ingredient_cost = totals[recipe_id]
+                if total_ingredient_cost is None:
+                    continue
+                recipe = recipes[recipe_id]
+                margin_percentage = recipe.margin_percentage
+                if not isinstance(margin_percentage, float):
+                    margin_percentage = 150.0
+                row = self._recipe_row(
+                    {"Recipe Name": recipe.name, "Ingredients Used": recipe.ingredients_used},
+                    self._cost_breakdown(total_ingredient_cost, margin_percentage)
+                )
+                # Keep the stored margin as it was, even when blank
+                row.margin_percentage = recipe.margin_percentage
+                row.id = recipe_id
+                if row.to_row() != recipe.to_row():
+                    self._update_row("recipes", recipe_id, row)
+                    changed.append(row)
+        return changed
+    
+    # ===== BATCHES =====
+    
+    @contextmanager
+    def batch(self):
+        """Buffer add/update/delete calls and write them out together when the block exits.
+        
+        Each table touched in the block is persisted once (one atomic rewrite of a
+        CSV file, or one SQLite transaction) instead of once per row. If the block
+        raises, the buffered changes are discarded. Nested blocks join the outermost one.
+        
+            with data_handler.batch():
+                for ingredient in price_list:
+                    data_handler.add_ingredient(ingredient)
+        
+        Other threads wait for the block to finish before reading or writing, and
+        other processes before writing.
+        """
+        with self._writing():
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._end_batch(commit=False)
+                raise
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._end_batch(commit=True)
+    
+    def _end_batch(self, commit: bool):
+        """Write out or discard the changes buffered by the outermost batch"""
+        changes = self._batch_changes
+        self._batch_changes = []
+        self._batch_tables = set()
+        dirty = {change[1] for change in changes}
+        if not commit:
+            for table in dirty:
+                self._commit_cache(table, None)
+            return
+        if not changes:
+            return
+        
+        tables = {table: self._cache[table][1] for table in dirty}
+        try:
+            self.storage.commit_batch(changes, {
+                table: [row.to_row() for row in rows.values()] for table, rows in tables.items()
+            })
+        except Exception:
+            for table in dirty:
+                self._commit_cache(table, None)
+            raise
+        for table, rows in tables.items():
+            self._commit_cache(table, rows)
+    
+    # ===== STREAMING READS =====
+    
+    @_streams
+    def iter_ingredients(self, fields: Optional[Sequence[str]] = None,
+                         where: Optional[Callable[[Ingredient], bool]] = None) -> Iterator:
+        """Yield ingredients one at a time instead of building the full list.
+        
+        where is applied to each ingredient as it is read, and fields projects the
+        ones kept to tuples of those columns' values, e.g. ("Ingredient Name", "Price").
+        A loaded, current table is read from the cache; otherwise storage is streamed
+        without loading the table, so memory stays flat however large it is.
+        
+        The read lock is held from the first ingredient until the iterator is exhausted
+        or closed, so no write lands mid-stream and writes wait for it meanwhile. Consume
+        it promptly on one thread, and don't write from that thread until it's done."""
+        return self._iter_table("ingredients", fields, where)
+    
+    @_streams
+    def iter_recipes(self, fields: Optional[Sequence[str]] = None,
+                     where: Optional[Callable[[Recipe], bool]] = None) -> Iterator:
+        """Yield recipes one at a time; fields, where and locking work as for iter_ingredients"""
+        return self._iter_table("recipes", fields, where)
+    
+    def _read_locked(self, items: Iterator) -> Iterator:
+        """Yield from items holding the lock shared with other readers"""
+        with self._lock.reading():
+            yield from items
+    
+    def _iter_table(self, table: str, fields: Optional[Sequence[str]],
+                    where: Optional[Callable[[Record], bool]]) -> Iterator:
+        record_type = RECORD_TYPES[table]
+        # Resolve the projection up front so an unknown column fails here, not mid-stream
+        attrs = None if fields is None else [record_type._COLUMNS[field][0] for field in fields]
+        rows = self._current_rows(table)
+        if rows is not None:
+            # A snapshot of the cached records, so changes made while iterating are safe
+            records = iter(list(rows.values()))
+        else:
+            records = map(record_type.from_row, self.storage.iter_rows(table))
+        if where is not None:
+            records = filter(where, records)
+        if attrs is not None:
+            records = (tuple(getattr(record, attr) for attr in attrs) for record in records)
+        return records
+    
+    def _current_rows(self, table: str) -> Optional[Dict[int, Record]]:
+        """Return the cached records of a table if they're current, without loading it"""
+        if self._batch_depth and table in self._batch_tables:
+            return self._cache[table][1]
+        cached = self._cache.get(table)
+        if cached is not None and cached[0] == self.storage.signature(table):
+            return cached[1]
+        return None
+    
+    @_reads
+    def count_ingredients(self, where: Optional[Callable[[Ingredient], bool]] = None) -> int:
+        """Count ingredients, optionally only those matching where, without listing them"""
+        return self._count_table("ingredients", where)
+    
+    @_reads
+    def count_recipes(self, where: Optional[Callable[[Recipe], bool]] = None) -> int:
+        """Count recipes, optionally only those matching where, without listing them"""
+        return self._count_table("recipes", where)
+    
+    def _count_table(self, table: str, where: Optional[Callable[[Record], bool]]) -> int:
+        try:
+            rows = self._current_rows(table)
+            if rows is not None and where is None:
+                return len(rows)
+            return sum(1 for _ in self._iter_table(table, (), where))
+        except Exception as e:
+            print(f"Error counting {table}: {e}")
+            return 0
+    
+    @_reads
+    def export_ingredients(self, filename: Union[str, TextIO] = "ingredients_export.csv",
+                           where: Optional[Callable[[Ingredient], bool]] = None) -> bool:
+        """Export the ingredients, or those matching where, to a CSV file or an open text file"""
+        return self._export_table("ingredients", filename, where)
+    
+    @_reads
+    def export_recipes(self, filename: Union[str, TextIO] = "recipes_export.csv",
+                       where: Optional[Callable[[Recipe], bool]] = None) -> bool:
+        """Export the recipes, or those matching where, to a CSV file or an open text file"""
+        return self._export_table("recipes", filename, where)
+    
+    def _export_table(self, table: str, filename: Union[str, TextIO],
+                      where: Optional[Callable[[Record], bool]]) -> bool:
+        """Write a table to CSV row by row as it is streamed"""
+        try:
+            # An open file, e.g. stdout, is written to and left open
+            target = nullcontext(filename) if hasattr(filename, "write") else open(
+                filename, 'w', newline='', encoding='utf-8')
+            with target as file:
                 writer = csv.writer(file)
-                # Include Margin Percentage so saved recipes record the Target Margin used
-                writer.writerow([
-                    "Recipe Name", "Total Ingredient Cost", "Miscellaneous Cost (50%)",
-                    "Labor Cost (45%)", "Total Cost", "Suggested Selling Price",
-                    "Margin Percentage", "Profit", "Ingredients Used"
-                ])
+                writer.writerow([header for header, _, _ in RECORD_TYPES[table].FIELDS])
+                for record in self._iter_table(table, None, where):
+                    writer.writerow(record.to_row().values())
+            return True
+        except Exception as e:
+            print(f"Error exporting {table}: {e}")
+            return False
     
-    # ===== INGREDIENTS MANAGEMENT =====
+    # ===== PAGED QUERIES =====
     
-    def add_ingredient(self, ingredient_data: Dict[str, str]) -> bool:
-        """Add a new ingredient to the CSV file"""
+    # sort_key ranking a name search by relevance, misspellings included, instead of by a column
+    BEST_MATCH = "Best Match"
+    
+    @_reads
+    def query_ingredients(self, filter=None, sort_key: Optional[str] = None, offset: int = 0,
+                          limit: Optional[int] = 50, descending: bool = False) -> Tuple[List[Ingredient], int]:
+        """Return one page of ingredients and the total number of matches.
+        
+        filter is a name search string or a predicate on an ingredient. sort_key is a
+        column such as "Price per Gram" or "Cost per Recipe", or None for table order;
+        blank and non-numeric values sort last in either direction. Sorted pages are
+        read from a cached index per column, kept in step as ingredients change.
+        With a search string, sort_key BEST_MATCH orders the matches by relevance and
+        adds close misspellings of the name."""
+        return self._query("ingredients", filter, sort_key, offset, limit, descending)
+    
+    @_reads
+    def query_recipes(self, filter=None, sort_key: Optional[str] = None, offset: int = 0,
+                      limit: Optional[int] = 50, descending: bool = False) -> Tuple[List[Recipe], int]:
+        """Return one page of recipes and the total number of matches, e.g. sorted by
+        "Total Cost" or "Profit"; arguments work as for query_ingredients"""
+        return self._query("recipes", filter, sort_key, offset, limit, descending)
+    
+    def _query(self, table: str, filter, sort_key: Optional[str], offset: int,
+               limit: Optional[int], descending: bool) -> Tuple[List[Record], int]:
         try:
-            # Calculate price per gram
-            price = float(ingredient_data.get("Price", 0))
-            grams = float(ingredient_data.get("Grams", 0))
-            price_per_gram = price / grams if grams > 0 else 0
-            
-            # Calculate cost per recipe
-            grams_needed = float(ingredient_data.get("Grams Needed in Recipe", 0))
-            cost_per_recipe = price_per_gram * grams_needed
+            rows = self._load_table(table)
+            if sort_key == self.BEST_MATCH and not (isinstance(filter, str) and filter.strip()):
+                # Nothing to rank by without a search
+                sort_key = None
+            if sort_key in (None, self.BEST_MATCH):
+                records = reversed(rows.values()) if descending else iter(rows.values())
+            else:
+                index = self._sorted_index(table, sort_key)
+                # Entries with a value come before the (1, ...) entries of blanks
+                present = bisect_left(index, (1,))
+                if descending:
+                    order = chain(range(present - 1, -1, -1), range(present, len(index)))
+                else:
+                    order = range(len(index))
+                records = (rows[index[position][-1]] for position in order)
             
-            # Prepare row data
-            row_data = [
-                ingredient_data.get("Ingredient Name", ""),
-                price,
-                grams,
-                round(price_per_gram, 4),
-                grams_needed,
-                round(cost_per_recipe, 2)
-            ]
+            stop = None if limit is None else offset + limit
+            if isinstance(filter, str):
+                query = self._normalize_name(filter)
+                if query:
+                    matches = self._name_matches(table, rows, records, query, sort_key, descending)
+                    return matches[offset:stop], len(matches)
+                filter = None
+            if filter is None:
+                return list(islice(records, offset, stop)), len(rows)
             
-            with open(self.ingredients_file, 'a', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(row_data)
+            # The total needs every match counted, but only the page is kept
+            page, total = [], 0
+            for record in records:
+                if filter(record):
+                    if total >= offset and (stop is None or total < stop):
+                        page.append(record)
+                    total += 1
+            return page, total
+        except Exception as e:
+            print(f"Error querying {table}: {e}")
+            return [], 0
+    
+    def _name_matches(self, table: str, rows: Dict[int, Record], records: Iterator[Record],
+                      query: str, sort_key: Optional[str], descending: bool) -> List[Record]:
+        """Return the records whose name contains query in query order, or for BEST_MATCH
+        the trigram index's ranked matches including misspellings.
+        
+        The last search's matches are kept until the table changes, so paging through
+        them doesn't rescan it, and a query extending the last one (e.g. "choc" ->
+        "chocolate") only filters the previous matches."""
+        state = (self._table_versions.get(table, 0), sort_key, descending)
+        cached = self._name_searches.get(table)
+        if cached is None or cached[0] is not rows or cached[1] != state:
+            cached = None
+        if cached is not None and cached[2] == query:
+            matches = cached[3]
+        elif sort_key == self.BEST_MATCH:
+            matches = self._trigram_index(table).search(query)
+            if descending:
+                matches.reverse()
+        elif cached is not None and cached[2] in query:
+            # Names normalized as the query is, so narrowing finds what a fresh search would
+            names = self._trigram_index(table).names
+            matches = [record for record in cached[3] if query in names[record.id]]
+        else:
+            ids = self._trigram_index(table).containing(query)
+            matches = self._in_query_order(table, rows, state, records, ids) if ids else []
+        self._name_searches[table] = (rows, state, query, matches)
+        return matches
+    
+    def _in_query_order(self, table: str, rows: Dict[int, Record], state: tuple,
+                        records: Iterator[Record], ids: Set[int]) -> List[Record]:
+        """Return the records with these IDs in the order records yields them.
+        
+        Each record's position in that order is kept until the table changes, so a
+        search with few matches sorts them rather than walking every record."""
+        cached = self._query_orders.get(table)
+        if cached is None or cached[0] is not rows or cached[1] != state:
+            if len(ids) * 4 > len(rows):
+                # Many matches are picked out as quickly by one walk
+                return [record for record in records if record.id in ids]
+            cached = (rows, state, {record.id: position for position, record in enumerate(records)})
+            self._query_orders[table] = cached
+        positions = cached[2]
+        return [rows[record_id] for record_id in sorted(ids, key=positions.__getitem__)]
+    
+    def _sorted_index(self, table: str, column: str) -> List[tuple]:
+        """Return the (rank, value, ID) entries of a table sorted by a column, building
+        them only if the table was reloaded since"""
+        rows = self._load_table(table)
+        cached = self._sorted_indexes.get(table)
+        if cached is None or cached[0] is not rows:
+            cached = (rows, {})
+            self._sorted_indexes[table] = cached
+        index = cached[1].get(column)
+        if index is None:
+            attr, kind = RECORD_TYPES[table]._COLUMNS[column]
+            index = sorted(self._sort_entry(record, attr, kind) for record in rows.values())
+            cached[1][column] = index
+        return index
+    
+    def _sort_entry(self, record: Record, attr: str, kind: type) -> tuple:
+        """Sort entry of a record: text ignores case, and blank or non-numeric values of
+        a numeric column rank after all numbers; the ID keeps entries unique"""
+        value = getattr(record, attr)
+        if kind is str:
+            return (0, self._normalize_name(value), record.id)
+        if isinstance(value, (int, float)) and value == value:
+            return (0, value, record.id)
+        return (1, 0, record.id)
+    
+    def _reindex_sorted(self, table: str, rows: Dict[int, Record],
+                        added: List[Record], removed: List[Record]):
+        """Move changed records within the cached sorted indexes of their table"""
+        cached = self._sorted_indexes.get(table)
+        if cached is None or cached[0] is not rows:
+            return
+        columns = RECORD_TYPES[table]._COLUMNS
+        for column, index in cached[1].items():
+            attr, kind = columns[column]
+            for record in removed:
+                position = bisect_left(index, self._sort_entry(record, attr, kind))
+                del index[position]
+            for record in added:
+                insort(index, self._sort_entry(record, attr, kind))
+    
+    # ===== INGREDIENTS MANAGEMENT =====
+    
+    @_writes
+    def add_ingredient(self, ingredient_data: Dict[str, str]) -> bool:
+        """Add a new ingredient to storage"""
+        try:
+            self._append_row("ingredients", self._ingredient_row(ingredient_data))
             return True
         except Exception as e:
             print(f"Error adding ingredient: {e}")
             return False
     
-    def get_all_ingredients(self) -> List[Dict[str, str]]:
-        """Retrieve all ingredients from the CSV file"""
+    def _ingredient_row(self, ingredient_data: Dict[str, str]) -> Ingredient:
+        """Build an ingredient record, deriving price per gram and cost per recipe"""
+        # Calculate price per gram
+        price = float(ingredient_data.get("Price", 0))
+        grams = float(ingredient_data.get("Grams", 0))
+        price_per_gram = price / grams if grams > 0 else 0
+        
+        # Calculate cost per recipe
+        grams_needed = float(ingredient_data.get("Grams Needed in Recipe", 0))
+        cost_per_recipe = price_per_gram * grams_needed
+        
+        return Ingredient(
+            name=ingredient_data.get("Ingredient Name", ""),
+            price=price,
+            grams=grams,
+            price_per_gram=round(price_per_gram, 4),
+            grams_needed=grams_needed,
+            cost_per_recipe=round(cost_per_recipe, 2)
+        )
+    
+    @_reads
+    def get_all_ingredients(self) -> List[Ingredient]:
+        """Retrieve all ingredients from storage"""
         ingredients = []
         try:
-            with open(self.ingredients_file, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    ingredients.append(row)
+            ingredients = list(self._load_table("ingredients").values())
         except Exception as e:
             print(f"Error reading ingredients: {e}")
         return ingredients
     
-    def update_ingredient(self, index: int, ingredient_data: Dict[str, str]) -> bool:
+    @_reads
+    def get_ingredient(self, ingredient_id: int) -> Optional[Ingredient]:
+        """Return the ingredient with the given ID, or None"""
+        try:
+            return self._load_table("ingredients").get(int(ingredient_id))
+        except Exception as e:
+            print(f"Error reading ingredients: {e}")
+            return None
+    
+    @_writes
+    def update_ingredient(self, index: int, ingredient_data: Dict[str, str],
+                          expected: Optional[Ingredient] = None) -> bool:
         """Update an existing ingredient at the specified index"""
         try:
-            ingredients = self.get_all_ingredients()
-            if 0 <= index < len(ingredients):
-                # Calculate price per gram
-                price = float(ingredient_data.get("Price", 0))
-                grams = float(ingredient_data.get("Grams", 0))
-                price_per_gram = price / grams if grams > 0 else 0
-                
-                # Calculate cost per recipe
-                grams_needed = float(ingredient_data.get("Grams Needed in Recipe", 0))
-                cost_per_recipe = price_per_gram * grams_needed
-                
-                # Update ingredient data
-                ingredients[index] = {
-                    "Ingredient Name": ingredient_data.get("Ingredient Name", ""),
-                    "Price": price,
-                    "Grams": grams,
-                    "Price per Gram": round(price_per_gram, 4),
-                    "Grams Needed in Recipe": grams_needed,
-                    "Cost per Recipe": round(cost_per_recipe, 2)
-                }
-                
-                # Rewrite the entire file
-                with open(self.ingredients_file, 'w', newline='', encoding='utf-8') as file:
-                    writer = csv.DictWriter(file, fieldnames=[
-                        "Ingredient Name", "Price", "Grams", "Price per Gram", 
-                        "Grams Needed in Recipe", "Cost per Recipe"
-                    ])
-                    writer.writeheader()
-                    writer.writerows(ingredients)
+            ingredient_id = self._id_at("ingredients", index)
+        except Exception as e:
+            print(f"Error updating ingredient: {e}")
+            return False
+        return ingredient_id is not None and self.update_ingredient_by_id(ingredient_id, ingredient_data, expected)
+    
+    @_writes
+    def update_ingredient_by_id(self, ingredient_id: int, ingredient_data: Dict[str, str],
+                                expected: Optional[Ingredient] = None) -> bool:
+        """Update the ingredient with the given ID and recost the saved recipes using it;
+        those whose costs changed are left in recosted_recipes, and those that couldn't
+        be costed in uncosted_recipes.
+        
+        Pass expected, the ingredient as read before editing it, to update it only if
+        nobody has changed it since, e.g. from another terminal; otherwise nothing is
+        written and False is returned."""
+        self.recosted_recipes = []
+        self.uncosted_recipes = []
+        try:
+            ingredient_id = int(ingredient_id)
+            rows = self._load_table("ingredients")
+            if expected is not None and rows.get(ingredient_id) != expected:
+                print("Error updating ingredient: it was changed elsewhere since it was read")
+                return False
+            if ingredient_id in rows:
+                # Write the ingredient and the recipes it makes stale together
+                with self.batch():
+                    self._update_row("ingredients", ingredient_id, self._ingredient_row(ingredient_data))
+                    recosted = self.recost_recipes_using(ingredient_id)
+                self.recosted_recipes = recosted
                 return True
         except Exception as e:
             print(f"Error updating ingredient: {e}")
         return False
     
+    @_writes
+    def recost_recipes_using(self, ingredient_id: int) -> List[Recipe]:
+        """Recompute and persist the saved recipes that use an ingredient, directly or
+        through sub-recipes, and return those whose costs changed"""
+        return self._recost({line.recipe_id for line in self._ingredient_lines(int(ingredient_id))})
+    
+    @staticmethod
+    def _line_cost(ingredient: Ingredient, grams) -> float:
+        """Cost of using grams of an ingredient, rounded like Cost per Recipe"""
+        price = number(ingredient, "Price")
+        pack_grams = number(ingredient, "Grams")
+        price_per_gram = price / pack_grams if pack_grams > 0 else 0
+        return round(price_per_gram * (grams or 0), 2)
+    
+    @_writes
     def delete_ingredient(self, index: int) -> bool:
         """Delete an ingredient at the specified index"""
         try:
-            ingredients = self.get_all_ingredients()
-            if 0 <= index < len(ingredients):
-                ingredients.pop(index)
-                
-                # Rewrite the entire file
-                with open(self.ingredients_file, 'w', newline='', encoding='utf-8') as file:
-                    writer = csv.DictWriter(file, fieldnames=[
-                        "Ingredient Name", "Price", "Grams", "Price per Gram", 
-                        "Grams Needed in Recipe", "Cost per Recipe"
-                    ])
-                    writer.writeheader()
-                    writer.writerows(ingredients)
+            ingredient_id = self._id_at("ingredients", index)
+        except Exception as e:
+            print(f"Error deleting ingredient: {e}")
+            return False
+        return ingredient_id is not None and self.delete_ingredient_by_id(ingredient_id)
+    
+    @_writes
+    def delete_ingredient_by_id(self, ingredient_id: int) -> bool:
+        """Delete the ingredient with the given ID, unless saved recipes still use it"""
+        try:
+            ingredient_id = int(ingredient_id)
+            if ingredient_id in self._load_table("ingredients"):
+                users = self.recipes_using_ingredient(ingredient_id)
+                if users:
+                    names = ", ".join(recipe.name for recipe in users)
+                    print(f"Error deleting ingredient: it is used by {names}")
+                    return False
+                self._delete_rows("ingredients", [ingredient_id])
                 return True
         except Exception as e:
             print(f"Error deleting ingredient: {e}")
         return False
     
-    def search_ingredients(self, query: str) -> List[Dict[str, str]]:
-        """Search ingredients by name"""
+    @_reads
+    def recipes_using_ingredient(self, ingredient_id: int) -> List[Recipe]:
+        """Return the saved recipes with a line using an ingredient, in ID order"""
+        recipes = self._load_table("recipes")
+        recipe_ids = {line.recipe_id for line in self._ingredient_lines(int(ingredient_id))}
+        return [recipes[recipe_id] for recipe_id in sorted(recipe_ids) if recipe_id in recipes]
+    
+    @_reads
+    def search_ingredients(self, query: str, limit: Optional[int] = None) -> List[Ingredient]:
+        """Search ingredients by name, best matches first and close misspellings included"""
         if not query.strip():
             return self.get_all_ingredients()
         
-        query = query.lower()
-        ingredients = self.get_all_ingredients()
-        filtered_ingredients = []
+        try:
+            return self._trigram_index("ingredients").search(query, limit)
+        except Exception as e:
+            print(f"Error searching ingredients: {e}")
+            return []
+    
+    # ===== PRICE LISTS =====
+    
+    # Accepted supplier CSV headers per field, compared after _normalize_name
+    PRICE_LIST_HEADERS = {
+        "name": ("ingredient name", "ingredient", "name", "item"),
+        "price": ("price", "pack price", "cost"),
+        "grams": ("grams", "pack grams", "pack size", "pack size (g)", "weight (g)")
+    }
+    
+    @_writes
+    def import_price_list(self, path: str, chunk_size: int = 10000) -> Dict[str, int]:
+        """Update ingredient prices and pack sizes from a supplier CSV.
         
-        for ingredient in ingredients:
-            if query in ingredient.get("Ingredient Name", "").lower():
-                filtered_ingredients.append(ingredient)
+        The file is read chunk_size rows at a time and each row (name, price, pack
+        grams) is matched against the ingredient name index. Every matched ingredient
+        is written in one batch, then only the recipes using them are recosted; those
+        whose costs changed are left in recosted_recipes. Returns the counts of rows
+        read, ingredients updated, rows matching no ingredient and invalid rows, or {}
+        if the import failed."""
+        self.recosted_recipes = []
+        self.uncosted_recipes = []
+        summary = {"rows": 0, "updated": 0, "unmatched": 0, "invalid": 0}
+        try:
+            with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+                rows = self._price_list_rows(csv.reader(file))
+                updated: Set[int] = set()
+                with self.batch():
+                    while True:
+                        chunk = list(islice(rows, chunk_size))
+                        if not chunk:
+                            break
+                        self._apply_price_chunk(chunk, updated, summary)
+                    recosted = self._recost({line.recipe_id for ingredient_id in updated
+                                             for line in self._ingredient_lines(ingredient_id)})
+            self.recosted_recipes = recosted
+            summary["updated"] = len(updated)
+            return summary
+        except Exception as e:
+            print(f"Error importing price list: {e}")
+            return {}
+    
+    def _price_list_rows(self, reader) -> Iterator[Tuple[str, str, str]]:
+        """Yield (name, price, grams) per data row of a supplier CSV.
         
-        return filtered_ingredients
+        Columns are found by header name; a file whose first row isn't a recognizable
+        header is read as name, price and grams in that order."""
+        first = next(reader, None)
+        if first is None:
+            return
+        headers = [self._normalize_name(header) for header in first]
+        positions = []
+        for aliases in self.PRICE_LIST_HEADERS.values():
+            position = next((i for i, header in enumerate(headers) if header in aliases), None)
+            positions.append(position)
+        if None in positions:
+            positions = [0, 1, 2]
+            reader = chain([first], reader)
+        width = max(positions) + 1
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            row = row + [""] * (width - len(row))
+            yield tuple(row[position] for position in positions)
+    
+    def _apply_price_chunk(self, chunk: List[Tuple[str, str, str]], updated: Set[int],
+                           summary: Dict[str, int]):
+        """Update the ingredients named in a chunk of price list rows"""
+        index = self._ingredient_name_index()
+        for name, price, grams in chunk:
+            summary["rows"] += 1
+            matches = index.get(self._normalize_name(name))
+            if not matches:
+                summary["unmatched"] += 1
+                continue
+            try:
+                price = float(price.replace("$", "").replace(",", ""))
+                grams = float(grams.replace(",", ""))
+            except ValueError:
+                summary["invalid"] += 1
+                continue
+            # Several catalog rows may share the name; copy the list as updates reindex it
+            for ingredient in list(matches):
+                if ingredient.price == price and ingredient.grams == grams:
+                    continue
+                try:
+                    row = self._ingredient_row({
+                        "Ingredient Name": ingredient.name,
+                        "Price": price,
+                        "Grams": grams,
+                        "Grams Needed in Recipe": ingredient.grams_needed or 0
+                    })
+                except ValueError:
+                    summary["invalid"] += 1
+                    continue
+                self._update_row("ingredients", ingredient.id, row)
+                updated.add(ingredient.id)
     
     # ===== RECIPES MANAGEMENT =====
     
+    @_writes
     def add_recipe(self, recipe_data: Dict[str, str], costing_data: Dict[str, float] = None) -> bool:
-        """Add a new recipe to the CSV file"""
+        """Add a new recipe to storage"""
         try:
-            if costing_data:
-                # Use pre-calculated values from costing_data
-                total_ingredient_cost = costing_data.get("Total Ingredient Cost", 0)
-                misc_cost = costing_data.get("Miscellaneous Cost (50%)", 0)
-                labor_cost = costing_data.get("Labor Cost (45%)", 0)
-                total_cost = costing_data.get("Total Cost", 0)
-                suggested_selling_price = costing_data.get("Suggested Selling Price", 0)
-                margin_percentage = costing_data.get("Margin Percentage", 150.0)
-                profit = costing_data.get("Profit", 0)
-            else:
-                # Fallback to old calculation method (for backward compatibility)
-                total_ingredient_cost = float(recipe_data.get("Total Ingredient Cost", 0))
-                misc_cost = total_ingredient_cost * 0.50  # 50% miscellaneous cost
-                labor_cost = total_ingredient_cost * 0.45  # 45% labor cost
-                total_cost = total_ingredient_cost + misc_cost + labor_cost
-                
-                # Calculate selling price (typically 2.5x total cost for good profit margin)
-                # Use default margin 150% for legacy calls (2.5x)
-                margin_percentage = 150.0
-                suggested_selling_price = total_cost * (1 + margin_percentage / 100)
-                profit = suggested_selling_price - total_cost
-            
-            # Prepare row data
-            row_data = [
-                recipe_data.get("Recipe Name", ""),
-                total_ingredient_cost,
-                round(misc_cost, 2),
-                round(labor_cost, 2),
-                round(total_cost, 2),
-                round(suggested_selling_price, 2),
-                round(margin_percentage, 2),
-                round(profit, 2),
-                recipe_data.get("Ingredients Used", "")
-            ]
-            
-            with open(self.recipes_file, 'a', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(row_data)
+            self._append_row("recipes", self._recipe_row(recipe_data, costing_data))
             return True
         except Exception as e:
             print(f"Error adding recipe: {e}")
             return False
     
-    def get_all_recipes(self) -> List[Dict[str, str]]:
-        """Retrieve all recipes from the CSV file"""
+    def _recipe_row(self, recipe_data: Dict[str, str], costing_data: Dict[str, float] = None) -> Recipe:
+        """Build a recipe record from its costing, or cost it with the default margin"""
+        if costing_data:
+            # Use pre-calculated values from costing_data
+            total_ingredient_cost = costing_data.get("Total Ingredient Cost", 0)
+            misc_cost = costing_data.get("Miscellaneous Cost (50%)", 0)
+            labor_cost = costing_data.get("Labor Cost (45%)", 0)
+            total_cost = costing_data.get("Total Cost", 0)
+            suggested_selling_price = costing_data.get("Suggested Selling Price", 0)
+            margin_percentage = costing_data.get("Margin Percentage", 150.0)
+            profit = costing_data.get("Profit", 0)
+        else:
+            # Fallback to old calculation method (for backward compatibility)
+            total_ingredient_cost = float(recipe_data.get("Total Ingredient Cost", 0))
+            misc_cost = total_ingredient_cost * 0.50  # 50% miscellaneous cost
+            labor_cost = total_ingredient_cost * 0.45  # 45% labor cost
+            total_cost = total_ingredient_cost + misc_cost + labor_cost
+            
+            # Calculate selling price (typically 2.5x total cost for good profit margin)
+            # Use default margin 150% for legacy calls (2.5x)
+            margin_percentage = 150.0
+            suggested_selling_price = total_cost * (1 + margin_percentage / 100)
+            profit = suggested_selling_price - total_cost
+        
+        # Prepare row data
+        row_data = [
+            recipe_data.get("Recipe Name", ""),
+            total_ingredient_cost,
+            round(misc_cost, 2),
+            round(labor_cost, 2),
+            round(total_cost, 2),
+            round(suggested_selling_price, 2),
+            round(margin_percentage, 2),
+            round(profit, 2),
+            recipe_data.get("Ingredients Used", "")
+        ]
+        
+        return Recipe.from_row(dict(zip(RECIPE_FIELDS, row_data)))
+    
+    @_reads
+    def get_all_recipes(self) -> List[Recipe]:
+        """Retrieve all recipes from storage"""
         recipes = []
         try:
-            with open(self.recipes_file, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    recipes.append(row)
+            recipes = list(self._load_table("recipes").values())
         except Exception as e:
             print(f"Error reading recipes: {e}")
         return recipes
     
-    def search_recipes(self, query: str) -> List[Dict[str, str]]:
-        """Search recipes by name"""
+    @_reads
+    def get_recipe(self, recipe_id: int) -> Optional[Recipe]:
+        """Return the recipe with the given ID, or None"""
+        try:
+            return self._load_table("recipes").get(int(recipe_id))
+        except Exception as e:
+            print(f"Error reading recipes: {e}")
+            return None
+    
+    @_reads
+    def search_recipes(self, query: str, limit: Optional[int] = None) -> List[Recipe]:
+        """Search recipes by name, best matches first and close misspellings included"""
         if not query.strip():
             return self.get_all_recipes()
         
-        query = query.lower()
-        recipes = self.get_all_recipes()
-        filtered_recipes = []
-        
-        for recipe in recipes:
-            if query in recipe.get("Recipe Name", "").lower():
-                filtered_recipes.append(recipe)
-        
-        return filtered_recipes
+        try:
+            return self._trigram_index("recipes").search(query, limit)
+        except Exception as e:
+            print(f"Error searching recipes: {e}")
+            return []
     
     # ===== COST CALCULATION =====
     
     def calculate_recipe_cost(self, recipe_name: str, ingredients_used: List[Dict[str, str]], 
                             save_recipe: bool = False, margin_percentage: float = 150.0) -> Dict[str, float]:
         """Calculate recipe cost with labor and miscellaneous costs"""
-        try:
-            # Calculate total ingredient cost
-            total_ingredient_cost = sum(float(ingredient.get("Cost per Recipe", 0)) 
-                                      for ingredient in ingredients_used)
-            
-            # Calculate additional costs
-            misc_cost = total_ingredient_cost * 0.50  # 50% miscellaneous cost
-            labor_cost = total_ingredient_cost * 0.45  # 45% labor cost
-            total_cost = total_ingredient_cost + misc_cost + labor_cost
-            
-            # Calculate selling price and profit using custom margin percentage
-            # margin_percentage = 150 means 150% markup = 2.5x total cost
-            markup_multiplier = 1 + (margin_percentage / 100)
-            suggested_selling_price = total_cost * markup_multiplier
-            profit = suggested_selling_price - total_cost
-            
-            result = {
-                "Total Ingredient Cost": round(total_ingredient_cost, 2),
-                "Miscellaneous Cost (50%)": round(misc_cost, 2),
-                "Labor Cost (45%)": round(labor_cost, 2),
-                "Total Cost": round(total_cost, 2),
-                "Suggested Selling Price": round(suggested_selling_price, 2),
-                "Profit": round(profit, 2),
-                "Margin Percentage": margin_percentage
-            }
-            
-            # Save recipe if requested
-            if save_recipe:
-                ingredients_text = ", ".join([ing.get("Ingredient Name", "") for ing in ingredients_used])
-                recipe_data = {
-                    "Recipe Name": recipe_name,
-                    "Total Ingredient Cost": str(total_ingredient_cost),
-                    "Ingredients Used": ingredients_text
-                }
-                self.add_recipe(recipe_data, costing_data=result)
+        # Costing only reads; saving writes
+        with self._writing() if save_recipe else self._lock.reading():
+            try:
+                # Saved recipes may be used as sub-recipes
+                ingredients_used = self._resolve_ingredients(ingredients_used)
                 
-                # Add new ingredients to ingredients.csv if they don't exist
-                for ingredient in ingredients_used:
-                    existing_ingredients = [ing.get("Ingredient Name", "") 
-                                          for ing in self.get_all_ingredients()]
-                    if ingredient.get("Ingredient Name", "") not in existing_ingredients:
-                        self.add_ingredient(ingredient)
+                # Calculate total ingredient cost
+                total_ingredient_cost = self._total_ingredient_cost(ingredients_used)
+                result = self._cost_breakdown(total_ingredient_cost, margin_percentage)
+                
+                # Save recipe if requested
+                if save_recipe:
+                    # Write the recipe, its lines and any new ingredients together
+                    with self.batch():
+                        self._add_new_ingredients(ingredients_used)
+                        recipe_id = self._append_row("recipes", self._recipe_row(
+                            self._recipe_data(recipe_name, ingredients_used, total_ingredient_cost), result
+                        ))
+                        self._add_recipe_lines(recipe_id, ingredients_used)
+                
+                return result
+            except Exception as e:
+                print(f"Error calculating recipe cost: {e}")
+                return {}
+    
+    @staticmethod
+    def _cost_breakdown(total_ingredient_cost: float, margin_percentage: float) -> Dict[str, float]:
+        """Apply the misc, labor and margin formula to a total ingredient cost"""
+        # Calculate additional costs
+        misc_cost = total_ingredient_cost * 0.50  # 50% miscellaneous cost
+        labor_cost = total_ingredient_cost * 0.45  # 45% labor cost
+        total_cost = total_ingredient_cost + misc_cost + labor_cost
+        
+        # Calculate selling price and profit using custom margin percentage
+        # margin_percentage = 150 means 150% markup = 2.5x total cost
+        markup_multiplier = 1 + (margin_percentage / 100)
+        suggested_selling_price = total_cost * markup_multiplier
+        profit = suggested_selling_price - total_cost
+        
+        return {
+            "Total Ingredient Cost": round(total_ingredient_cost, 2),
+            "Miscellaneous Cost (50%)": round(misc_cost, 2),
+            "Labor Cost (45%)": round(labor_cost, 2),
+            "Total Cost": round(total_cost, 2),
+            "Suggested Selling Price": round(suggested_selling_price, 2),
+            "Profit": round(profit, 2),
+            "Margin Percentage": margin_percentage
+        }
+    
+    @staticmethod
+    def _recipe_data(recipe_name: str, ingredients_used: List[Dict[str, str]],
+                     total_ingredient_cost: float) -> Dict[str, str]:
+        """Build the recipe_data add_recipe expects for a costed recipe"""
+        ingredients_text = ", ".join([ing.get("Ingredient Name", "") for ing in ingredients_used])
+        return {
+            "Recipe Name": recipe_name,
+            "Total Ingredient Cost": str(total_ingredient_cost),
+            "Ingredients Used": ingredients_text
+        }
+    
+    def _add_new_ingredients(self, ingredients_used: List[Dict[str, str]]):
+        """Add ingredients used by a saved recipe to the catalog if they don't exist"""
+        for ingredient in ingredients_used:
+            if "Sub-Recipe ID" in ingredient:
+                continue
+            if not self.ingredient_exists(ingredient.get("Ingredient Name", "")):
+                self.add_ingredient(ingredient)
+    
+    def calculate_many(self, recipes: List[Tuple[str, List]], margins=150.0,
+                       save_recipes: bool = False) -> List[Dict[str, float]]:
+        """Cost many recipes in one pass and return one result row per recipe.
+        
+        recipes is a list of (recipe name, ingredients used) pairs; an ingredient is a
+        record or dict as for calculate_recipe_cost, or a name looked up in the catalog.
+        margins is one margin percentage for every recipe or a list with one per recipe.
+        Each row is "Recipe Name" followed by the calculate_recipe_cost result.
+        
+        With save_recipes the results are persisted in a single write, replacing any
+        saved recipe of the same name."""
+        # Costing only reads; saving writes
+        with self._writing() if save_recipes else self._lock.reading():
+            try:
+                if isinstance(margins, (int, float)):
+                    margins = [margins] * len(recipes)
+                elif len(margins) != len(recipes):
+                    raise ValueError(f"{len(margins)} margins given for {len(recipes)} recipes")
+                
+                resolved = [(name, self._resolve_ingredients(ingredients_used)) for name, ingredients_used in recipes]
+                totals = self._total_ingredient_costs([ingredients_used for _, ingredients_used in resolved])
+                results = self._cost_breakdowns(totals, margins)
+                table = [{"Recipe Name": name, **result} for (name, _), result in zip(resolved, results)]
+                
+                if save_recipes:
+                    self._save_costed_recipes(resolved, totals, results)
+                return table
+            except Exception as e:
+                print(f"Error calculating recipe costs: {e}")
+                return []
+    
+    def _resolve_ingredients(self, ingredients_used: List) -> List[Dict[str, str]]:
+        """Replace names with their catalog ingredients, or failing that one batch of the
+        saved recipe of that name, and saved recipe records with sub-recipe entries"""
+        resolved = []
+        for ingredient in ingredients_used:
+            if isinstance(ingredient, str):
+                record = self.get_ingredient_by_name(ingredient)
+                if record is None:
+                    recipe_id = self._recipe_id_by_name(ingredient)
+                    if recipe_id is None:
+                        raise KeyError(f"Unknown ingredient '{ingredient}'")
+                    record = self.sub_recipe_item(recipe_id)
+                ingredient = record
+            elif isinstance(ingredient, Recipe):
+                ingredient = self.sub_recipe_item(ingredient.id)
+            resolved.append(ingredient)
+        return resolved
+    
+    @_reads
+    def recipe_item(self, name: str, grams=None, quantity=None) -> Optional[Dict[str, str]]:
+        """Return an ingredients_used entry by name, or None if nothing has that name.
+        
+        A catalog ingredient is returned as is, or as a copy costed for grams if given;
+        failing that, quantity batches (default 1) of the saved recipe of that name.
+        Raises ValueError if grams or quantity isn't a number above 0."""
+        for amount in (grams, quantity):
+            if amount is not None and not float(amount) > 0:
+                raise ValueError(f"Grams and quantity must be above 0, not {amount}")
+        ingredient = self.get_ingredient_by_name(name)
+        if ingredient is not None:
+            if grams is None:
+                return ingredient
+            grams = float(grams)
+            item = ingredient.copy()
+            item.grams_needed = grams
+            item.cost_per_recipe = self._line_cost(ingredient, grams)
+            return item
+        recipe_id = self._recipe_id_by_name(name)
+        if recipe_id is None:
+            return None
+        return self.sub_recipe_item(recipe_id, 1.0 if quantity is None else float(quantity))
+    
+    def _recipe_id_by_name(self, name: str) -> Optional[int]:
+        """Return the ID of the first saved recipe with this name (ignoring case and spacing)"""
+        matches = self._name_index("recipes").get(self._normalize_name(name))
+        return matches[0].id if matches else None
+    
+    def _total_ingredient_costs(self, recipes_ingredients: List[List[Dict[str, str]]]) -> List[float]:
+        """Total ingredient cost per recipe; catalog-only recipes are summed together
+        with one NumPy bincount over their gathered rows"""
+        totals: List[Optional[float]] = [None] * len(recipes_ingredients)
+        columns = self._ingredient_columns()
+        if columns is not None:
+            positions, owners, gathered = [], [], []
+            for i, ingredients_used in enumerate(recipes_ingredients):
+                rows = columns.row_positions(ingredients_used)
+                if rows is not None:
+                    positions.extend(rows)
+                    owners.extend([i] * len(rows))
+                    gathered.append(i)
+            if gathered:
+                # bincount adds each recipe's costs left to right, like _total_ingredient_cost
+                sums = np.bincount(np.array(owners, dtype=np.intp), minlength=len(recipes_ingredients),
+                                   weights=columns.cost_per_recipe[np.array(positions, dtype=np.intp)]).tolist()
+                for i in gathered:
+                    if not math.isnan(sums[i]):
+                        totals[i] = sums[i]
+        
+        for i, ingredients_used in enumerate(recipes_ingredients):
+            if totals[i] is None:
+                totals[i] = self._total_ingredient_cost(ingredients_used)
+        return totals
+    
+    def _cost_breakdowns(self, totals: List[float], margins: List[float]) -> List[Dict[str, float]]:
+        """Apply _cost_breakdown to many recipes, vectorized when NumPy is available"""
+        if np is None:
+            return [self._cost_breakdown(total, margin) for total, margin in zip(totals, margins)]
+        
+        # The same operations in the same order as _cost_breakdown, so the values match it exactly
+        total_ingredient_cost = np.array(totals, dtype=np.float64)
+        margin_percentage = np.array(margins, dtype=np.float64)
+        misc_cost = total_ingredient_cost * 0.50
+        labor_cost = total_ingredient_cost * 0.45
+        total_cost = total_ingredient_cost + misc_cost + labor_cost
+        suggested_selling_price = total_cost * (1 + (margin_percentage / 100))
+        profit = suggested_selling_price - total_cost
+        
+        # Python's round() rounds the exact binary value, np.round doesn't; keep round()
+        columns = zip(total_ingredient_cost.tolist(), misc_cost.tolist(), labor_cost.tolist(),
+                      total_cost.tolist(), suggested_selling_price.tolist(), profit.tolist())
+        return [{
+            "Total Ingredient Cost": round(ingredient_cost, 2),
+            "Miscellaneous Cost (50%)": round(misc, 2),
+            "Labor Cost (45%)": round(labor, 2),
+            "Total Cost": round(total, 2),
+            "Suggested Selling Price": round(price, 2),
+            "Profit": round(profit_value, 2),
+            "Margin Percentage": margin
+        } for (ingredient_cost, misc, labor, total, price, profit_value), margin in zip(columns, margins)]
+    
+    def _save_costed_recipes(self, resolved: List[Tuple[str, List[Dict[str, str]]]],
+                             totals: List[float], results: List[Dict[str, float]]):
+        """Persist costed recipes, their lines and any new ingredients in one batch"""
+        existing: Dict[str, int] = {}
+        for recipe_id, recipe in self._load_table("recipes").items():
+            existing.setdefault(recipe.name, recipe_id)
+        
+        updated: Set[int] = set()
+        with self.batch():
+            for (name, ingredients_used), total, result in zip(resolved, totals, results):
+                self._add_new_ingredients(ingredients_used)
+                row = self._recipe_row(self._recipe_data(name, ingredients_used, total), result)
+                if name in existing:
+                    self._update_row("recipes", existing[name], row)
+                    self._delete_recipe_lines([existing[name]])
+                    updated.add(existing[name])
+                else:
+                    existing[name] = self._append_row("recipes", row)
+                self._add_recipe_lines(existing[name], ingredients_used)
             
-            return result
-        except Exception as e:
-            print(f"Error calculating recipe cost: {e}")
-            return {}
+            # Roll changed costs up into recipes using the updated ones as sub-recipes
+            self._recost({line.recipe_id for recipe_id in updated
+                          for line in self._sub_recipe_lines(recipe_id)} - updated)
+    
+    def _total_ingredient_cost(self, ingredients_used: List[Dict[str, str]]) -> float:
+        """Sum Cost per Recipe, gathering catalog ingredients from the NumPy columns"""
+        try:
+            columns = self._ingredient_columns()
+        except OSError:
+            # The catalog can't be read; the ingredients passed in are all that's needed
+            columns = None
+        if columns is not None:
+            # Ingredients from outside the catalog keep to the plain path so the
+            # summation order, and therefore the rounding, stays the same
+            positions = columns.row_positions(ingredients_used)
+            total = None if positions is None else columns.total_cost(positions)
+            if total is not None:
+                return total
+        # Left to right like the columns; sum() compensates for rounding since Python 3.12,
+        # which would make the two paths disagree
+        total = 0.0
+        for ingredient in ingredients_used:
+            total += number(ingredient, "Cost per Recipe")
+        return total
     
     def export_recipe_costing(self, recipe_name: str, costing_data: Dict[str, float], 
                              ingredients_used: List[Dict[str, str]], 
@@ -309,27 +1478,55 @@ class DataHandler:
             print(f"Error exporting recipe costing: {e}")
             return False
     
+    @_writes
     def delete_recipe(self, recipe_name: str) -> bool:
-        """Delete a recipe by name from the recipes CSV file."""
+        """Delete a recipe by name from storage, unless other recipes use it as a sub-recipe."""
         try:
-            recipes = self.get_all_recipes()
-            # Filter out recipes that match the given name
-            filtered = [r for r in recipes if r.get("Recipe Name", "") != recipe_name]
-            if len(filtered) == len(recipes):
+            recipes = self._load_table("recipes")
+            # Find recipes that match the given name
+            matches = [recipe_id for recipe_id, r in recipes.items() if r.get("Recipe Name", "") == recipe_name]
+            if not matches or self._refuse_used_recipes(matches):
                 # nothing removed
                 return False
-
-            # Re-write the file using the canonical header (includes Margin Percentage)
-            fieldnames = [
-                "Recipe Name", "Total Ingredient Cost", "Miscellaneous Cost (50%)",
-                "Labor Cost (45%)", "Total Cost", "Suggested Selling Price",
-                "Margin Percentage", "Profit", "Ingredients Used"
-            ]
-            with open(self.recipes_file, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(filtered)
+            
+            with self.batch():
+                self._delete_rows("recipes", matches)
+                self._delete_recipe_lines(matches)
+            return True
+        except Exception as e:
+            print(f"Error deleting recipe: {e}")
+            return False
+    
+    @_writes
+    def delete_recipe_by_id(self, recipe_id: int) -> bool:
+        """Delete the recipe with the given ID from storage, unless other recipes use it as a
+        sub-recipe."""
+        try:
+            recipe_id = int(recipe_id)
+            if recipe_id not in self._load_table("recipes") or self._refuse_used_recipes([recipe_id]):
+                return False
+            with self.batch():
+                self._delete_rows("recipes", [recipe_id])
+                self._delete_recipe_lines([recipe_id])
             return True
         except Exception as e:
             print(f"Error deleting recipe: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def _refuse_used_recipes(self, recipe_ids: List[int]) -> bool:
+        """Print an error and return True if recipes other than these use any of them"""
+        users = self._recipes_using(recipe_ids)
+        if users:
+            print(f"Error deleting recipe: it is used by {', '.join(recipe.name for recipe in users)}")
+        return bool(users)
+    
+    def _recipes_using(self, recipe_ids: List[int]) -> List[Recipe]:
+        """Return the other saved recipes using any of these as a sub-recipe, in ID order"""
+        recipes = self._load_table("recipes")
+        user_ids = {line.recipe_id for recipe_id in recipe_ids for line in self._sub_recipe_lines(recipe_id)}
+        return [recipes[user_id] for user_id in sorted(user_ids - set(recipe_ids)) if user_id in recipes]
+    
+    @_reads
+    def recipes_using_recipe(self, recipe_id: int) -> List[Recipe]:
+        """Return the saved recipes using a recipe as a sub-recipe, in ID order"""
+        return self._recipes_using([int(recipe_id)])
@@ -43,11 +43,13 @@ def main():
         }
     ]
     
-    for ingredient in sample_ingredients:
-        if data_handler.add_ingredient(ingredient):
-            print(f"✅ Added: {ingredient['Ingredient Name']}")
-        else:
-            print(f"❌ Failed to add: {ingredient['Ingredient Name']}")
+    # Buffer the rows and write them to the file in one go
+    with data_handler.batch():
+        for ingredient in sample_ingredients:
+            if data_handler.add_ingredient(ingredient):
+                print(f"✅ Added: {ingredient['Ingredient Name']}")
+            else:
+                print(f"❌ Failed to add: {ingredient['Ingredient Name']}")
     
     # Display all ingredients
     print("\n📋 Current ingredients in database:")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Command line interface for Food Costing Calculator
+Runs catalog jobs headless, without starting the GUI
+
+Usage:
+    python -m foodcost import-prices supplier.csv
+    python -m foodcost --db foodcost.db import-prices supplier.csv
+    python -m foodcost cost --recipes in.csv --out out.csv --margin 150
+    python -m foodcost export recipes --out recipes_export.csv
+    python -m foodcost migrate --db foodcost.db
+"""
+
+import argparse
+import csv
+import sys
+from contextlib import contextmanager
+from itertools import groupby, islice
+from data_handler import DataHandler
+from storage import TABLE_FIELDS, CsvStorage, SqliteStorage, migrate_storage
+
+def _data_handler(args) -> DataHandler:
+    """Open the CSV files in the working directory, or the SQLite database given with --db"""
+    storage = SqliteStorage(args.db) if args.db else CsvStorage()
+    return DataHandler(storage)
+
+def import_prices(args) -> int:
+    """Update ingredient prices from a supplier price list"""
+    data_handler = _data_handler(args)
+    summary = data_handler.import_price_list(args.price_list, chunk_size=args.chunk_size)
+    if not summary:
+        return 1
+    
+    print(f"Read {summary['rows']} row(s): {summary['updated']} ingredient(s) updated, "
+          f"{summary['unmatched']} unmatched, {summary['invalid']} invalid")
+    if data_handler.recosted_recipes:
+        print(f"Recosted {len(data_handler.recosted_recipes)} recipe(s):")
+        for recipe in data_handler.recosted_recipes[:args.show]:
+            print(f"  {recipe['Recipe Name']}: ${recipe['Total Cost']} total cost, "
+                  f"${recipe['Suggested Selling Price']} selling price")
+        hidden = len(data_handler.recosted_recipes) - args.show
+        if hidden > 0:
+            print(f"  ... and {hidden} more")
+    if data_handler.uncosted_recipes:
+        print(f"Could not recost {len(data_handler.uncosted_recipes)} recipe(s) using deleted "
+              f"ingredients or sub-recipes: {', '.join(recipe.name for recipe in data_handler.uncosted_recipes)}")
+    return 0
+
+# Columns of the cost command's output, one row per recipe
+COST_FIELDS = [
+    "Recipe Name", "Total Ingredient Cost", "Miscellaneous Cost (50%)", "Labor Cost (45%)",
+    "Total Cost", "Suggested Selling Price", "Margin Percentage", "Profit", "Error"
+]
+
+@contextmanager
+def _open_csv(path: str, mode: str):
+    """Open a CSV file, or stdin/stdout for '-'"""
+    if path == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+        return
+    with open(path, mode, newline='', encoding='utf-8-sig' if mode == "r" else 'utf-8') as file:
+        yield file
+
+def _recipe_definitions(data_handler: DataHandler, reader: csv.DictReader, default_margin: float):
+    """Yield (recipe name, ingredients used, margin, error) per recipe of the input.
+    
+    Each input row is one ingredient of a recipe: Recipe Name, Ingredient Name and
+    optionally Grams Needed (the catalog's Grams Needed if blank), Quantity (batches
+    of a saved recipe used as a sub-recipe) and Margin Percentage. A recipe's rows
+    must be consecutive, so only one recipe is held in memory at a time."""
+    for name, rows in groupby(reader, key=lambda row: (row.get("Recipe Name") or "").strip()):
+        ingredients_used, missing, invalid, margin = [], [], [], default_margin
+        for row in rows:
+            if (row.get("Margin Percentage") or "").strip():
+                try:
+                    margin = float(row["Margin Percentage"])
+                except ValueError:
+                    invalid.append(f"margin {row['Margin Percentage']}")
+            ingredient_name = (row.get("Ingredient Name") or "").strip()
+            if not ingredient_name:
+                continue
+            try:
+                item = data_handler.recipe_item(
+                    ingredient_name,
+                    grams=(row.get("Grams Needed") or "").strip() or None,
+                    quantity=(row.get("Quantity") or "").strip() or None
+                )
+            except ValueError:
+                invalid.append(ingredient_name)
+                continue
+            if item is None:
+                missing.append(ingredient_name)
+            else:
+                ingredients_used.append(item)
+        errors = []
+        if missing:
+            errors.append(f"Unknown ingredient(s): {', '.join(missing)}")
+        if invalid:
+            errors.append(f"Invalid number(s) for: {', '.join(invalid)}")
+        yield name, ingredients_used, margin, "; ".join(errors)
+
+def cost(args) -> int:
+    """Cost recipe definitions against the catalog and write one result row per recipe"""
+    data_handler = _data_handler(args)
+    recipes = errors = 0
+    with _open_csv(args.recipes, "r") as source, _open_csv(args.out, "w") as target:
+        writer = csv.DictWriter(target, fieldnames=COST_FIELDS)
+        writer.writeheader()
+        definitions = _recipe_definitions(data_handler, csv.DictReader(source), args.margin)
+        while True:
+            # Cost a chunk of recipes at a time so memory stays flat whatever the input size
+            chunk = list(islice(definitions, args.chunk_size))
+            if not chunk:
+                break
+            valid = [(name, ingredients_used, margin) for name, ingredients_used, margin, error in chunk if not error]
+            results = data_handler.calculate_many(
+                [(name, ingredients_used) for name, ingredients_used, _ in valid],
+                [margin for _, _, margin in valid]
+            )
+            if len(results) != len(valid):
+                results = [{"Recipe Name": name, "Error": "Costing failed"} for name, _, _ in valid]
+            results = iter(results)
+            for name, _, _, error in chunk:
+                row = {"Recipe Name": name, "Error": error} if error else next(results)
+                errors += bool(row.get("Error"))
+                writer.writerow(row)
+            recipes += len(chunk)
+            target.flush()
+    
+    print(f"Costed {recipes - errors} of {recipes} recipe(s)", file=sys.stderr)
+    return 1 if errors else 0
+
+def export(args) -> int:
+    """Export a table to CSV"""
+    data_handler = _data_handler(args)
+    filename = args.out or f"{args.table}_export.csv"
+    export_table = data_handler.export_ingredients if args.table == "ingredients" else data_handler.export_recipes
+    with _open_csv(filename, "w") as target:
+        return 0 if export_table(target) else 1
+
+def migrate(args) -> int:
+    """Copy the CSV files in the working directory into the SQLite database"""
+    target = SqliteStorage(args.db)
+    if not args.replace and any(target.load(table) for table in TABLE_FIELDS):
+        print(f"Error: {args.db} already holds data; use --replace to overwrite it", file=sys.stderr)
+        return 1
+    
+    try:
+        counts = migrate_storage(CsvStorage(), target)
+    except Exception as e:
+        print(f"Error migrating to {args.db}: {e}", file=sys.stderr)
+        return 1
+    print(f"Copied into {args.db}: " + ", ".join(
+        f"{count} {table.replace('_', ' ')}" for table, count in counts.items()
+    ))
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="foodcost", description="Food Costing Calculator command line tools")
+    parser.add_argument("--db", help="use this SQLite database instead of the CSV files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    import_parser = commands.add_parser(
+        "import-prices",
+        help="update ingredient prices from a supplier CSV",
+        description="Update ingredient prices and pack sizes from a supplier CSV with name, "
+                    "price and pack grams columns, and recost the recipes using them."
+    )
+    import_parser.add_argument("price_list", help="supplier CSV file")
+    import_parser.add_argument("--chunk-size", type=int, default=10000,
+                               help="rows read at a time (default: 10000)")
+    import_parser.add_argument("--show", type=int, default=20,
+                               help="recosted recipes to list (default: 20)")
+    import_parser.set_defaults(handler=import_prices)
+    
+    cost_parser = commands.add_parser(
+        "cost",
+        help="cost recipe definitions from a CSV",
+        description="Cost recipes against the ingredient catalog without saving them. The input "
+                    "has one row per ingredient: Recipe Name, Ingredient Name and optionally "
+                    "Grams Needed, Quantity (for saved recipes used as sub-recipes) and Margin "
+                    "Percentage, with each recipe's rows together."
+    )
+    cost_parser.add_argument("--recipes", default="-", help="recipe definitions CSV (default: stdin)")
+    cost_parser.add_argument("--out", default="-", help="results CSV (default: stdout)")
+    cost_parser.add_argument("--margin", type=float, default=150.0,
+                             help="margin percentage for recipes without one (default: 150)")
+    cost_parser.add_argument("--chunk-size", type=int, default=1000,
+                             help="recipes costed at a time (default: 1000)")
+    cost_parser.set_defaults(handler=cost)
+
+    export_parser = commands.add_parser("export", help="export the ingredients or recipes to CSV")
+    export_parser.add_argument("table", choices=["ingredients", "recipes"])
+    export_parser.add_argument("--out", help="output CSV, or - for stdout (default: <table>_export.csv)")
+    export_parser.set_defaults(handler=export)
+    
+    migrate_parser = commands.add_parser(
+        "migrate",
+        help="copy the CSV files into a SQLite database",
+        description="Copy the ingredients, recipes and recipe lines from the CSV files in the "
+                    "working directory into the SQLite database given with --db."
+    )
+    # Also accepted after the command; SUPPRESS keeps a --db given before it
+    migrate_parser.add_argument("--db", default=argparse.SUPPRESS, help="SQLite database to create or fill")
+    migrate_parser.add_argument("--replace", action="store_true",
+                                help="overwrite a database that already holds data")
+    migrate_parser.set_defaults(handler=migrate)
+    
+    args = parser.parse_args(argv)
+    if args.command == "migrate" and not args.db:
+        parser.error("migrate needs --db, the SQLite database to copy the CSV files into")
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
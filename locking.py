@@ -0,0 +1,127 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; FileLock then only orders the threads of this process
+    fcntl = None
+
+class ReadWriteLock:
+    """Lock held by any number of readers at once or by a single writer.
+    
+    A waiting writer blocks new readers, so a steady stream of reads can't starve
+    writes. Both sides are reentrant per thread, and the writing thread may also
+    read; a reading thread asking to write raises RuntimeError instead of
+    deadlocking, since it would wait for itself to stop reading."""
+    
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        # Thread ident -> how many times it holds the read lock
+        self._readers: Dict[int, int] = {}
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def reading(self):
+        """Hold the lock shared with other readers for the block"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def writing(self):
+        """Hold the lock exclusively for the block"""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+    
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._writers_waiting:
+                    self._condition.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+    
+    def release_read(self):
+        me = threading.get_ident()
+        with self._condition:
+            depth = self._readers[me] - 1
+            if depth:
+                self._readers[me] = depth
+                return
+            del self._readers[me]
+            if not self._readers:
+                self._condition.notify_all()
+    
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError("A thread holding the read lock can't take the write lock")
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+    
+    def release_write(self):
+        with self._condition:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+
+class FileLock:
+    """Advisory lock on a file, held by one thread of one process at a time.
+    
+    Processes sharing data files, e.g. terminals pointed at the same network volume,
+    each open the same lock file and fcntl.flock makes them take turns. Within a
+    process it is a reentrant thread lock, so a thread holding it may take it again;
+    only the outermost acquire and release touch the file."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+    
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                if self._file is None:
+                    # Kept open for good, since closing it would drop the lock
+                    self._file = open(self.path, 'a')
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+    
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._thread_lock.release()
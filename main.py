@@ -6,8 +6,18 @@ from ui_recipes import RecipesFrame
 from ui_calculator import CalculatorFrame
 from ui_about import AboutFrame
 from ui_help import HelpFrame
+from ui_views import ViewManager
+from ui_worker import BackgroundWorker
 
 class FoodCostingCalculator:
+    # Views unused for this long are destroyed, checked once a minute
+    VIEW_IDLE_SECONDS = 10 * 60
+    VIEW_CHECK_MS = 60 * 1000
+    # How often to look for changes saved by other terminals sharing the data files,
+    # and the views refreshed on screen when there are some
+    DATA_CHECK_MS = 2 * 1000
+    LIVE_VIEWS = ("ingredients", "recipes")
+    
     def __init__(self):
         # Set appearance mode and color theme
         ctk.set_appearance_mode("dark")
@@ -22,6 +32,9 @@ class FoodCostingCalculator:
         self.root.geometry("1400x900")
         self.root.configure(fg_color="#1e1e1e")
         
+        # Data handler calls run on this worker so the window never waits on storage
+        self.worker = BackgroundWorker(self.root, on_busy=self._on_busy)
+        
         # Configure grid weights
         self.root.grid_columnconfigure(1, weight=1)
         self.root.grid_rowconfigure(0, weight=1)
@@ -31,6 +44,10 @@ class FoodCostingCalculator:
         
         self._create_widgets()
         self._setup_layout()
+        self._register_views()
+        self.root.after(self.VIEW_CHECK_MS, self._evict_idle_views)
+        self.data_version = self.data_handler.data_version()
+        self.root.after(self.DATA_CHECK_MS, self._watch_data)
         
         # Show dashboard by default
         self._show_dashboard()
@@ -121,6 +138,14 @@ class FoodCostingCalculator:
             height=40
         )
         
+        # Shown while data handler calls are running
+        self.busy_label = ctk.CTkLabel(
+            self.sidebar,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color="#cccccc"
+        )
+        
         # Main content area
         self.main_frame = ctk.CTkFrame(self.root, fg_color="transparent")
         
@@ -234,7 +259,8 @@ class FoodCostingCalculator:
         self.about_btn.grid(row=5, column=0, padx=15, pady=(0, 8), sticky="ew")
         self.help_btn.grid(row=6, column=0, padx=15, pady=(0, 8), sticky="ew")
         
-        self.exit_btn.grid(row=7, column=0, padx=15, pady=(0, 20), sticky="ew")
+        self.exit_btn.grid(row=7, column=0, padx=15, pady=(0, 8), sticky="ew")
+        self.busy_label.grid(row=8, column=0, padx=15, pady=(0, 12))
         
         # Main content area - reduced padding
         self.main_frame.grid(row=0, column=1, sticky="nsew", padx=15, pady=15)
@@ -270,76 +296,80 @@ class FoodCostingCalculator:
         self.quick_about_btn.grid(row=4, column=0, padx=30, pady=(0, 10), sticky="ew")
         self.quick_help_btn.grid(row=5, column=0, padx=30, pady=(0, 15), sticky="ew")
     
+    def _register_views(self):
+        """Register the views, each built on first visit and reused afterwards"""
+        self.views = ViewManager()
+        self.views.register("dashboard", lambda: self.dashboard_frame, keep=True)
+        self.views.register("ingredients", lambda: IngredientsFrame(
+            self.main_frame,
+            self.data_handler,
+            on_refresh_callback=self._on_data_refreshed,
+            worker=self.worker
+        ))
+        self.views.register("recipes", lambda: RecipesFrame(
+            self.main_frame,
+            self.data_handler,
+            on_refresh_callback=self._on_data_refreshed,
+            worker=self.worker
+        ))
+        self.views.register("calculator", lambda: CalculatorFrame(
+            self.main_frame,
+            self.data_handler,
+            on_refresh_callback=self._on_data_refreshed,
+            worker=self.worker
+        ))
+        self.views.register("about", lambda: AboutFrame(self.main_frame))
+        self.views.register("help", lambda: HelpFrame(self.main_frame))
+    
     def _show_dashboard(self):
         """Show dashboard view"""
-        self._hide_current_frame()
-        self._update_navigation_buttons("dashboard")
         self._update_dashboard_stats()
-        self.dashboard_frame.grid()
-        self.current_frame = self.dashboard_frame
+        self._show_view("dashboard")
     
     def _show_ingredients(self):
         """Show ingredients management view"""
-        self._hide_current_frame()
-        self._update_navigation_buttons("ingredients")
-        
-        ingredients_frame = IngredientsFrame(
-            self.main_frame,
-            self.data_handler,
-            on_refresh_callback=self._on_data_refreshed
-        )
-        ingredients_frame.grid(row=0, column=0, sticky="nsew")
-        self.current_frame = ingredients_frame
+        self._show_view("ingredients")
     
     def _show_recipes(self):
         """Show recipes view"""
-        self._hide_current_frame()
-        self._update_navigation_buttons("recipes")
-        
-        recipes_frame = RecipesFrame(
-            self.main_frame,
-            self.data_handler,
-            on_refresh_callback=self._on_data_refreshed
-        )
-        recipes_frame.grid(row=0, column=0, sticky="nsew")
-        self.current_frame = recipes_frame
+        self._show_view("recipes")
     
     def _show_calculator(self):
         """Show calculator view"""
-        self._hide_current_frame()
-        self._update_navigation_buttons("calculator")
-        
-        calculator_frame = CalculatorFrame(
-            self.main_frame,
-            self.data_handler,
-            on_refresh_callback=self._on_data_refreshed
-        )
-        calculator_frame.grid(row=0, column=0, sticky="nsew")
-        self.current_frame = calculator_frame
+        self._show_view("calculator")
     
     def _show_about(self):
         """Show About view"""
-        self._hide_current_frame()
-        self._update_navigation_buttons("about")
-        
-        about_frame = AboutFrame(self.main_frame)
-        about_frame.grid(row=0, column=0, sticky="nsew")
-        self.current_frame = about_frame
+        self._show_view("about")
     
     def _show_help(self):
         """Show Help view"""
-        self._hide_current_frame()
-        self._update_navigation_buttons("help")
-        
-        help_frame = HelpFrame(self.main_frame)
-        help_frame.grid(row=0, column=0, sticky="nsew")
-        self.current_frame = help_frame
+        self._show_view("help")
+    
+    def _show_view(self, name: str):
+        """Show a view, reusing it if it was built before"""
+        self._update_navigation_buttons(name)
+        self.current_frame = self.views.show(name)
     
-    def _hide_current_frame(self):
-        """Hide the current active frame"""
-        if self.current_frame:
-            self.current_frame.grid_remove()
-            self.current_frame = None
+    def _evict_idle_views(self):
+        """Free the views that haven't been shown for a while"""
+        self.views.evict_idle(self.VIEW_IDLE_SECONDS)
+        self.root.after(self.VIEW_CHECK_MS, self._evict_idle_views)
+    
+    def _watch_data(self):
+        """Refresh the view on screen if the data changed, e.g. on another terminal.
+        
+        Only a small version file is read, never the data files themselves. Hidden
+        views catch up when next shown, and the calculator isn't refreshed under
+        the user so its ticked ingredients stay put."""
+        version = self.data_handler.data_version()
+        if version != self.data_version:
+            self.data_version = version
+            if self.views.current == "dashboard":
+                self._update_dashboard_stats()
+            elif self.views.current in self.LIVE_VIEWS:
+                self.current_frame.refresh_display()
+        self.root.after(self.DATA_CHECK_MS, self._watch_data)
     
     def _update_navigation_buttons(self, active_view: str):
         """Update navigation button states"""
@@ -362,15 +392,22 @@ class FoodCostingCalculator:
     
     def _update_dashboard_stats(self):
         """Update dashboard statistics"""
-        ingredients = self.data_handler.get_all_ingredients()
-        recipes = self.data_handler.get_all_recipes()
-        
-        total_ingredients = len(ingredients)
-        total_recipes = len(recipes)
-        
+        self.worker.submit(
+            lambda: (self.data_handler.count_ingredients(), self.data_handler.count_recipes()),
+            key="dashboard stats",
+            on_done=self._show_dashboard_stats
+        )
+    
+    def _show_dashboard_stats(self, totals):
+        total_ingredients, total_recipes = totals
         self.total_ingredients_label.configure(text=f"Total Ingredients: {total_ingredients}")
         self.total_recipes_label.configure(text=f"Total Recipes: {total_recipes}")
     
+    def _on_busy(self, busy: bool):
+        """Show that data handler calls are running"""
+        self.busy_label.configure(text="Working..." if busy else "")
+        self.root.configure(cursor="watch" if busy else "")
+    
     def _on_data_refreshed(self):
         """Callback when data is refreshed"""
         self._update_dashboard_stats()
@@ -378,6 +415,7 @@ class FoodCostingCalculator:
     def run(self):
         """Start the application"""
         self.root.mainloop()
+        self.data_handler.close()
 
 if __name__ == "__main__":
     app = FoodCostingCalculator()
@@ -0,0 +1,141 @@
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Tuple
+
+class Record(MutableMapping):
+    """A table row kept in __slots__, with its numeric fields parsed once.
+
+    Records also act as the Dict[str, str] rows the app used to pass around:
+    indexing by CSV header returns the value as text, so older callers keep
+    working while newer code reads typed attributes like ingredient.price."""
+    __slots__ = ()
+    # (CSV header, attribute, type) per column; type is float, int or str
+    FIELDS: Tuple[Tuple[str, str, type], ...] = ()
+    # CSV header -> (attribute, type), filled in for each subclass
+    _COLUMNS: Dict[str, Tuple[str, type]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._COLUMNS = {header: (attr, kind) for header, attr, kind in cls.FIELDS}
+
+    def __init__(self, **values):
+        for _, attr, kind in self.FIELDS:
+            setattr(self, attr, self._parse(kind, values.get(attr)))
+
+    @classmethod
+    def from_row(cls, row: Dict[str, str]) -> "Record":
+        """Build a record from a row keyed by CSV header, e.g. from csv.DictReader"""
+        record = cls.__new__(cls)
+        for header, attr, kind in cls.FIELDS:
+            setattr(record, attr, cls._parse(kind, row.get(header)))
+        return record
+
+    def copy(self) -> "Record":
+        """Return a shallow copy of the record"""
+        record = self.__class__.__new__(self.__class__)
+        for _, attr, _ in self.FIELDS:
+            setattr(record, attr, getattr(self, attr))
+        return record
+
+    def to_row(self) -> Dict[str, str]:
+        """Return the record as a plain row keyed by CSV header, for storage"""
+        return {header: self._format(getattr(self, attr)) for header, attr, _ in self.FIELDS}
+
+    @staticmethod
+    def _parse(kind: type, value):
+        """Convert a stored value to its field type; blanks become None and
+        values that don't parse are kept as text so nothing is lost"""
+        if value is None or value == "":
+            return "" if kind is str else None
+        if type(value) is kind:
+            return value
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            return str(value)
+
+    @staticmethod
+    def _format(value) -> str:
+        if value is None:
+            return ""
+        return value if isinstance(value, str) else str(value)
+
+    # ===== DICT COMPATIBILITY =====
+
+    def __getitem__(self, key: str) -> str:
+        return self._format(getattr(self, self._COLUMNS[key][0]))
+
+    def __setitem__(self, key: str, value):
+        attr, kind = self._COLUMNS[key]
+        setattr(self, attr, self._parse(kind, value))
+
+    def __delitem__(self, key: str):
+        raise TypeError(f"{type(self).__name__} fields can't be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._COLUMNS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_row()!r})"
+
+
+class Ingredient(Record):
+    __slots__ = ("name", "price", "grams", "price_per_gram", "grams_needed", "cost_per_recipe", "id")
+    FIELDS = (
+        ("Ingredient Name", "name", str),
+        ("Price", "price", float),
+        ("Grams", "grams", float),
+        ("Price per Gram", "price_per_gram", float),
+        ("Grams Needed in Recipe", "grams_needed", float),
+        ("Cost per Recipe", "cost_per_recipe", float),
+        ("ID", "id", int),
+    )
+
+
+class Recipe(Record):
+    __slots__ = ("name", "total_ingredient_cost", "misc_cost", "labor_cost", "total_cost",
+                 "selling_price", "margin_percentage", "profit", "ingredients_used", "id")
+    FIELDS = (
+        ("Recipe Name", "name", str),
+        ("Total Ingredient Cost", "total_ingredient_cost", float),
+        ("Miscellaneous Cost (50%)", "misc_cost", float),
+        ("Labor Cost (45%)", "labor_cost", float),
+        ("Total Cost", "total_cost", float),
+        ("Suggested Selling Price", "selling_price", float),
+        ("Margin Percentage", "margin_percentage", float),
+        ("Profit", "profit", float),
+        ("Ingredients Used", "ingredients_used", str),
+        ("ID", "id", int),
+    )
+
+
+class RecipeLine(Record):
+    """An ingredient with its grams, or a sub-recipe with its quantity, used by a recipe"""
+    __slots__ = ("recipe_id", "ingredient_id", "grams", "sub_recipe_id", "quantity", "id")
+    FIELDS = (
+        ("Recipe ID", "recipe_id", int),
+        ("Ingredient ID", "ingredient_id", int),
+        ("Grams", "grams", float),
+        ("Sub-Recipe ID", "sub_recipe_id", int),
+        ("Quantity", "quantity", float),
+        ("ID", "id", int),
+    )
+
+
+RECORD_TYPES = {
+    "ingredients": Ingredient,
+    "recipes": Recipe,
+    "recipe_lines": RecipeLine
+}
+
+
+def number(row, field: str, default: float = 0.0) -> float:
+    """Return a numeric field of a record, or parse it from a plain dict row"""
+    if isinstance(row, Record):
+        value = getattr(row, row._COLUMNS[field][0])
+        if value is None:
+            return default
+        return value if isinstance(value, (int, float)) else float(value)
+    return float(row.get(field) or default)
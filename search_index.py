@@ -0,0 +1,186 @@
+import heapq
+import math
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from records import Record
+
+class TrigramIndex:
+    """Trigram index over record names for substring and typo-tolerant search.
+
+    Each normalized name, padded as "  name ", is split into its three-character
+    grams and every gram maps to the IDs of the names containing it. A substring
+    query only checks the names holding all of its grams, and names sharing
+    enough grams with the query count as misspellings of it. Records are added
+    and removed one at a time as the table changes.
+
+    The names are also kept sorted by length and then name. A search with a limit
+    that enough names start with takes the shortest of them, found by bisecting
+    the names of each length, without looking at the other matches. Misspellings
+    are first looked for among the few names sharing many grams with the query,
+    and the rest are only scored if too few of those are found. Otherwise a
+    search ranks every name containing the query, so it takes time in proportion
+    to how many there are."""
+    # Least share of the query's grams a name needs to count as a misspelling
+    THRESHOLD = 0.3
+    # Shares of grams looked for first, as names sharing more of them are fewer
+    SIMILARITY_LEVELS = (0.6, 0.45)
+
+    def __init__(self, records: Iterable[Record], normalize: Callable[[str], str]):
+        self.normalize = normalize
+        self.records: Dict[int, Record] = {}
+        self.names: Dict[int, str] = {}
+        # Gram -> IDs of the names containing it, and ID -> number of grams of its name
+        self.postings: Dict[str, Set[int]] = {}
+        self.gram_counts: Dict[int, int] = {}
+        for record in records:
+            self._index(record)
+        # Name length -> (name, ID) of the names that long, sorted
+        self.by_length: Dict[int, List[Tuple[str, int]]] = {}
+        for record_id, name in self.names.items():
+            self.by_length.setdefault(len(name), []).append((name, record_id))
+        for names in self.by_length.values():
+            names.sort()
+
+    @staticmethod
+    def grams(text: str, padded: bool = True) -> Set[str]:
+        """Return the trigrams of a normalized text, padded to mark where it starts and ends"""
+        if padded:
+            text = f"  {text} "
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, record: Record):
+        name = self._index(record)
+        insort(self.by_length.setdefault(len(name), []), (name, record.id))
+
+    def _index(self, record: Record) -> str:
+        name = self.normalize(record.name)
+        grams = self.grams(name)
+        self.records[record.id] = record
+        self.names[record.id] = name
+        self.gram_counts[record.id] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(record.id)
+        return name
+
+    def remove(self, record: Record):
+        name = self.names.pop(record.id, None)
+        if name is None:
+            return
+        names = self.by_length[len(name)]
+        del names[bisect_left(names, (name, record.id))]
+        if not names:
+            del self.by_length[len(name)]
+        del self.records[record.id]
+        del self.gram_counts[record.id]
+        for gram in self.grams(name):
+            posting = self.postings[gram]
+            posting.discard(record.id)
+            if not posting:
+                del self.postings[gram]
+
+    def containing(self, query: str) -> Set[int]:
+        """Return the IDs of the names containing query (normalized like the names)"""
+        query = self.normalize(query)
+        if len(query) < 3:
+            # Too short to have a trigram of its own
+            return {record_id for record_id, name in self.names.items() if query in name}
+        postings = sorted((self.postings.get(gram, set()) for gram in self.grams(query, padded=False)), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return {record_id for record_id in candidates if query in self.names[record_id]}
+
+    def search(self, query: str, limit: Optional[int] = None, fuzzy: bool = True) -> List[Record]:
+        """Return the records matching query, best first.
+
+        Names containing query come first: an exact match, then names starting with
+        it, then names with a word starting with it, then the rest by where query
+        appears. With fuzzy, names that don't contain query but share enough of its
+        trigrams follow, most similar first, so "tomatoe" or "chiken" still find
+        "Tomato" and "Chicken Breast"."""
+        query = self.normalize(query)
+        if not query:
+            records = self.records.values()
+            return list(records) if limit is None else list(records)[:limit]
+
+        if limit is not None:
+            ranked = self._shortest_starting_with(query, limit)
+            if ranked is not None:
+                return [self.records[record_id] for record_id in ranked]
+
+        matches = self.containing(query)
+        rank = lambda record_id: self._substring_rank(query, record_id)
+        if limit is None:
+            ranked = sorted(matches, key=rank)
+        else:
+            ranked = heapq.nsmallest(limit, matches, key=rank)
+        if fuzzy and (limit is None or len(ranked) < limit):
+            ranked.extend(self._similar(query, matches, None if limit is None else limit - len(ranked)))
+        return [self.records[record_id] for record_id in ranked]
+
+    def _shortest_starting_with(self, query: str, limit: int) -> Optional[List[int]]:
+        """Return the IDs of the limit best matches of query if at least that many names
+        start with it, else None.
+
+        Those names rank first, shortest first then by name, so no other match is
+        needed. The names of each length from the query's up are bisected for the
+        range starting with query until limit are found."""
+        ranked = []
+        # Past the names starting with query, e.g. "chocolatf" for "chocolate"
+        after = (query[:-1] + chr(ord(query[-1]) + 1),)
+        for length in sorted(self.by_length):
+            if length < len(query):
+                continue
+            names = self.by_length[length]
+            start = bisect_left(names, (query,))
+            end = min(bisect_left(names, after, start), start + limit - len(ranked))
+            ranked.extend(record_id for _, record_id in names[start:end])
+            if len(ranked) == limit:
+                return ranked
+        return None
+
+    def _substring_rank(self, query: str, record_id: int) -> tuple:
+        """Sort key of a name containing query: exact, prefix, word prefix, elsewhere"""
+        name = self.names[record_id]
+        position = name.find(query)
+        if name == query:
+            kind = 0
+        elif position == 0:
+            kind = 1
+        elif f" {query}" in name:
+            kind = 2
+        else:
+            kind = 3
+        return (kind, position, len(name), name, record_id)
+
+    def _similar(self, query: str, exclude: Set[int], limit: Optional[int]) -> List[int]:
+        """Return the IDs of names sharing at least THRESHOLD of query's trigrams, most similar first.
+
+        Similarity is shared grams over the grams of both, counting at most as many
+        of the name's grams as the query has, so a misspelled word still matches
+        within a longer name."""
+        grams = sorted(self.grams(query), key=lambda gram: len(self.postings.get(gram, ())))
+        postings = [self.postings.get(gram, set()) for gram in grams]
+        # With a limit, names at least as similar as each level are looked for first.
+        # Every name at least that similar is then found, so if there are limit of them
+        # the names below it can't be among the best.
+        levels = (self.SIMILARITY_LEVELS if limit is not None else ()) + (self.THRESHOLD,)
+        scored, seen = [], set()
+        for level in levels:
+            # Similarity is at most shared / len(grams), so a name this similar shares at
+            # least needed grams, and must hold one of the rarest len - needed + 1 of them.
+            # Only those postings are gathered rather than the common ones.
+            needed = max(1, math.ceil(level * len(grams) - 1e-9))
+            candidates = set().union(*postings[:len(grams) - needed + 1]) - exclude - seen
+            seen |= candidates
+            # Grams each candidate shares with query, counted a posting at a time
+            counts = Counter()
+            for posting in postings:
+                counts.update(candidates.intersection(posting))
+            for record_id, shared in counts.items():
+                similarity = shared / (len(grams) + min(self.gram_counts[record_id], len(grams)) - shared)
+                if similarity >= self.THRESHOLD:
+                    scored.append((-similarity, self.names[record_id], record_id))
+            if limit is not None and sum(score <= -level for score, _, _ in scored) >= limit:
+                break
+        scored = sorted(scored) if limit is None else heapq.nsmallest(limit, scored)
+        return [record_id for _, _, record_id in scored]
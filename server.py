@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Local HTTP/JSON service for Food Costing Calculator
+Shares one in-memory catalog among POS terminals and other local clients
+
+Usage:
+    python server.py
+    python server.py --port 8765 --db foodcost.db
+
+Endpoints:
+    GET  /ingredients?q=flour&sort=Price&desc=1&offset=0&limit=50
+    GET  /ingredients?name=Flour     exact name lookup, e.g. for a price
+    GET  /ingredients/<id>
+    GET  /recipes?q=cake&offset=0&limit=50
+    GET  /recipes/<id>
+    POST /cost      {"name": "Cake", "margin": 150, "items": [{"name": "Flour", "grams": 200},
+                     {"name": "Sponge", "quantity": 2}]}
+    POST /recipes   the same body; the recipe is costed and saved
+
+Items name a catalog ingredient, costed for grams (its Grams Needed in Recipe if
+omitted), or a saved recipe used as a sub-recipe, quantity batches of it (default 1).
+"""
+
+import argparse
+import json
+import sys
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from data_handler import DataHandler
+from records import RECORD_TYPES
+from storage import CsvStorage, SqliteStorage
+
+class CostingServer(ThreadingHTTPServer):
+    """HTTP server sharing one DataHandler, and so one in-memory catalog, among clients.
+    
+    GET responses carry an ETag built from the versions of the table they were read
+    from. A request whose If-None-Match still matches gets an empty 304, and the
+    encoded body of recent GETs is kept, so repeating one costs a version check
+    until the data changes, here or through another process sharing the files."""
+    
+    daemon_threads = True
+    # Encoded GET responses kept, least recently used dropped first
+    MAX_CACHED = 1024
+    
+    def __init__(self, address: Tuple[str, int], data_handler: DataHandler, log: bool = False):
+        super().__init__(address, CostingRequestHandler)
+        self.data_handler = data_handler
+        self.log = log
+        # Tells ETags of this run from those of earlier runs, whose versions restarted
+        self.instance = uuid.uuid4().hex[:8]
+        # Request path -> ETag and body of its last response
+        self._responses: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._responses_lock = Lock()
+    
+    def warm(self):
+        """Load the tables and build the name and search indexes before the first request"""
+        self.data_handler.get_all_ingredients()
+        self.data_handler.get_all_recipes()
+        self.data_handler.ingredient_exists("")
+        self.data_handler.search_ingredients("warm", limit=1)
+        self.data_handler.search_recipes("warm", limit=1)
+    
+    def etag(self, table: str) -> str:
+        """Return the ETag of responses read from a table in its current state"""
+        version = hash(self.data_handler.table_version(table)) & 0xffffffffffff
+        return f'"{self.instance}-{table}-{version:x}"'
+    
+    def cached(self, path: str, etag: str) -> Optional[bytes]:
+        """Return the body last sent for path if it was built at this ETag"""
+        with self._responses_lock:
+            entry = self._responses.get(path)
+            if entry is None or entry[0] != etag:
+                return None
+            self._responses.move_to_end(path)
+            return entry[1]
+    
+    def cache(self, path: str, etag: str, body: bytes):
+        with self._responses_lock:
+            self._responses[path] = (etag, body)
+            self._responses.move_to_end(path)
+            while len(self._responses) > self.MAX_CACHED:
+                self._responses.popitem(last=False)
+
+
+class CostingRequestHandler(BaseHTTPRequestHandler):
+    """Serves the endpoints listed in the module docstring as JSON"""
+    
+    # HTTP/1.1 keeps connections open between requests; no Nagle delay on small replies
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "FoodCostingCalculator/1.0"
+    
+    TABLES = ("ingredients", "recipes")
+    
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if not parts or parts[0] not in self.TABLES or len(parts) > 2:
+            self._send_error(404, f"No such resource: {url.path}")
+            return
+        
+        table = parts[0]
+        etag = self.server.etag(table)
+        if etag in self.headers.get("If-None-Match", ""):
+            self._send(304, None, etag)
+            return
+        body = self.server.cached(self.path, etag)
+        if body is None:
+            try:
+                if len(parts) == 2:
+                    payload = self._get_record(table, parts[1])
+                else:
+                    payload = self._list(table, parse_qs(url.query))
+            except LookupError as e:
+                self._send_error(404, str(e))
+                return
+            except ValueError as e:
+                self._send_error(400, str(e))
+                return
+            body = json.dumps(payload).encode("utf-8")
+            self.server.cache(self.path, etag, body)
+        self._send(200, body, etag)
+    
+    def do_POST(self):
+        url = urlsplit(self.path)
+        # Read the body first so the connection stays in step whatever is answered
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body can't be told from the next request, so the connection is dropped
+            self.close_connection = True
+            self._send_error(400, "Content-Length must be a whole number")
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_error(400, "Body is not valid JSON")
+            return
+        if url.path not in ("/cost", "/recipes"):
+            self._send_error(404, f"No such resource: {url.path}")
+            return
+        
+        save = url.path == "/recipes"
+        try:
+            name, items, margin = self._recipe(request, save)
+        except (TypeError, ValueError) as e:
+            self._send_error(400, str(e))
+            return
+        result = self.server.data_handler.calculate_recipe_cost(
+            name, items, save_recipe=save, margin_percentage=margin
+        )
+        if not result:
+            self._send_error(500, "Error calculating recipe cost")
+            return
+        self._send_json(201 if save else 200, result)
+    
+    def _get_record(self, table: str, record_id: str) -> Dict[str, str]:
+        data_handler = self.server.data_handler
+        try:
+            record_id = int(record_id)
+        except ValueError:
+            raise LookupError(f"No such {table[:-1]}: {record_id}")
+        record = data_handler.get_ingredient(record_id) if table == "ingredients" else data_handler.get_recipe(record_id)
+        if record is None:
+            raise LookupError(f"No such {table[:-1]}: {record_id}")
+        return dict(record)
+    
+    def _list(self, table: str, params: Dict[str, List[str]]) -> Dict:
+        """Return a page of a table: all of it, the matches of a search or an exact name"""
+        data_handler = self.server.data_handler
+        param = lambda key, default=None: params.get(key, [default])[0]
+        if table == "ingredients" and param("name") is not None:
+            ingredient = data_handler.get_ingredient_by_name(param("name"))
+            records = [] if ingredient is None else [ingredient]
+            return {"total": len(records), table: [dict(record) for record in records]}
+        
+        sort_key = param("sort")
+        if sort_key not in (None, DataHandler.BEST_MATCH) and sort_key not in RECORD_TYPES[table]._COLUMNS:
+            raise ValueError(f"Can't sort {table} by {sort_key!r}")
+        try:
+            offset, limit = int(param("offset", 0)), int(param("limit", 50))
+        except ValueError:
+            raise ValueError("offset and limit must be whole numbers")
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit can't be negative")
+        descending = param("desc", "0").lower() in ("1", "true", "yes")
+        query = data_handler.query_ingredients if table == "ingredients" else data_handler.query_recipes
+        records, total = query(param("q") or None, sort_key, offset, limit, descending)
+        return {"total": total, table: [dict(record) for record in records]}
+    
+    def _recipe(self, request: Dict, save: bool) -> Tuple[str, List, float]:
+        """Return the name, ingredients used and margin of a recipe posted as JSON"""
+        if not isinstance(request, dict):
+            raise ValueError("Expected a JSON object")
+        name = str(request.get("name") or "").strip()
+        if save and not name:
+            raise ValueError("A saved recipe needs a name")
+        try:
+            margin = float(request.get("margin", 150.0))
+        except (TypeError, ValueError):
+            raise ValueError("margin must be a number")
+        
+        items, missing = [], []
+        for entry in request.get("items") or []:
+            if not isinstance(entry, dict) or not entry.get("name"):
+                raise ValueError("Each item needs a name")
+            try:
+                item = self.server.data_handler.recipe_item(entry["name"], entry.get("grams"), entry.get("quantity"))
+            except (TypeError, ValueError):
+                raise ValueError(f"grams and quantity of {entry['name']} must be numbers above 0")
+            if item is None:
+                missing.append(entry["name"])
+            else:
+                items.append(item)
+        if missing:
+            raise ValueError(f"Unknown ingredients or recipes: {', '.join(missing)}")
+        if not items:
+            raise ValueError("A recipe needs at least one item")
+        return name, items, margin
+    
+    def _send_json(self, status: int, payload):
+        self._send(status, json.dumps(payload).encode("utf-8"))
+    
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {"error": message})
+    
+    def _send(self, status: int, body: Optional[bytes], etag: Optional[str] = None):
+        self.send_response(status)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        if etag is not None:
+            self.send_header("ETag", etag)
+            # Clients may keep responses but must revalidate them, which is cheap
+            self.send_header("Cache-Control", "no-cache")
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        if self.server.log:
+            super().log_message(format, *args)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the ingredient catalog and recipe costing over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--db", help="SQLite database to use instead of the CSV files")
+    parser.add_argument("--log", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+    
+    data_handler = DataHandler(SqliteStorage(args.db) if args.db else CsvStorage())
+    server = CostingServer((args.host, args.port), data_handler, log=args.log)
+    server.warm()
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        data_handler.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,805 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Iterator, List, Dict, Optional, Tuple, Hashable
+from locking import FileLock
+
+# ID is a persistent surrogate key; it goes last so older column layouts stay aligned
+INGREDIENT_FIELDS = [
+    "Ingredient Name", "Price", "Grams", "Price per Gram",
+    "Grams Needed in Recipe", "Cost per Recipe", "ID"
+]
+
+# Include Margin Percentage so saved recipes record the Target Margin used
+RECIPE_FIELDS = [
+    "Recipe Name", "Total Ingredient Cost", "Miscellaneous Cost (50%)",
+    "Labor Cost (45%)", "Total Cost", "Suggested Selling Price",
+    "Margin Percentage", "Profit", "Ingredients Used", "ID"
+]
+
+# One row per component of a recipe: an ingredient and the grams used, or a
+# sub-recipe and the quantity (number of batches) used
+RECIPE_LINE_FIELDS = ["Recipe ID", "Ingredient ID", "Grams", "Sub-Recipe ID", "Quantity", "ID"]
+
+TABLE_FIELDS = {
+    "ingredients": INGREDIENT_FIELDS,
+    "recipes": RECIPE_FIELDS,
+    "recipe_lines": RECIPE_LINE_FIELDS
+}
+
+
+def derive_recipe_lines(ingredients: List[Dict[str, str]], recipes: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Build recipe lines for recipes saved before lines existed.
+
+    Parses each recipe's comma-joined "Ingredients Used" against the catalog,
+    preferring the longest run of parts that names an ingredient so names that
+    themselves contain ", " survive. Grams come from the ingredient's
+    "Grams Needed in Recipe", the only amount recorded at the time; names
+    missing from the catalog get no line."""
+    def normalize(name: str) -> str:
+        return " ".join(name.split()).casefold()
+
+    catalog: Dict[str, Dict[str, str]] = {}
+    for ingredient in ingredients:
+        catalog.setdefault(normalize(ingredient.get("Ingredient Name", "")), ingredient)
+
+    lines = []
+    for recipe in recipes:
+        parts = (recipe.get("Ingredients Used") or "").split(", ")
+        start = 0
+        while start < len(parts):
+            for end in range(len(parts), start, -1):
+                ingredient = catalog.get(normalize(", ".join(parts[start:end])))
+                if ingredient is not None:
+                    lines.append({
+                        "Recipe ID": recipe["ID"],
+                        "Ingredient ID": ingredient["ID"],
+                        "Grams": ingredient.get("Grams Needed in Recipe", ""),
+                        "Sub-Recipe ID": "",
+                        "Quantity": "",
+                        "ID": str(len(lines) + 1)
+                    })
+                    start = end
+                    break
+            else:
+                start += 1
+    return lines
+
+
+class ChangeCounter:
+    """Number kept in a small file and bumped by every write to a data set.
+
+    Processes sharing the data read it to learn whether anything changed since
+    they last looked, without statting or parsing the data files. Bumps happen
+    while the data set's FileLock is held, and the file is replaced atomically,
+    so reading it needs no lock."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> int:
+        """Return the current count, 0 before the first write"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return int(file.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def bump(self):
+        """Add one to the count; call with the data set's FileLock held"""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(str(self.read() + 1))
+        os.replace(temp_path, self.path)
+
+
+class CsvStorage:
+    """Storage engine keeping each table in its own CSV file.
+
+    Rows are exchanged as Dict[str, str] keyed by the CSV header, exactly as
+    csv.DictReader returns them. Every row carries a unique "ID"; files written
+    before IDs existed are numbered once when first opened.
+
+    Updates and deletes are not applied to the CSV directly. They are appended
+    to a journal file next to it (e.g. ingredients.csv.journal), one JSON record
+    per line, and replayed on load. Once a journal grows past
+    journal_threshold bytes it is compacted into a fresh CSV on a background
+    thread, and close() compacts every journal left. While a journal exists,
+    appends go to it as well.
+
+    A journal starts with the generation of the CSV it applies to, a random ID
+    kept in e.g. ingredients.csv.generation and replaced whenever the CSV is
+    rewritten. Records are keyed by row ID, so replaying them again over their
+    own compaction changes nothing. A journal for another generation is an
+    error rather than being skipped, so its changes are never lost silently.
+
+    Several processes may share the files, e.g. terminals on a network volume.
+    Every access but signature() holds an advisory lock on ingredients_file +
+    ".lock", and every write bumps the ChangeCounter in ingredients_file +
+    ".version". The IDs of deleted rows are recorded in ingredients_file + ".ids"
+    so they aren't reused."""
+
+    def __init__(self, ingredients_file: str = "ingredients.csv", recipes_file: str = "recipes.csv",
+                 recipe_lines_file: str = "recipe_lines.csv", journal_threshold: int = 256 * 1024):
+        self.ingredients_file = ingredients_file
+        self.recipes_file = recipes_file
+        self.recipe_lines_file = recipe_lines_file
+        self.files = {
+            "ingredients": ingredients_file,
+            "recipes": recipes_file,
+            "recipe_lines": recipe_lines_file
+        }
+        self.journal_threshold = journal_threshold
+        # Guards the files against the background compaction thread and other processes
+        self._lock = FileLock(ingredients_file + ".lock")
+        self._changes = ChangeCounter(ingredients_file + ".version")
+        # Table -> the lowest ID never handed out, raised as rows are deleted
+        self.ids_file = ingredients_file + ".ids"
+        # Held through a whole compaction, so one process compacts at a time
+        self._compaction_lock = FileLock(ingredients_file + ".compact.lock")
+        self._compacting = set()
+        # File stats last seen per table and a token bumped whenever they change
+        # behind our back; our own writes and compactions keep the token stable
+        self._stats: Dict[str, tuple] = {}
+        self._tokens: Dict[str, int] = {}
+        # Bumped whenever a CSV is replaced, so a compaction racing a rewrite gives up
+        self._rewrites: Dict[str, int] = {}
+        self._ensure_files_exist()
+
+    def _ensure_files_exist(self):
+        """Create CSV files with headers if they don't exist, bring old ones up to the
+        current columns and derive recipe lines for recipes saved before lines existed"""
+        with self._lock:
+            self._prepare_files()
+
+    def _prepare_files(self):
+        created = set()
+        for table, path in self.files.items():
+            if not os.path.exists(path):
+                with open(path, 'w', newline='', encoding='utf-8') as file:
+                    writer = csv.writer(file)
+                    writer.writerow(TABLE_FIELDS[table])
+                created.add(table)
+                continue
+            with open(path, 'r', newline='', encoding='utf-8') as file:
+                header = next(csv.reader(file), [])
+            if "ID" not in header:
+                self._assign_ids(table)
+            elif set(TABLE_FIELDS[table]) - set(header):
+                # Rewrite with the current header so appended rows line up with it
+                self.write_rows(table, self.load(table))
+        if "recipe_lines" in created and "recipes" not in created:
+            lines = derive_recipe_lines(self.load("ingredients"), self.load("recipes"))
+            if lines:
+                self.write_rows("recipe_lines", lines)
+
+    def _assign_ids(self, table: str):
+        """Number the rows of a CSV written before rows had IDs, folding any journal.
+
+        Journals of that era address rows by position."""
+        with open(self.files[table], 'r', newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        for record in self._read_journal(table):
+            op = record.get("op")
+            if op == "append":
+                rows.append(record["row"])
+            elif op == "update":
+                rows[record["index"]] = record["row"]
+            elif op == "delete":
+                for index in sorted(record["indexes"], reverse=True):
+                    rows.pop(index)
+        for number, row in enumerate(rows, 1):
+            row["ID"] = str(number)
+        self.write_rows(table, rows)
+
+    def journal_file(self, table: str) -> str:
+        """Return the path of a table's change journal"""
+        return self.files[table] + ".journal"
+
+    def generation_file(self, table: str) -> str:
+        """Return the path of the file holding the generation of a table's CSV"""
+        return self.files[table] + ".generation"
+
+    def _generation(self, table: str) -> str:
+        """Return the generation of a table's CSV, starting one if it has none"""
+        try:
+            with open(self.generation_file(table), 'r', encoding='utf-8') as file:
+                generation = file.read().strip()
+        except FileNotFoundError:
+            generation = ""
+        return generation or self._new_generation(table)
+
+    def _new_generation(self, table: str) -> str:
+        """Give a table's CSV a fresh generation, so no earlier journal applies to it"""
+        generation = uuid.uuid4().hex
+        path = self.generation_file(table)
+        with open(path + ".tmp", 'w', encoding='utf-8') as file:
+            file.write(generation)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+        return generation
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        """Return the (mtime, size) pair of a file, or None if it doesn't exist"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _table_stats(self, table: str) -> tuple:
+        return (self._stat(self.files[table]), self._stat(self.journal_file(table)))
+
+    def signature(self, table: str) -> Hashable:
+        """Return a token that changes whenever the table's files change externally.
+
+        Taken without the lock, so reads of cached tables don't queue behind each
+        other or behind other processes. Stats caught halfway through a write only
+        make the token change once more than needed, i.e. an extra reload; callers
+        take the signature before loading, so it is never newer than their rows."""
+        stats = self._table_stats(table)
+        if self._stats.get(table) != stats:
+            self._stats[table] = stats
+            self._tokens[table] = self._tokens.get(table, 0) + 1
+        return self._tokens.get(table, 0)
+
+    def _wrote(self, table: str):
+        """Record our own write so it isn't mistaken for an external change, and tell
+        other processes something changed"""
+        self._stats[table] = self._table_stats(table)
+        self._changes.bump()
+
+    def locked(self) -> FileLock:
+        """Return the lock every access holds, to keep a read-modify-write spanning
+        several calls from interleaving with other threads and processes"""
+        return self._lock
+
+    def version(self) -> int:
+        """Return a number that grows with every write by any process sharing the files"""
+        return self._changes.read()
+
+    def next_id(self, table: str) -> int:
+        """Return the lowest ID no deleted row of a table had, 0 if none was deleted"""
+        with self._lock:
+            return self._read_ids().get(table, 0)
+
+    def reserve_ids(self, table: str, next_id: int):
+        """Record that IDs below next_id stay taken, even once their rows are deleted"""
+        with self._lock:
+            ids = self._read_ids()
+            if next_id <= ids.get(table, 0):
+                return
+            ids[table] = next_id
+            temp_path = self.ids_file + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(ids, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.ids_file)
+
+    def _read_ids(self) -> Dict[str, int]:
+        try:
+            with open(self.ids_file, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def load(self, table: str) -> List[Dict[str, str]]:
+        """Parse every row of a table and replay its journal"""
+        with self._lock:
+            return self._replay(table)
+
+    def iter_rows(self, table: str) -> Iterator[Dict[str, str]]:
+        """Yield the rows of a table in the same order as load(), reading the CSV as it goes.
+
+        Only the journal, which compaction keeps small, is held in memory; the CSV
+        is streamed row by row. The file is opened together with reading the journal,
+        so a compaction replacing it meanwhile doesn't change what is yielded."""
+        with self._lock:
+            file = open(self.files[table], 'r', newline='', encoding='utf-8')
+            try:
+                records = self._read_journal(table)
+            except Exception:
+                file.close()
+                raise
+        # CSV row ID -> its replacement, or None once deleted; rows added at the end
+        overrides: Dict[str, Optional[Dict[str, str]]] = {}
+        tail: Dict[str, Dict[str, str]] = {}
+        pending = list(reversed(records))
+        while pending:
+            record = pending.pop()
+            op = record.get("op")
+            if op == "batch":
+                pending.extend(reversed(record["changes"]))
+            elif op == "append":
+                # New rows always get an ID that isn't in the table
+                tail[record["row"]["ID"]] = record["row"]
+            elif op == "update":
+                row_id = record["row"]["ID"]
+                if row_id in tail:
+                    tail[row_id] = record["row"]
+                else:
+                    overrides[row_id] = record["row"]
+            elif op == "delete":
+                for row_id in map(str, record["ids"]):
+                    if tail.pop(row_id, None) is None:
+                        overrides[row_id] = None
+
+        with file:
+            for row in csv.DictReader(file):
+                row_id = row["ID"]
+                if row_id in overrides:
+                    row = overrides[row_id]
+                    if row is None:
+                        continue
+                yield row
+        yield from tail.values()
+
+    def _replay(self, table: str, journal_size: Optional[int] = None) -> List[Dict[str, str]]:
+        """Parse the CSV and apply the journal to it, up to journal_size bytes if given"""
+        path = self.files[table]
+        with open(path, 'r', newline='', encoding='utf-8') as file:
+            rows = {row["ID"]: row for row in csv.DictReader(file)}
+
+        for record in self._read_journal(table, journal_size):
+            self._apply(rows, record)
+        return list(rows.values())
+
+    def _apply(self, rows: Dict[str, Dict[str, str]], record: Dict):
+        """Apply one journal record to rows keyed by ID"""
+        op = record.get("op")
+        if op in ("append", "update"):
+            rows[record["row"]["ID"]] = record["row"]
+        elif op == "delete":
+            for row_id in record["ids"]:
+                rows.pop(str(row_id), None)
+        elif op == "batch":
+            for change in record["changes"]:
+                self._apply(rows, change)
+
+    def _read_journal(self, table: str, journal_size: Optional[int] = None) -> List[Dict]:
+        """Return the records of a table's journal.
+
+        Raises ValueError if the journal was started against another generation of
+        the CSV, e.g. one restored from a backup, leaving both files as they are."""
+        journal = self.journal_file(table)
+        if not os.path.exists(journal):
+            return []
+        with open(journal, 'r', encoding='utf-8') as file:
+            data = file.read() if journal_size is None else file.read(journal_size)
+
+        lines = data.splitlines()
+        records = []
+        for number, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                if number == len(lines) - 1:
+                    # Torn final record from an interrupted write, it never happened
+                    break
+                raise
+        if not records or records[0].get("op") != "base":
+            return []
+        base = records[0]
+        if "generation" in base:
+            current = base["generation"] == self._generation(table)
+        else:
+            # Journals from before generations name the CSV by its mtime and size
+            current = tuple(base.get("csv", ())) == self._stat(self.files[table])
+        if not current:
+            raise ValueError(f"{journal} holds changes to another version of {self.files[table]}; "
+                             f"move it aside to use the file without them")
+        return records[1:]
+
+    def _write_journal(self, table: str, record: Dict):
+        """Append one record to a table's journal, starting the journal if needed"""
+        with self._lock:
+            journal = self.journal_file(table)
+            lines = []
+            if not os.path.exists(journal):
+                lines.append(json.dumps({"op": "base", "generation": self._generation(table)}))
+            lines.append(json.dumps(record))
+            with open(journal, 'a', encoding='utf-8') as file:
+                file.write("\n".join(lines) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self._wrote(table)
+            journal_size = os.path.getsize(journal)
+
+        if journal_size > self.journal_threshold:
+            self._compact_in_background(table)
+
+    def append_row(self, table: str, row: Dict[str, str]):
+        """Append a single row to the end of a table"""
+        with self._lock:
+            if os.path.exists(self.journal_file(table)):
+                self._write_journal(table, {"op": "append", "row": row})
+                return
+            with open(self.files[table], 'a', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=TABLE_FIELDS[table], extrasaction='ignore')
+                writer.writerow(row)
+            self._wrote(table)
+
+    def update_row(self, table: str, row: Dict[str, str]):
+        """Journal a changed row, identified by its ID"""
+        self._write_journal(table, {"op": "update", "row": row})
+
+    def delete_rows(self, table: str, row_ids: List[int]):
+        """Journal the removal of the rows with the given IDs"""
+        with self._lock:
+            if row_ids:
+                self.reserve_ids(table, max(map(int, row_ids)) + 1)
+            self._write_journal(table, {"op": "delete", "ids": list(row_ids)})
+
+    def write_rows(self, table: str, rows: List[Dict[str, str]]):
+        """Rewrite an entire table using its canonical header and drop its journal"""
+        with self._lock:
+            self._write_csv(self.files[table], table, rows)
+            if os.path.exists(self.journal_file(table)):
+                os.remove(self.journal_file(table))
+            # Only a journal restored from a backup could still name the old generation
+            self._new_generation(table)
+            self._rewrites[table] = self._rewrites.get(table, 0) + 1
+            self._wrote(table)
+
+    def commit_batch(self, changes: List[tuple], tables: Dict[str, List[Dict[str, str]]]):
+        """Persist the changes buffered by DataHandler.batch().
+
+        changes are ("append", table, row), ("update", table, row) and
+        ("delete", table, row_ids) tuples in order; tables holds each touched
+        table's rows after all of them. A table that only gained rows and has no
+        journal gets them in a single append. A few changes to a larger table go
+        to its journal as one record, which replays all or nothing. Any other
+        table is rewritten once, atomically, which also folds its journal."""
+        with self._lock:
+            for op, table, arg in changes:
+                if op == "delete" and arg:
+                    self.reserve_ids(table, max(map(int, arg)) + 1)
+            for table, rows in tables.items():
+                table_changes = [change for change in changes if change[1] == table]
+                if (all(change[0] == "append" for change in table_changes)
+                        and not os.path.exists(self.journal_file(table))):
+                    with open(self.files[table], 'a', newline='', encoding='utf-8') as file:
+                        writer = csv.DictWriter(file, fieldnames=TABLE_FIELDS[table], extrasaction='ignore')
+                        writer.writerows(change[2] for change in table_changes)
+                        file.flush()
+                        os.fsync(file.fileno())
+                    self._wrote(table)
+                elif len(table_changes) * 4 <= len(rows):
+                    self._write_journal(table, {"op": "batch", "changes": [
+                        {"op": op, "ids": list(arg)} if op == "delete" else {"op": op, "row": arg}
+                        for op, _, arg in table_changes
+                    ]})
+                else:
+                    self.write_rows(table, rows)
+
+    def _write_csv(self, path: str, table: str, rows: List[Dict[str, str]]):
+        """Atomically replace a CSV file: write a temp file, fsync it, then os.replace"""
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=TABLE_FIELDS[table], extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+
+    # ===== COMPACTION =====
+
+    def close(self):
+        """Fold every table's journal into its CSV, so the files are self-contained"""
+        for table in self.files:
+            self.compact(table)
+
+    def _compact_in_background(self, table: str):
+        """Start compacting a table's journal unless a compaction is already running"""
+        with self._lock:
+            if table in self._compacting:
+                return
+            self._compacting.add(table)
+        thread = threading.Thread(target=self._run_compaction, args=(table,), daemon=True)
+        thread.start()
+
+    def _run_compaction(self, table: str):
+        try:
+            self.compact(table)
+        except Exception as e:
+            print(f"Error compacting {self.files[table]}: {e}")
+        finally:
+            with self._lock:
+                self._compacting.discard(table)
+
+    def compact(self, table: str):
+        """Fold a table's journal into a fresh CSV file.
+
+        The expensive rewrite runs without holding the lock; records journaled
+        meanwhile are carried over into a new journal based on the fresh CSV."""
+        with self._compaction_lock:
+            self._compact(table)
+
+    def _compact(self, table: str):
+        path = self.files[table]
+        journal = self.journal_file(table)
+        with self._lock:
+            if not os.path.exists(journal):
+                return
+            journal_size = os.path.getsize(journal)
+            rewrites = self._rewrites.get(table, 0)
+            csv_stat = self._stat(path)
+            generation = self._generation(table)
+
+        # Nothing but compaction rewrites the CSV while a journal exists, and the
+        # journal only grows, so its first journal_size bytes are stable
+        rows = self._replay(table, journal_size)
+        temp_path = path + ".compact"
+        with open(temp_path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=TABLE_FIELDS[table], extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+
+        with self._lock:
+            if self._rewrites.get(table, 0) != rewrites or self._stat(path) != csv_stat:
+                # The table was rewritten meanwhile, here or by another process, so
+                # this snapshot is obsolete
+                os.remove(temp_path)
+                return
+            external = self._stats.get(table) != self._table_stats(table)
+            with open(journal, 'r', encoding='utf-8') as file:
+                file.seek(journal_size)
+                tail = file.read()
+
+            if tail:
+                # The compacted CSV keeps the generation: if the old journal outlives it
+                # through a crash, replaying the old journal again changes nothing
+                temp_journal = journal + ".compact"
+                with open(temp_journal, 'w', encoding='utf-8') as file:
+                    file.write(json.dumps({"op": "base", "generation": generation}) + "\n" + tail)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temp_path, path)
+                os.replace(temp_journal, journal)
+            else:
+                os.replace(temp_path, path)
+                os.remove(journal)
+            self._rewrites[table] = rewrites + 1
+
+            if not external:
+                # The same rows as before, so this isn't counted as a change
+                self._stats[table] = self._table_stats(table)
+
+
+class SqliteStorage:
+    """Storage engine keeping every table in an indexed SQLite database.
+
+    Values are stored as text so rows round-trip exactly like the CSV engine;
+    a row's "ID" is the integer primary key. Single-row updates and deletes
+    touch only that row instead of rewriting the whole table. Writes hold an
+    advisory lock on db_file + ".lock" and bump the ChangeCounter in
+    db_file + ".version", like the CSV engine's. The id_counters table records
+    the IDs of deleted rows, in the deleting transaction, so they aren't reused."""
+
+    # CSV header -> SQLite column name
+    COLUMNS = {
+        "ingredients": {
+            "Ingredient Name": "name",
+            "Price": "price",
+            "Grams": "grams",
+            "Price per Gram": "price_per_gram",
+            "Grams Needed in Recipe": "grams_needed",
+            "Cost per Recipe": "cost_per_recipe"
+        },
+        "recipes": {
+            "Recipe Name": "name",
+            "Total Ingredient Cost": "total_ingredient_cost",
+            "Miscellaneous Cost (50%)": "misc_cost",
+            "Labor Cost (45%)": "labor_cost",
+            "Total Cost": "total_cost",
+            "Suggested Selling Price": "suggested_selling_price",
+            "Margin Percentage": "margin_percentage",
+            "Profit": "profit",
+            "Ingredients Used": "ingredients_used"
+        },
+        "recipe_lines": {
+            "Recipe ID": "recipe_id",
+            "Ingredient ID": "ingredient_id",
+            "Grams": "grams",
+            "Sub-Recipe ID": "sub_recipe_id",
+            "Quantity": "quantity"
+        }
+    }
+
+    # Indexed columns per table
+    INDEXES = {
+        "ingredients": {"name": "name COLLATE NOCASE"},
+        "recipes": {"name": "name COLLATE NOCASE"},
+        "recipe_lines": {"recipe_id": "recipe_id", "ingredient_id": "ingredient_id",
+                         "sub_recipe_id": "sub_recipe_id"}
+    }
+
+    def __init__(self, db_file: str = "foodcost.db"):
+        self.db_file = db_file
+        # DataHandler serializes access, so the connection may be shared across threads
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._lock = FileLock(db_file + ".lock")
+        self._changes = ChangeCounter(db_file + ".version")
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        """Create tables and indexes if they don't exist, deriving recipe lines for a
+        database created before lines existed"""
+        existing = {name for (name,) in self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )}
+        with self.connection:
+            for table, columns in self.COLUMNS.items():
+                column_defs = ", ".join(f"{column} TEXT" for column in columns.values())
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {column_defs})"
+                )
+                present = {row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+                for column in columns.values():
+                    if column not in present:
+                        self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+                for suffix, column in self.INDEXES[table].items():
+                    self.connection.execute(
+                        f"CREATE INDEX IF NOT EXISTS {table}_{suffix} ON {table} ({column})"
+                    )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS id_counters (name TEXT PRIMARY KEY, next_id INTEGER)"
+            )
+        if "recipes" in existing and "recipe_lines" not in existing:
+            lines = derive_recipe_lines(self.load("ingredients"), self.load("recipes"))
+            if lines:
+                self.write_rows("recipe_lines", lines)
+
+    def close(self):
+        """Close the database connection"""
+        self.connection.close()
+
+    def signature(self, table: str) -> Hashable:
+        """Return a value that changes whenever another connection commits"""
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def locked(self) -> FileLock:
+        """Return the lock writes hold, to keep a read-modify-write spanning several
+        calls from interleaving with other threads and processes"""
+        return self._lock
+
+    def version(self) -> int:
+        """Return a number that grows with every write by any process sharing the database"""
+        return self._changes.read()
+
+    def next_id(self, table: str) -> int:
+        """Return the lowest ID no deleted row of a table had, 0 if none was deleted"""
+        record = self.connection.execute(
+            "SELECT next_id FROM id_counters WHERE name = ?", (table,)
+        ).fetchone()
+        return record[0] if record else 0
+
+    def reserve_ids(self, table: str, next_id: int):
+        """Record that IDs below next_id stay taken, even once their rows are deleted"""
+        with self._lock:
+            with self.connection:
+                self._reserve_ids(table, next_id)
+            self._changes.bump()
+
+    def _reserve_ids(self, table: str, next_id: int):
+        self.connection.execute(
+            "INSERT INTO id_counters (name, next_id) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET next_id = max(next_id, excluded.next_id)",
+            (table, next_id)
+        )
+
+    def load(self, table: str) -> List[Dict[str, str]]:
+        """Read every row of a table in ID order"""
+        columns = self.COLUMNS[table]
+        cursor = self.connection.execute(
+            f"SELECT id, {', '.join(columns.values())} FROM {table} ORDER BY id"
+        )
+        rows = []
+        for record in cursor:
+            row = {field: value if value is not None else ""
+                   for field, value in zip(columns, record[1:])}
+            row["ID"] = str(record[0])
+            rows.append(row)
+        return rows
+
+    def iter_rows(self, table: str) -> Iterator[Dict[str, str]]:
+        """Yield the rows of a table in ID order, fetching them as they're consumed"""
+        columns = self.COLUMNS[table]
+        # A cursor of its own; DataHandler keeps writes on the shared connection from
+        # landing while it is consumed
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT id, {', '.join(columns.values())} FROM {table} ORDER BY id")
+        try:
+            while True:
+                records = cursor.fetchmany(1000)
+                if not records:
+                    break
+                for record in records:
+                    row = {field: value if value is not None else ""
+                           for field, value in zip(columns, record[1:])}
+                    row["ID"] = str(record[0])
+                    yield row
+        finally:
+            cursor.close()
+
+    def _values(self, table: str, row: Dict[str, str]) -> List[str]:
+        """Return a row's values in column order"""
+        return [str(row.get(field, "") or "") for field in self.COLUMNS[table]]
+
+    def append_row(self, table: str, row: Dict[str, str]):
+        """Insert a single row"""
+        self.commit_batch([("append", table, row)], {})
+
+    def update_row(self, table: str, row: Dict[str, str]):
+        """Update a row in place, identified by its ID"""
+        self.commit_batch([("update", table, row)], {})
+
+    def delete_rows(self, table: str, row_ids: List[int]):
+        """Delete the rows with the given IDs"""
+        self.commit_batch([("delete", table, row_ids)], {})
+
+    def commit_batch(self, changes: List[tuple], tables: Dict[str, List[Dict[str, str]]]):
+        """Apply a sequence of ("append" | "update" | "delete", table, ...) changes
+        in a single transaction"""
+        with self._lock:
+            with self.connection:
+                for change in changes:
+                    op, table, args = change[0], change[1], change[2:]
+                    getattr(self, "_" + op)(table, *args)
+            self._changes.bump()
+
+    def _append(self, table: str, row: Dict[str, str]):
+        columns = ["id"] + list(self.COLUMNS[table].values())
+        placeholders = ", ".join("?" for _ in columns)
+        self.connection.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            [int(row["ID"])] + self._values(table, row)
+        )
+
+    def _update(self, table: str, row: Dict[str, str]):
+        assignments = ", ".join(f"{column} = ?" for column in self.COLUMNS[table].values())
+        self.connection.execute(
+            f"UPDATE {table} SET {assignments} WHERE id = ?",
+            self._values(table, row) + [int(row["ID"])]
+        )
+
+    def _delete(self, table: str, row_ids: List[int]):
+        self.connection.executemany(
+            f"DELETE FROM {table} WHERE id = ?", [(int(row_id),) for row_id in row_ids]
+        )
+        if row_ids:
+            self._reserve_ids(table, max(map(int, row_ids)) + 1)
+
+    def write_rows(self, table: str, rows: List[Dict[str, str]]):
+        """Replace the entire contents of a table in one transaction"""
+        with self._lock:
+            with self.connection:
+                self.connection.execute(f"DELETE FROM {table}")
+                for row in rows:
+                    self._append(table, row)
+            self._changes.bump()
+
+
+def migrate_storage(source, target) -> Dict[str, int]:
+    """Copy every table from one storage engine into another, replacing its contents.
+
+    Used as the one-shot importer from the CSV files into SQLite:
+        migrate_storage(CsvStorage(), SqliteStorage("foodcost.db"))
+    Returns the number of rows copied per table."""
+    counts = {}
+    for table in TABLE_FIELDS:
+        rows = source.load(table)
+        target.write_rows(table, rows)
+        # IDs deleted at the source stay retired
+        target.reserve_ids(table, source.next_id(table))
+        counts[table] = len(rows)
+    return counts
@@ -0,0 +1,23 @@
+import os
+import sys
+import pytest
+
+# The modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_handler import DataHandler
+from storage import CsvStorage, SqliteStorage
+
+@pytest.fixture(params=["csv", "sqlite"])
+def make_storage(request, tmp_path):
+    """Return a factory opening the same fresh data set, as CSV files or SQLite"""
+    def make():
+        if request.param == "csv":
+            return CsvStorage(str(tmp_path / "ingredients.csv"), str(tmp_path / "recipes.csv"),
+                              str(tmp_path / "recipe_lines.csv"))
+        return SqliteStorage(str(tmp_path / "foodcost.db"))
+    return make
+
+@pytest.fixture
+def data_handler(make_storage):
+    return DataHandler(make_storage())
@@ -0,0 +1,137 @@
+import random
+import sys
+import threading
+import time
+from data_handler import DataHandler
+
+READERS = 8
+WRITERS = 8
+SECONDS = 1.5
+
+def run_threads(targets):
+    """Start the targets together, join them and return the errors they raised"""
+    errors = []
+    start = threading.Barrier(len(targets))
+    def run(target):
+        start.wait()
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+def test_readers_and_writers(make_storage, capsys):
+    data_handler = DataHandler(make_storage())
+    data_handler.add_ingredient({"Ingredient Name": "Flour", "Price": "2", "Grams": "1000",
+                                 "Grams Needed in Recipe": "100"})
+    stop = time.monotonic() + SECONDS
+
+    def writer(n):
+        rnd = random.Random(n)
+        while time.monotonic() < stop:
+            choice = rnd.random()
+            if choice < 0.4:
+                assert data_handler.add_ingredient({"Ingredient Name": f"W{n}-{rnd.random()}", "Price": "2",
+                                                    "Grams": "100", "Grams Needed in Recipe": "10"})
+            elif choice < 0.6:
+                page, _ = data_handler.query_ingredients(f"W{n}-", None, 0, 1)
+                if page:
+                    data_handler.update_ingredient_by_id(page[0].id, {
+                        "Ingredient Name": page[0].name, "Price": str(rnd.randint(1, 9)),
+                        "Grams": "100", "Grams Needed in Recipe": "10"
+                    })
+            elif choice < 0.75:
+                page, _ = data_handler.query_ingredients(f"W{n}-", None, 0, 1)
+                if page:
+                    assert data_handler.delete_ingredient_by_id(page[0].id)
+            elif choice < 0.9:
+                with data_handler.batch():
+                    for _ in range(3):
+                        data_handler.add_ingredient({"Ingredient Name": f"W{n}-{rnd.random()}", "Price": "1",
+                                                     "Grams": "10", "Grams Needed in Recipe": "1"})
+            else:
+                assert data_handler.calculate_recipe_cost(
+                    f"R{n}", [data_handler.recipe_item("Flour", grams=rnd.randint(1, 500))], save_recipe=True)
+
+    def reader(n):
+        while time.monotonic() < stop:
+            ingredients = data_handler.get_all_ingredients()
+            assert len({ingredient.id for ingredient in ingredients}) == len(ingredients)
+            page, total = data_handler.query_ingredients("w", "Price", 0, 20)
+            assert len(page) <= 20 and total >= len(page)
+            data_handler.search_ingredients("w1", limit=10)
+            assert data_handler.count_ingredients() >= 1
+            for recipe in data_handler.get_all_recipes():
+                for line in data_handler.get_recipe_lines(recipe.id):
+                    assert line.recipe_id == recipe.id
+
+    errors = run_threads([lambda n=n: writer(n) for n in range(WRITERS)]
+                         + [lambda n=n: reader(n) for n in range(READERS)])
+    assert errors == []
+    # DataHandler reports failures by printing them
+    assert "Error" not in capsys.readouterr().out
+
+    fresh = DataHandler(make_storage())
+    for table in ("ingredients", "recipes", "recipe_lines"):
+        cached = {record.id: dict(record) for record in data_handler._load_table(table).values()}
+        stored = {record.id: dict(record) for record in fresh._load_table(table).values()}
+        assert cached == stored, table
+
+def test_concurrent_first_reads_see_whole_indexes(make_storage):
+    storage = make_storage()
+    storage.write_rows("recipe_lines", [
+        {"Recipe ID": str(recipe_id), "Ingredient ID": str(line), "Grams": "10",
+         "Sub-Recipe ID": "", "Quantity": "", "ID": str(recipe_id * 20 + line)}
+        for recipe_id in range(1, 501) for line in range(20)
+    ])
+    storage.write_rows("ingredients", [
+        {"Ingredient Name": f"Item {n}", "Price": "1", "Grams": "100", "ID": str(n)} for n in range(1, 2001)
+    ])
+    # Switch threads often so they interleave while building the indexes
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(10):
+            # A fresh handler each time, so every thread finds the indexes unbuilt
+            data_handler = DataHandler(make_storage())
+            line_counts, names = [], []
+            errors = run_threads(
+                [lambda: line_counts.append(len(data_handler.get_recipe_lines(499)))] * 4
+                + [lambda: names.append(data_handler.get_ingredient_by_name("Item 1999"))] * 4
+            )
+            assert errors == []
+            assert line_counts == [20] * 4
+            assert [ingredient.id for ingredient in names] == [1999] * 4
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+def test_streamed_rows_never_see_half_a_write(make_storage):
+    storage = make_storage()
+    storage.write_rows("ingredients", [
+        {"Ingredient Name": f"Item {n}", "Price": "1", "Grams": "100", "ID": str(n)} for n in range(1, 3001)
+    ])
+    # A fresh handler streams storage rather than a cached snapshot
+    data_handler = DataHandler(make_storage())
+    rows = data_handler.iter_ingredients(("Price",))
+    prices = [next(rows)]
+
+    def reprice():
+        with data_handler.batch():
+            for ingredient in data_handler.get_all_ingredients():
+                data_handler._update_row("ingredients", ingredient.id, data_handler._ingredient_row({
+                    "Ingredient Name": ingredient.name, "Price": "2", "Grams": "100"
+                }))
+    writer = threading.Thread(target=reprice)
+    writer.start()
+    time.sleep(0.1)
+    # The write waits for the stream
+    assert writer.is_alive()
+    prices.extend(rows)
+    writer.join()
+    assert prices == [(1.0,)] * 3000
+    assert set(data_handler.iter_ingredients(("Price",))) == {(2.0,)}
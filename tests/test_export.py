@@ -0,0 +1,21 @@
+import csv
+import io
+from data_handler import DataHandler
+from foodcost import main
+from storage import CsvStorage
+
+def test_export_to_stdout_or_a_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    data_handler = DataHandler(CsvStorage())
+    for name in ("Flour", "Sugar"):
+        assert data_handler.add_ingredient({"Ingredient Name": name, "Price": "2", "Grams": "1000",
+                                            "Grams Needed in Recipe": "100"})
+
+    assert main(["export", "ingredients", "--out", "-"]) == 0
+    rows = list(csv.DictReader(io.StringIO(capsys.readouterr().out)))
+    assert [row["Ingredient Name"] for row in rows] == ["Flour", "Sugar"]
+    assert not (tmp_path / "-").exists()
+
+    assert main(["export", "ingredients"]) == 0
+    with open(tmp_path / "ingredients_export.csv", newline='', encoding='utf-8') as file:
+        assert list(csv.DictReader(file)) == rows
@@ -0,0 +1,69 @@
+import os
+import shutil
+import pytest
+from storage import CsvStorage
+
+def open_storage(folder):
+    folder.mkdir(exist_ok=True)
+    return CsvStorage(str(folder / "ingredients.csv"), str(folder / "recipes.csv"),
+                      str(folder / "recipe_lines.csv"))
+
+def row(row_id, price):
+    return {"Ingredient Name": f"Item {row_id}", "Price": str(price), "Grams": "100", "Price per Gram": "",
+            "Grams Needed in Recipe": "10", "Cost per Recipe": "", "ID": str(row_id)}
+
+def journaled(storage):
+    """Write five rows, then journal an update, a delete and an append; return the rows"""
+    storage.write_rows("ingredients", [row(n, 1) for n in range(1, 6)])
+    storage.update_row("ingredients", row(2, 9))
+    storage.delete_rows("ingredients", [3])
+    storage.append_row("ingredients", row(6, 1))
+    assert os.path.exists(storage.journal_file("ingredients"))
+    return [row(1, 1), row(2, 9), row(4, 1), row(5, 1), row(6, 1)]
+
+def test_journal_replays_over_the_csv(tmp_path):
+    expected = journaled(open_storage(tmp_path))
+    storage = open_storage(tmp_path)
+    assert storage.load("ingredients") == expected
+    assert list(storage.iter_rows("ingredients")) == expected
+
+def test_copied_or_resaved_csv_keeps_its_journal(tmp_path):
+    expected = journaled(open_storage(tmp_path / "a"))
+    # Copied without their times, then the CSV saved again unchanged
+    shutil.copytree(tmp_path / "a", tmp_path / "b", copy_function=shutil.copy)
+    os.utime(tmp_path / "b" / "ingredients.csv", (0, 0))
+    assert open_storage(tmp_path / "b").load("ingredients") == expected
+
+def test_compaction_folds_the_journal(tmp_path):
+    storage = open_storage(tmp_path)
+    expected = journaled(storage)
+    journal = storage.journal_file("ingredients")
+    shutil.copy(journal, tmp_path / "old.journal")
+    storage.compact("ingredients")
+    assert not os.path.exists(journal)
+    assert open_storage(tmp_path).load("ingredients") == expected
+
+    # A crash between replacing the CSV and the journal leaves the old journal; replaying
+    # it again over the compacted CSV changes nothing
+    shutil.copy(tmp_path / "old.journal", journal)
+    assert open_storage(tmp_path).load("ingredients") == expected
+
+def test_close_compacts(tmp_path):
+    storage = open_storage(tmp_path)
+    expected = journaled(storage)
+    storage.close()
+    assert not os.path.exists(storage.journal_file("ingredients"))
+    assert open_storage(tmp_path).load("ingredients") == expected
+
+def test_journal_for_another_csv_is_an_error(tmp_path):
+    storage = open_storage(tmp_path)
+    journaled(storage)
+    journal = storage.journal_file("ingredients")
+    shutil.copy(journal, tmp_path / "backup.journal")
+    # Rewriting the CSV starts a new generation, so the restored journal no longer applies
+    storage.write_rows("ingredients", [row(7, 1)])
+    shutil.copy(tmp_path / "backup.journal", journal)
+    with pytest.raises(ValueError, match="another version"):
+        open_storage(tmp_path).load("ingredients")
+    # Nothing was thrown away
+    assert open(journal).read() == open(tmp_path / "backup.journal").read()
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+from data_handler import DataHandler
+
+FLOUR = {"Ingredient Name": "Flour", "Price": "2", "Grams": "1000", "Grams Needed in Recipe": "100"}
+
+def hold_lock(path, marker, seconds=0.5):
+    """Start a process holding a FileLock on path; it creates marker just before releasing it"""
+    script = textwrap.dedent(f"""
+        import sys, time
+        sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r})
+        from locking import FileLock
+        with FileLock({path!r}):
+            print("locked", flush=True)
+            time.sleep({seconds})
+            open({marker!r}, "w").close()
+    """)
+    process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True)
+    assert process.stdout.readline().strip() == "locked"
+    return process
+
+def test_lock_is_shared_with_other_processes(make_storage, tmp_path):
+    storage = make_storage()
+    data_handler = DataHandler(storage)
+    assert data_handler.add_ingredient(FLOUR)
+    marker = str(tmp_path / "released")
+    process = hold_lock(storage.locked().path, marker)
+    try:
+        # Reads of a current cached table don't wait for the other process
+        names = []
+        reader = threading.Thread(target=lambda: names.extend(
+            ingredient.name for ingredient in data_handler.get_all_ingredients()))
+        reader.start()
+        reader.join(timeout=5)
+        assert not os.path.exists(marker)
+        assert names == ["Flour"]
+        # Writes do
+        assert data_handler.add_ingredient({**FLOUR, "Ingredient Name": "Sugar"})
+        assert os.path.exists(marker)
+    finally:
+        process.wait()
+
+def test_update_is_refused_if_changed_since_read(make_storage, capsys):
+    here, elsewhere = DataHandler(make_storage()), DataHandler(make_storage())
+    assert here.add_ingredient(FLOUR)
+    flour = here.get_ingredient_by_name("Flour")
+    assert elsewhere.update_ingredient_by_id(flour.id, {**FLOUR, "Price": "3"})
+
+    assert not here.update_ingredient_by_id(flour.id, {**FLOUR, "Price": "4"}, expected=flour)
+    assert "changed elsewhere" in capsys.readouterr().out
+    current = here.get_ingredient(flour.id)
+    assert current.price == 3.0
+    assert here.update_ingredient_by_id(flour.id, {**FLOUR, "Price": "4"}, expected=current)
+    assert elsewhere.get_ingredient(flour.id).price == 4.0
@@ -0,0 +1,24 @@
+from data_handler import DataHandler
+from foodcost import main
+from storage import TABLE_FIELDS, CsvStorage, SqliteStorage
+
+def test_migrate_copies_the_csv_files(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    data_handler = DataHandler(CsvStorage())
+    assert data_handler.add_ingredient({"Ingredient Name": "Flour", "Price": "2", "Grams": "1000",
+                                        "Grams Needed in Recipe": "200"})
+    data_handler.calculate_recipe_cost("Bread", [data_handler.recipe_item("Flour", grams=500)], save_recipe=True)
+    assert data_handler.add_ingredient({"Ingredient Name": "Saffron", "Price": "50", "Grams": "10",
+                                        "Grams Needed in Recipe": "1"})
+    assert data_handler.delete_ingredient_by_id(data_handler.get_ingredient_by_name("Saffron").id)
+
+    assert main(["migrate", "--db", "foodcost.db"]) == 0
+    assert "1 ingredients, 1 recipes, 1 recipe lines" in capsys.readouterr().out
+    for table in TABLE_FIELDS:
+        assert SqliteStorage("foodcost.db").load(table) == CsvStorage().load(table)
+    # The deleted ingredient's ID stays retired in the database
+    assert SqliteStorage("foodcost.db").next_id("ingredients") == CsvStorage().next_id("ingredients") == 3
+
+    # A database holding data is only overwritten on request, and --db may come first
+    assert main(["--db", "foodcost.db", "migrate"]) == 1
+    assert main(["--db", "foodcost.db", "migrate", "--replace"]) == 0
@@ -0,0 +1,153 @@
+import pytest
+from data_handler import DataHandler
+
+def add(data_handler, name, price, grams, grams_needed):
+    assert data_handler.add_ingredient({
+        "Ingredient Name": name, "Price": str(price), "Grams": str(grams),
+        "Grams Needed in Recipe": str(grams_needed)
+    })
+
+def test_saved_lines_keep_the_grams_costed(data_handler):
+    add(data_handler, "Flour", 10, 1000, 200)
+    bread = data_handler.calculate_recipe_cost(
+        "Bread", [data_handler.recipe_item("Flour", grams=500)], save_recipe=True)
+    cake = data_handler.calculate_recipe_cost("Cake", [{
+        "Ingredient Name": "Flour", "Price": "10", "Grams": "1000",
+        "Grams Needed in Recipe": "700", "Cost per Recipe": "7.00"
+    }], save_recipe=True)
+    assert bread["Total Ingredient Cost"] == 5.0
+    assert cake["Total Ingredient Cost"] == 7.0
+
+    recipes = {recipe.name: recipe for recipe in data_handler.get_all_recipes()}
+    lines = data_handler.get_recipe_lines(recipes["Bread"].id)
+    assert [float(line["Grams"]) for line in lines] == [500.0]
+
+    # An update that changes nothing must not recost anything
+    flour = data_handler.get_ingredient_by_name("Flour")
+    assert data_handler.update_ingredient_by_id(flour.id, {
+        "Ingredient Name": "Flour", "Price": "10", "Grams": "1000", "Grams Needed in Recipe": "200"
+    })
+    assert data_handler.recosted_recipes == []
+    recipes = {recipe.name: recipe for recipe in data_handler.get_all_recipes()}
+    assert float(recipes["Bread"]["Total Ingredient Cost"]) == 5.0
+    assert float(recipes["Cake"]["Total Ingredient Cost"]) == 7.0
+
+def test_price_change_recosts_with_the_saved_grams(data_handler):
+    add(data_handler, "Flour", 10, 1000, 200)
+    data_handler.calculate_recipe_cost("Bread", [data_handler.recipe_item("Flour", grams=500)], save_recipe=True)
+    flour = data_handler.get_ingredient_by_name("Flour")
+    assert data_handler.update_ingredient_by_id(flour.id, {
+        "Ingredient Name": "Flour", "Price": "20", "Grams": "1000", "Grams Needed in Recipe": "200"
+    })
+    assert [float(recipe["Total Ingredient Cost"]) for recipe in data_handler.recosted_recipes] == [10.0]
+
+def test_deleted_ids_are_not_reused(make_storage):
+    data_handler = DataHandler(make_storage())
+    add(data_handler, "Flour", 10, 1000, 200)
+    add(data_handler, "Saffron", 50, 10, 1)
+    data_handler.calculate_recipe_cost("Bread", [data_handler.recipe_item("Flour", grams=500)], save_recipe=True)
+    data_handler.calculate_recipe_cost("Tart", [data_handler.recipe_item("Flour", grams=100)], save_recipe=True)
+    saffron = data_handler.get_ingredient_by_name("Saffron")
+    tart = data_handler.search_recipes("Tart")[0]
+    assert data_handler.delete_ingredient_by_id(saffron.id)
+    assert data_handler.delete_recipe_by_id(tart.id)
+
+    # Reopened, the deleted rows had the highest IDs but they aren't handed out again
+    data_handler = DataHandler(make_storage())
+    add(data_handler, "Gold leaf", 1000, 1, 1)
+    data_handler.calculate_recipe_cost("Pie", [data_handler.recipe_item("Gold leaf", grams=1)], save_recipe=True)
+    assert data_handler.get_ingredient_by_name("Gold leaf").id > saffron.id
+    assert data_handler.search_recipes("Pie")[0].id > tart.id
+    bread = data_handler.search_recipes("Bread")[0]
+    assert [line.ingredient_id for line in data_handler.get_recipe_lines(bread.id)] == [
+        data_handler.get_ingredient_by_name("Flour").id]
+
+def test_ingredients_in_use_are_not_deleted(data_handler, capsys):
+    add(data_handler, "Flour", 10, 1000, 200)
+    data_handler.calculate_recipe_cost("Bread", [data_handler.recipe_item("Flour", grams=500)], save_recipe=True)
+    flour = data_handler.get_ingredient_by_name("Flour")
+    assert not data_handler.delete_ingredient_by_id(flour.id)
+    assert "used by Bread" in capsys.readouterr().out
+    assert [recipe.name for recipe in data_handler.recipes_using_ingredient(flour.id)] == ["Bread"]
+    assert data_handler.get_ingredient(flour.id) == flour
+
+def test_recipes_that_cant_be_recosted_are_reported(make_storage, capsys):
+    data_handler = DataHandler(make_storage())
+    add(data_handler, "Flour", 10, 1000, 200)
+    add(data_handler, "Salt", 1, 1000, 10)
+    data_handler.calculate_recipe_cost("Bread", [data_handler.recipe_item("Flour", grams=500),
+                                                 data_handler.recipe_item("Salt", grams=10)], save_recipe=True)
+    # Data from before deleting used ingredients was refused may still name a deleted one
+    data_handler.storage.delete_rows("ingredients", [data_handler.get_ingredient_by_name("Salt").id])
+
+    data_handler = DataHandler(make_storage())
+    assert data_handler.update_ingredient_by_id(data_handler.get_ingredient_by_name("Flour").id, {
+        "Ingredient Name": "Flour", "Price": "40", "Grams": "1000", "Grams Needed in Recipe": "200"
+    })
+    assert data_handler.recosted_recipes == []
+    assert [recipe.name for recipe in data_handler.uncosted_recipes] == ["Bread"]
+    assert "Error recosting Bread" in capsys.readouterr().out
+    assert data_handler.search_recipes("Bread")[0].total_ingredient_cost == 5.01
+
+def sub_recipes(data_handler):
+    """Dough (Flour) is used by Pie and Tart, and Platter uses Pie and Tart"""
+    add(data_handler, "Flour", 10, 1000, 200)
+    add(data_handler, "Apple", 3, 1000, 200)
+    data_handler.calculate_recipe_cost("Dough", [data_handler.recipe_item("Flour", grams=500)], save_recipe=True)
+    data_handler.calculate_recipe_cost("Pie", [data_handler.recipe_item("dough"),
+                                               data_handler.recipe_item("Apple", grams=1000)], save_recipe=True)
+    data_handler.calculate_recipe_cost("Tart", [data_handler.recipe_item("Dough", quantity=2)], save_recipe=True)
+    data_handler.calculate_recipe_cost("Platter", [data_handler.recipe_item("Pie"),
+                                                   data_handler.recipe_item("Tart")], save_recipe=True)
+    return {recipe.name: recipe for recipe in data_handler.get_all_recipes()}
+
+def test_price_changes_roll_up_through_sub_recipes(data_handler, monkeypatch):
+    recipes = sub_recipes(data_handler)
+    assert recipes["Platter"].total_ingredient_cost == 5.0 + 3.0 + 10.0
+
+    line_costs = []
+    line_cost = DataHandler._line_cost
+    monkeypatch.setattr(DataHandler, "_line_cost", staticmethod(
+        lambda ingredient, grams: line_costs.append(ingredient.name) or line_cost(ingredient, grams)))
+    flour = data_handler.get_ingredient_by_name("Flour")
+    assert data_handler.update_ingredient_by_id(flour.id, {
+        "Ingredient Name": "Flour", "Price": "20", "Grams": "1000", "Grams Needed in Recipe": "200"
+    })
+    # Dough is shared but costed once; Pie's apples are costed once too
+    assert sorted(line_costs) == ["Apple", "Flour"]
+    totals = {recipe.name: recipe.total_ingredient_cost for recipe in data_handler.recosted_recipes}
+    assert totals == {"Dough": 10.0, "Pie": 13.0, "Tart": 20.0, "Platter": 33.0}
+
+def test_sub_recipe_cycles_are_refused(data_handler, capsys):
+    recipes = sub_recipes(data_handler)
+    # Dough can't be saved again using Platter, which uses Dough
+    assert data_handler.calculate_many([("Dough", ["Platter"])], save_recipes=True) == []
+    assert "already uses this recipe" in capsys.readouterr().out
+    assert [line.ingredient_id for line in data_handler.get_recipe_lines(recipes["Dough"].id)] == [
+        data_handler.get_ingredient_by_name("Flour").id]
+
+def test_sub_recipes_in_use_are_not_deleted(data_handler, capsys):
+    recipes = sub_recipes(data_handler)
+    assert not data_handler.delete_recipe_by_id(recipes["Dough"].id)
+    assert not data_handler.delete_recipe("Dough")
+    assert "used by Pie, Tart" in capsys.readouterr().out
+    assert [recipe.name for recipe in data_handler.recipes_using_recipe(recipes["Dough"].id)] == ["Pie", "Tart"]
+
+    for name in ("Platter", "Pie", "Tart", "Dough"):
+        assert data_handler.delete_recipe(name)
+    assert data_handler.recipe_item("Dough") is None
+
+def test_lines_need_more_than_0_grams(data_handler, capsys):
+    add(data_handler, "Flour", 10, 1000, 200)
+    for grams in (0, -5, "nan"):
+        with pytest.raises(ValueError):
+            data_handler.recipe_item("Flour", grams=grams)
+    with pytest.raises(ValueError):
+        data_handler.recipe_item("Flour", quantity=0)
+
+    assert data_handler.calculate_recipe_cost("Bread", [{
+        "Ingredient Name": "Flour", "Price": "10", "Grams": "1000",
+        "Grams Needed in Recipe": "0", "Cost per Recipe": "0"
+    }], save_recipe=True) == {}
+    assert "needs a Grams Needed in Recipe above 0" in capsys.readouterr().out
+    assert data_handler.get_all_recipes() == []
@@ -0,0 +1,64 @@
+import random
+import pytest
+from data_handler import DataHandler
+from records import Ingredient
+from search_index import TrigramIndex
+
+NAMES = ["Dark Chocolate", "Milk Chocolate", "Straße Salt", "Sea Salt", "Dark Rye Flour"]
+
+@pytest.fixture
+def catalog(data_handler):
+    for name in NAMES:
+        assert data_handler.add_ingredient({"Ingredient Name": name, "Price": "1", "Grams": "100",
+                                            "Grams Needed in Recipe": "10"})
+    return data_handler
+
+def names(records):
+    return [record.name for record in records]
+
+@pytest.mark.parametrize("first, then", [
+    ("dark", "dark  choc"),
+    ("stra", "strasse"),
+    ("STRA", "Straße s"),
+    ("salt", " salt "),
+])
+@pytest.mark.parametrize("sort_key", [None, "Price"])
+def test_narrowed_search_matches_fresh_search(catalog, first, then, sort_key):
+    catalog.query_ingredients(first, sort_key)
+    narrowed = catalog.query_ingredients(then, sort_key)
+    fresh = DataHandler(catalog.storage).query_ingredients(then, sort_key)
+    assert narrowed[1] == fresh[1] > 0
+    assert names(narrowed[0]) == names(fresh[0])
+
+def test_limited_search_is_the_head_of_the_full_ranking():
+    words = ["chicken", "chickpea", "salt", "sea", "seed", "dark", "chocolate", "a", "ab"]
+    rnd = random.Random(1)
+    records = [Ingredient(id=n, name=" ".join(rnd.choice(words) for _ in range(rnd.randint(1, 3))))
+               for n in range(600)]
+    index = TrigramIndex(records[:400], DataHandler._normalize_name)
+    for record in records[400:]:
+        index.add(record)
+    for record in records[::3]:
+        index.remove(record)
+    for query in ["a", "ch", "chicken", "chiken", "sea", "Seed  S", "choclate", "dark choc", "xyz"]:
+        ranked = index.search(query)
+        for limit in (0, 1, 5, 20, 500):
+            assert index.search(query, limit) == ranked[:limit]
+
+@pytest.mark.parametrize("sort_key", [None, "Price", "Ingredient Name"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_name_filter_keeps_the_requested_order(data_handler, sort_key, descending):
+    for n in range(200):
+        name = f"Salt {n}" if n % 40 == 0 else f"Flour {n}"
+        assert data_handler.add_ingredient({"Ingredient Name": name, "Price": str(n % 7), "Grams": "100",
+                                            "Grams Needed in Recipe": "10"})
+    for _ in range(2):
+        page, total = data_handler.query_ingredients("salt", sort_key, limit=None, descending=descending)
+        expected, _ = data_handler.query_ingredients(lambda record: "salt" in record.name.lower(), sort_key,
+                                                     limit=None, descending=descending)
+        assert total == 5
+        assert names(page) == names(expected)
+        # After a change the order is worked out afresh
+        data_handler.add_ingredient({"Ingredient Name": "Sea Salt", "Price": "3", "Grams": "100",
+                                     "Grams Needed in Recipe": "10"})
+        data_handler.delete_ingredient_by_id(page[0].id)
@@ -0,0 +1,109 @@
+import http.client
+import json
+import socket
+import threading
+import pytest
+from data_handler import DataHandler
+from server import CostingServer
+
+@pytest.fixture
+def server(make_storage):
+    """A server on a free localhost port, with two ingredients in its catalog"""
+    data_handler = DataHandler(make_storage())
+    for name, price in (("Flour", 2), ("Sugar", 3)):
+        assert data_handler.add_ingredient({"Ingredient Name": name, "Price": str(price), "Grams": "1000",
+                                            "Grams Needed in Recipe": "100"})
+    server = CostingServer(("127.0.0.1", 0), data_handler)
+    # Polled often, so shutting down at the end of each test is quick
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+@pytest.fixture
+def connection(server):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    yield connection
+    connection.close()
+
+def request(connection, method, path, body=None, headers=None):
+    """Send a request and return the status, headers and decoded JSON body of the response"""
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    data = response.read()
+    return response.status, response, json.loads(data) if data else None
+
+def test_etag_revalidation(server, connection):
+    status, response, body = request(connection, "GET", "/ingredients")
+    etag = response.getheader("ETag")
+    assert status == 200 and etag
+    assert [ingredient["Ingredient Name"] for ingredient in body["ingredients"]] == ["Flour", "Sugar"]
+
+    status, response, body = request(connection, "GET", "/ingredients", headers={"If-None-Match": etag})
+    assert (status, body) == (304, None)
+    assert response.getheader("ETag") == etag
+
+    # A change to the table makes the old ETag stale
+    assert server.data_handler.add_ingredient({"Ingredient Name": "Salt", "Price": "1", "Grams": "1000",
+                                               "Grams Needed in Recipe": "5"})
+    status, response, body = request(connection, "GET", "/ingredients", headers={"If-None-Match": etag})
+    assert status == 200 and response.getheader("ETag") != etag
+    assert body["total"] == 3
+
+def test_keep_alive(connection):
+    status, _, body = request(connection, "GET", "/ingredients?q=flour")
+    assert status == 200 and body["total"] == 1
+    sock = connection.sock
+
+    flour_id = body["ingredients"][0]["ID"]
+    status, _, body = request(connection, "GET", f"/ingredients/{flour_id}")
+    assert status == 200 and body["Ingredient Name"] == "Flour"
+
+    cake = {"name": "Cake", "margin": 100, "items": [{"name": "Flour", "grams": 500}, {"name": "Sugar"}]}
+    status, _, body = request(connection, "POST", "/cost", cake)
+    assert status == 200 and body["Total Ingredient Cost"] == pytest.approx(1.3)
+
+    status, _, body = request(connection, "POST", "/recipes", cake)
+    assert status == 201
+    status, _, body = request(connection, "GET", "/recipes?q=cake")
+    assert status == 200 and [recipe["Recipe Name"] for recipe in body["recipes"]] == ["Cake"]
+
+    status, _, _ = request(connection, "GET", "/nothing")
+    assert status == 404
+    # Every request went over the same connection
+    assert connection.sock is sock
+
+@pytest.mark.parametrize("body", [
+    {"name": "Cake", "margin": None, "items": [{"name": "Flour"}]},
+    {"name": "Cake", "margin": "lots", "items": [{"name": "Flour"}]},
+    {"name": "Cake", "items": [{"name": "Flour", "grams": [1]}]},
+    {"name": "Cake", "items": [{"name": "Sugar", "grams": "some"}]},
+    {"name": "Cake", "items": [{"name": "Sugar", "grams": 0}]},
+    {"name": "Cake", "items": [{"name": "Sugar", "quantity": -1}]},
+    {"name": "Cake", "items": 5},
+    {"name": "Cake", "items": [{"name": "Butter"}]},
+    [1, 2],
+    b"{not json",
+])
+def test_bad_input_answers_400(connection, body):
+    status, _, error = request(connection, "POST", "/cost", body)
+    assert status == 400 and error["error"]
+    sock = connection.sock
+    # The connection is still usable
+    status, _, _ = request(connection, "GET", "/ingredients")
+    assert status == 200
+    assert connection.sock is sock
+
+@pytest.mark.parametrize("length", ["lots", "-1"])
+def test_bad_content_length(server, length):
+    with socket.create_connection(("127.0.0.1", server.server_address[1]), timeout=5) as sock:
+        sock.sendall(f"POST /cost HTTP/1.1\r\nHost: localhost\r\nContent-Length: {length}\r\n\r\n{{}}".encode())
+        response = http.client.HTTPResponse(sock)
+        response.begin()
+        assert response.status == 400
+        assert response.getheader("Connection") == "close"
+        assert json.loads(response.read())["error"]
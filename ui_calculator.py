@@ -1,14 +1,22 @@
 import customtkinter as ctk
-from typing import Callable, List, Dict
+from typing import Callable, Hashable, List, Dict, Tuple
 from data_handler import DataHandler
+from records import Ingredient
+from ui_search import SearchController, IncrementalFilter
+from ui_worker import BackgroundWorker
 
 class CalculatorFrame(ctk.CTkFrame):
-    def __init__(self, master, data_handler: DataHandler, on_refresh_callback: Callable = None, **kwargs):
+    def __init__(self, master, data_handler: DataHandler, on_refresh_callback: Callable = None,
+                 worker: BackgroundWorker = None, **kwargs):
         super().__init__(master, **kwargs)
         self.data_handler = data_handler
         self.on_refresh_callback = on_refresh_callback
+        # Runs the data handler calls so the window never waits on storage
+        self.worker = worker if worker is not None else BackgroundWorker(self)
         self.selected_ingredients = []
         self.all_ingredients = []
+        # Ingredient and recipe table versions the checklist was built from
+        self.data_version = None
         
         # Configure grid weights
         self.grid_columnconfigure(0, weight=1)
@@ -74,7 +82,9 @@ class CalculatorFrame(ctk.CTkFrame):
             placeholder_text="Search ingredients...",
             width=300
         )
-        self.search_entry.bind("<KeyRelease>", self._on_search_ingredients)
+        # Search once typing pauses, narrowing the last matches while the query grows
+        self.search_controller = SearchController(self.search_entry, self._on_search_ingredients)
+        self.ingredient_filter = IncrementalFilter(lambda ing: ing.get("Ingredient Name", ""))
         
         # Ingredients checklist frame
         self.checklist_frame = ctk.CTkFrame(self.ingredients_section, fg_color="#2d2d2d")
@@ -273,35 +283,62 @@ class CalculatorFrame(ctk.CTkFrame):
         # Status - reduced padding
         self.status_label.pack(pady=(0, 15))
     
+    def refresh_display(self):
+        """Public method to refresh the display; the checklist is only rebuilt if
+        ingredients or recipes changed since it was built"""
+        # The versions are read on the worker, as that waits out any write in progress
+        self.worker.submit(self._data_version, key=(self, "version"), on_done=self._check_data_version)
+    
+    def _data_version(self):
+        return (self.data_handler.table_version("ingredients"), self.data_handler.table_version("recipes"))
+    
+    def _check_data_version(self, version):
+        if version != self.data_version:
+            self._refresh_ingredients()
+    
     def _refresh_ingredients(self):
         """Refresh the ingredients checklist"""
-        self.all_ingredients = self.data_handler.get_all_ingredients()
-        self._update_checklist()
+        self.worker.submit(self._load_ingredients, key=(self, "ingredients"), on_done=self._show_ingredients)
     
-    def _on_search_ingredients(self, event=None):
+    def _load_ingredients(self) -> Tuple[Hashable, List[Dict[str, str]]]:
+        """Read the data version, then the ingredients and saved recipes as sub-recipes
+        (one batch each), on the worker"""
+        # Read first, so a change made while loading is picked up by the next refresh
+        version = self._data_version()
+        items = self.data_handler.get_all_ingredients()
+        for recipe in self.data_handler.get_all_recipes():
+            item = self.data_handler.sub_recipe_item(recipe.id)
+            if item is not None:
+                items.append(item)
+        return version, items
+    
+    def _show_ingredients(self, loaded: Tuple[Hashable, List[Dict[str, str]]]):
+        """Rebuild the checklist from freshly loaded ingredients, keeping the search"""
+        self.data_version, self.all_ingredients = loaded
+        # Name -> position in all_ingredients, so filtered rows map back without a scan
+        self.ingredient_positions = {}
+        for idx, ing in enumerate(self.all_ingredients):
+            self.ingredient_positions.setdefault(ing.get("Ingredient Name"), idx)
+        query = self.search_entry.get().strip()
+        if query:
+            self._on_search_ingredients(query)
+        else:
+            self._update_checklist()
+    
+    def _on_search_ingredients(self, query: str = ""):
         """Handle search input changes for ingredients"""
-        query = self.search_entry.get().strip().lower()
         
         # Clear existing checkboxes
         for widget in self.checklist_container.winfo_children():
             widget.destroy()
         
         # Filter ingredients based on search query
-        if query:
-            filtered_ingredients = [
-                ing for ing in self.all_ingredients 
-                if query in ing.get("Ingredient Name", "").lower()
-            ]
-        else:
-            filtered_ingredients = self.all_ingredients
+        filtered_ingredients = self.ingredient_filter.filter(self.all_ingredients, query)
         
         # Create checkboxes for filtered ingredients
         for i, ingredient in enumerate(filtered_ingredients):
             # compute global index by matching name (safer when filtering)
-            try:
-                global_index = next(idx for idx, ing in enumerate(self.all_ingredients) if ing.get("Ingredient Name") == ingredient.get("Ingredient Name"))
-            except StopIteration:
-                global_index = i
+            global_index = self.ingredient_positions.get(ingredient.get("Ingredient Name"), i)
             self._create_ingredient_checkbox(i, ingredient, global_index=global_index)
     
     def _update_checklist(self):
@@ -321,10 +358,7 @@ class CalculatorFrame(ctk.CTkFrame):
         
         # Determine global index (index into self.all_ingredients) if not provided
         if global_index is None:
-            try:
-                global_index = next(idx for idx, ing in enumerate(self.all_ingredients) if ing.get("Ingredient Name") == ingredient.get("Ingredient Name"))
-            except StopIteration:
-                global_index = index
+            global_index = self.ingredient_positions.get(ingredient.get("Ingredient Name"), index)
         
         # Checkbox
         var = ctk.BooleanVar()
@@ -346,19 +380,25 @@ class CalculatorFrame(ctk.CTkFrame):
         )
         checkbox.pack(side="left", padx=(0, 10))
         
-        # Ingredient cost text: support multiple possible keys, fall back to '0.00'
-        cost_val = ingredient.get('Cost per Recipe') or ingredient.get('Cost per recipe') or ingredient.get('Price') or ingredient.get('Cost') or "0.00"
+        if isinstance(ingredient, Ingredient):
+            # Records from the data handler carry these already parsed
+            cost_val = ingredient.cost_per_recipe or ingredient.price or 0.0
+            grams_needed = ingredient.grams_needed or ingredient.grams or ""
+        else:
+            # Ingredient cost text: support multiple possible keys, fall back to '0.00'
+            cost_val = ingredient.get('Cost per Recipe') or ingredient.get('Cost per recipe') or ingredient.get('Price') or ingredient.get('Cost') or "0.00"
+
+            # Get grams needed (support multiple possible key names)
+            grams_needed = (ingredient.get("Grams Needed in Recipe")
+                            or ingredient.get("Grams Needed")
+                            or ingredient.get("Grams Needed (Recipe)")
+                            or ingredient.get("Grams", ""))
         try:
             # normalize to two decimals if numeric string/number
             cost_str = f"{float(cost_val):.2f}"
         except Exception:
             cost_str = str(cost_val)
 
-        # Get grams needed (support multiple possible key names)
-        grams_needed = (ingredient.get("Grams Needed in Recipe")
-                        or ingredient.get("Grams Needed")
-                        or ingredient.get("Grams Needed (Recipe)")
-                        or ingredient.get("Grams", ""))
         grams_text = ""
         try:
             if grams_needed is not None and str(grams_needed).strip() != "":
@@ -468,13 +508,20 @@ class CalculatorFrame(ctk.CTkFrame):
             return
         
         # Calculate cost with custom margin
-        costing_data = self.data_handler.calculate_recipe_cost(
-            recipe_name, 
-            self.selected_ingredients, 
-            save_recipe=False,
-            margin_percentage=margin_percentage
+        self._start_costing("Calculating...")
+        ingredients_used = list(self.selected_ingredients)
+        self.worker.submit(
+            lambda: self.data_handler.calculate_recipe_cost(
+                recipe_name,
+                ingredients_used,
+                save_recipe=False,
+                margin_percentage=margin_percentage
+            ),
+            on_done=self._on_cost_calculated
         )
-        
+    
+    def _on_cost_calculated(self, costing_data: Dict[str, float]):
+        self._end_costing()
         if costing_data:
             self._display_cost_breakdown(costing_data)
             self._show_status("Cost calculation completed!", error=False)
@@ -507,13 +554,20 @@ class CalculatorFrame(ctk.CTkFrame):
             return
         
         # Calculate and save cost with custom margin
-        costing_data = self.data_handler.calculate_recipe_cost(
-            recipe_name, 
-            self.selected_ingredients, 
-            save_recipe=True,
-            margin_percentage=margin_percentage
+        self._start_costing("Saving...")
+        ingredients_used = list(self.selected_ingredients)
+        self.worker.submit(
+            lambda: self.data_handler.calculate_recipe_cost(
+                recipe_name,
+                ingredients_used,
+                save_recipe=True,
+                margin_percentage=margin_percentage
+            ),
+            on_done=self._on_recipe_saved
         )
-        
+    
+    def _on_recipe_saved(self, costing_data: Dict[str, float]):
+        self._end_costing()
         if costing_data:
             self._display_cost_breakdown(costing_data)
             self._show_status("Recipe saved successfully!", error=False)
@@ -527,6 +581,16 @@ class CalculatorFrame(ctk.CTkFrame):
         else:
             self._show_status("Error saving recipe", error=True)
     
+    def _start_costing(self, message: str):
+        """Disable the calculate buttons while a calculation runs on the worker"""
+        self.calculate_button.configure(state="disabled")
+        self.calculate_save_button.configure(state="disabled")
+        self.status_label.configure(text=message, text_color="#4cafef")
+    
+    def _end_costing(self):
+        self.calculate_button.configure(state="normal")
+        self.calculate_save_button.configure(state="normal")
+    
     def _display_cost_breakdown(self, costing_data: Dict[str, float]):
         """Display the cost breakdown"""
         # Clear previous breakdown
@@ -1,13 +1,35 @@
 import customtkinter as ctk
 from typing import Callable, List, Dict
 from data_handler import DataHandler
+from ui_table import VirtualTable
+from ui_search import SearchController
+from ui_worker import BackgroundWorker
 
 class IngredientsFrame(ctk.CTkFrame):
-    def __init__(self, master, data_handler: DataHandler, on_refresh_callback: Callable = None, **kwargs):
+    # Sort menu choice -> (column, descending) for DataHandler.query_ingredients
+    SORT_OPTIONS = {
+        "Table order": (None, False),
+        "Best match": (DataHandler.BEST_MATCH, False),
+        "Name (A-Z)": ("Ingredient Name", False),
+        "Price/Gram (low-high)": ("Price per Gram", False),
+        "Price/Gram (high-low)": ("Price per Gram", True),
+        "Cost/Recipe (low-high)": ("Cost per Recipe", False),
+        "Cost/Recipe (high-low)": ("Cost per Recipe", True)
+    }
+    
+    def __init__(self, master, data_handler: DataHandler, on_refresh_callback: Callable = None,
+                 worker: BackgroundWorker = None, **kwargs):
         super().__init__(master, **kwargs)
         self.data_handler = data_handler
         self.on_refresh_callback = on_refresh_callback
+        # Runs the data handler calls so the window never waits on storage
+        self.worker = worker if worker is not None else BackgroundWorker(self)
+        # Ingredients on screen and the number matching the search
         self.current_ingredients = []
+        self.total_matches = 0
+        # Search and (column, descending) order of the table, read by fetches on the worker
+        self.query = ""
+        self.sort = next(iter(self.SORT_OPTIONS.values()))
         
         # Configure grid weights
         self.grid_columnconfigure(0, weight=1)
@@ -79,21 +101,35 @@ class IngredientsFrame(ctk.CTkFrame):
             placeholder_text="Search by ingredient name...",
             width=300
         )
-        self.search_entry.bind("<KeyRelease>", self._on_search)
-        
-        # Ingredients table frame
-        self.table_frame = ctk.CTkFrame(self.card, fg_color="transparent")
-        
-        # Table headers
-        self.headers_frame = ctk.CTkFrame(self.table_frame, fg_color="#3d3d3d")
-        self._create_table_headers()
+        # Search once typing pauses rather than on every keystroke
+        self.search_controller = SearchController(self.search_entry, self._on_search)
+        self.sort_label = ctk.CTkLabel(self.search_frame, text="Sort:", text_color="#ffffff")
+        self.sort_menu = ctk.CTkOptionMenu(
+            self.search_frame,
+            values=list(self.SORT_OPTIONS),
+            command=self._on_sort_change,
+            fg_color="#3d3d3d",
+            button_color="#4cafef",
+            button_hover_color="#3d8bc0",
+            width=190
+        )
         
-        # Ingredients scrollable frame
-        self.ingredients_container = ctk.CTkScrollableFrame(
-            self.table_frame,
-            fg_color="transparent",
-            height=300
+        # Ingredients table; only the rows on screen have widgets
+        self.table = VirtualTable(
+            self.card,
+            columns=[("Ingredient Name", 150), ("Price ($)", 80), ("Grams", 80), ("Price/Gram", 100),
+                     ("Grams Needed", 120), ("Cost/Recipe", 100)],
+            fetch=self._fetch_ingredients,
+            format_row=self._ingredient_values,
+            actions=[
+                ("Edit", "#4cafef", "#3d8bc0", lambda ingredient: self._edit_ingredient(ingredient.get("ID", ""))),
+                ("Delete", "#ff6b6b", "#e55555", lambda ingredient: self._delete_ingredient(ingredient.get("ID", "")))
+            ],
+            on_scroll=self._on_table_scroll,
+            height=300,
+            worker=self.worker
         )
+        self.count_label = ctk.CTkLabel(self.card, text="", text_color="#ffffff")
         
         # Status label
         self.status_label = ctk.CTkLabel(
@@ -103,25 +139,6 @@ class IngredientsFrame(ctk.CTkFrame):
             font=ctk.CTkFont(size=14)
         )
     
-    def _create_table_headers(self):
-        """Create table header row"""
-        headers = ["Ingredient Name", "Price ($)", "Grams", "Price/Gram", "Grams Needed", "Cost/Recipe", "Actions"]
-        widths = [150, 80, 80, 100, 120, 100, 120]
-        
-        # Configure column weights for headers
-        for i in range(len(headers)):
-            self.headers_frame.grid_columnconfigure(i, weight=0, minsize=widths[i])
-        
-        for i, (header, width) in enumerate(zip(headers, widths)):
-            label = ctk.CTkLabel(
-                self.headers_frame,
-                text=header,
-                font=ctk.CTkFont(size=14, weight="bold"),
-                text_color="#ffffff",
-                width=width
-            )
-            label.grid(row=0, column=i, padx=5, pady=8, sticky="w")  # Reduced pady from 10 to 8
-    
     def _setup_layout(self):
         # Configure card grid
         self.card.grid_columnconfigure(0, weight=1)
@@ -159,19 +176,15 @@ class IngredientsFrame(ctk.CTkFrame):
         self.search_frame.grid_columnconfigure(1, weight=1)
         self.search_label.grid(row=0, column=0, padx=(15, 8), pady=8)
         self.search_entry.grid(row=0, column=1, padx=(0, 15), pady=8, sticky="ew")
+        self.sort_label.grid(row=0, column=2, padx=(0, 8), pady=8)
+        self.sort_menu.grid(row=0, column=3, padx=(0, 15), pady=8)
         
         # Table section - reduced padding
-        self.table_frame.grid(row=3, column=0, pady=(0, 15), sticky="nsew", padx=15)
-        self.table_frame.grid_columnconfigure(0, weight=1)
-        
-        # Headers
-        self.headers_frame.grid(row=0, column=0, sticky="ew", padx=15)
-        
-        # Ingredients container - reduced padding
-        self.ingredients_container.grid(row=1, column=0, sticky="nsew", padx=15, pady=(8, 0))
+        self.table.grid(row=3, column=0, pady=(0, 8), sticky="nsew", padx=15)
+        self.count_label.grid(row=4, column=0, pady=(0, 8))
         
         # Status - reduced padding
-        self.status_label.grid(row=4, column=0, pady=(0, 15))
+        self.status_label.grid(row=5, column=0, pady=(0, 15))
     
     def _add_ingredient(self):
         """Add a new ingredient"""
@@ -204,7 +217,11 @@ class IngredientsFrame(ctk.CTkFrame):
         }
         
         # Save to CSV
-        if self.data_handler.add_ingredient(ingredient_data):
+        self._show_status("Saving...", error=False)
+        self.worker.submit(self.data_handler.add_ingredient, ingredient_data, on_done=self._on_ingredient_added)
+    
+    def _on_ingredient_added(self, added: bool):
+        if added:
             self._show_status("Ingredient added successfully!", error=False)
             self._clear_fields()
             self._refresh_ingredients()
@@ -222,30 +239,35 @@ class IngredientsFrame(ctk.CTkFrame):
         self.status_label.configure(text="")
     
     def _refresh_ingredients(self):
-        """Refresh the ingredients display"""
-        # Clear existing ingredients
-        for widget in self.ingredients_container.winfo_children():
-            widget.destroy()
-        
-        # Get ingredients from data handler
-        self.current_ingredients = self.data_handler.get_all_ingredients()
-        
-        # Create ingredient rows
-        for i, ingredient in enumerate(self.current_ingredients):
-            self._create_ingredient_row(i, ingredient)
+        """Refresh the ingredients display, keeping the scroll position"""
+        self.table.refresh()
+    
+    def refresh_display(self):
+        """Public method to refresh the display"""
+        self._refresh_ingredients()
+    
+    def _fetch_ingredients(self, offset: int, limit: int):
+        """Fetch a window of ingredients matching the search, in the chosen order"""
+        sort_key, descending = self.sort
+        return self.data_handler.query_ingredients(self.query, sort_key, offset, limit, descending)
+    
+    def _on_table_scroll(self, first: int, shown: int, total: int):
+        """Track the rows on screen and show where they are in the matches"""
+        self.current_ingredients = self.table.visible_records()
+        self.total_matches = total
+        if total:
+            self.count_label.configure(text=f"Showing {first + 1}-{first + shown} of {total}")
+        else:
+            self.count_label.configure(text="No ingredients")
+    
+    def _on_sort_change(self, choice: str):
+        """Re-sort from the top"""
+        self.sort = self.SORT_OPTIONS[choice]
+        self.table.refresh(reset=True)
     
-    def _create_ingredient_row(self, index: int, ingredient: Dict[str, str]):
-        """Create a row for an ingredient in the table"""
-        row_frame = ctk.CTkFrame(self.ingredients_container, fg_color="#3d3d3d")
-        row_frame.grid(row=index, column=0, sticky="ew", pady=1)  # Reduced pady from 2 to 1
-        
-        # Configure column weights for consistent alignment with headers
-        widths = [150, 80, 80, 100, 120, 100, 120]
-        for i in range(len(widths)):
-            row_frame.grid_columnconfigure(i, weight=0, minsize=widths[i])
-        
-        # Ingredient data labels
-        labels = [
+    def _ingredient_values(self, ingredient: Dict[str, str]) -> List[str]:
+        """Return the texts shown in an ingredient's table row"""
+        return [
             ingredient.get("Ingredient Name", ""),
             f"${ingredient.get('Price', '0.00')}",
             ingredient.get("Grams", ""),
@@ -253,65 +275,21 @@ class IngredientsFrame(ctk.CTkFrame):
             ingredient.get("Grams Needed in Recipe", ""),
             f"${ingredient.get('Cost per Recipe', '0.00')}"
         ]
-        
-        for i, (label, width) in enumerate(zip(labels, widths[:-1])):  # Exclude Actions column
-            label_widget = ctk.CTkLabel(
-                row_frame,
-                text=label,
-                text_color="#ffffff",
-                width=width
-            )
-            label_widget.grid(row=0, column=i, padx=5, pady=6, sticky="w")  # Reduced pady from 8 to 6
-        
-        # Action buttons
-        actions_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
-        actions_frame.grid(row=0, column=6, padx=5, pady=4)  # Reduced pady from 5 to 4
-        
-        edit_btn = ctk.CTkButton(
-            actions_frame,
-            text="Edit",
-            command=lambda idx=index: self._edit_ingredient(idx),
-            fg_color="#4cafef",
-            hover_color="#3d8bc0",
-            width=50,
-            height=28,  # Reduced height from 30 to 28
-            font=ctk.CTkFont(size=12)
-        )
-        edit_btn.pack(side="left", padx=2)
-        
-        delete_btn = ctk.CTkButton(
-            actions_frame,
-            text="Delete",
-            command=lambda idx=index: self._delete_ingredient(idx),
-            fg_color="#ff6b6b",
-            hover_color="#e55555",
-            width=50,
-            height=28,  # Reduced height from 30 to 28
-            font=ctk.CTkFont(size=12)
-        )
-        delete_btn.pack(side="left", padx=2)
     
-    def _on_search(self, event=None):
-        """Handle search input changes"""
-        query = self.search_entry.get().strip()
-        filtered_ingredients = self.data_handler.search_ingredients(query)
-        
-        # Clear existing ingredients
-        for widget in self.ingredients_container.winfo_children():
-            widget.destroy()
-        
-        # Display filtered ingredients
-        self.current_ingredients = filtered_ingredients
-        for i, ingredient in enumerate(filtered_ingredients):
-            self._create_ingredient_row(i, ingredient)
+    def _on_search(self, query: str = ""):
+        """Handle a change of the search query"""
+        # Show the matches from the top
+        self.query = query
+        self.table.refresh(reset=True)
     
-    def _edit_ingredient(self, index: int):
-        """Open edit dialog for ingredient at index"""
-        if 0 <= index < len(self.current_ingredients):
-            ingredient = self.current_ingredients[index]
-            self._show_edit_dialog(index, ingredient)
+    def _edit_ingredient(self, ingredient_id: str):
+        """Open edit dialog for the ingredient with the given ID"""
+        self.worker.submit(
+            self.data_handler.get_ingredient, ingredient_id,
+            on_done=lambda ingredient: ingredient is not None and self._show_edit_dialog(ingredient_id, ingredient)
+        )
     
-    def _show_edit_dialog(self, index: int, ingredient: Dict[str, str]):
+    def _show_edit_dialog(self, ingredient_id: str, ingredient: Dict[str, str]):
         """Show edit dialog for an ingredient"""
         # Create edit dialog
         dialog = ctk.CTkToplevel(self)
@@ -373,12 +351,12 @@ class IngredientsFrame(ctk.CTkFrame):
             buttons_frame,
             text="Save",
             command=lambda: self._save_edit(
-                dialog, index, {
+                dialog, ingredient_id, {
                     "Ingredient Name": name_entry.get(),
                     "Price": price_entry.get(),
                     "Grams": grams_entry.get(),
                     "Grams Needed in Recipe": grams_needed_entry.get()
-                }
+                }, ingredient
             ),
             fg_color="#4cafef",
             hover_color="#3d8bc0"
@@ -394,8 +372,9 @@ class IngredientsFrame(ctk.CTkFrame):
         )
         cancel_btn.pack(side="right", expand=True)
     
-    def _save_edit(self, dialog, index: int, ingredient_data: Dict[str, str]):
-        """Save edited ingredient data"""
+    def _save_edit(self, dialog, ingredient_id: str, ingredient_data: Dict[str, str],
+                   ingredient: Dict[str, str]):
+        """Save edited ingredient data, unless the ingredient changed since the dialog opened"""
         # Validate inputs
         if not all([ingredient_data["Ingredient Name"], ingredient_data["Price"], 
                    ingredient_data["Grams"], ingredient_data["Grams Needed in Recipe"]]):
@@ -408,30 +387,75 @@ class IngredientsFrame(ctk.CTkFrame):
         except ValueError:
             return
         
-        # Update ingredient
-        if self.data_handler.update_ingredient(index, ingredient_data):
+        # Update ingredient, taking the recipes it recosted, or couldn't, before another
+        # call replaces them
+        def update():
+            if self.data_handler.update_ingredient_by_id(ingredient_id, ingredient_data, expected=ingredient):
+                return list(self.data_handler.recosted_recipes), list(self.data_handler.uncosted_recipes), False
+            # Refused because another terminal changed or deleted it meanwhile?
+            return None, [], self.data_handler.get_ingredient(ingredient_id) != ingredient
+        self.worker.submit(update, on_done=lambda result: self._on_ingredient_updated(dialog, *result))
+    
+    def _on_ingredient_updated(self, dialog, recosted: List, uncosted: List, changed_elsewhere: bool):
+        if recosted is not None:
             dialog.destroy()
+            # Rebind the rows on screen to the updated data
             self._refresh_ingredients()
-            self._show_status("Ingredient updated successfully!", error=False)
+            if uncosted:
+                names = ", ".join(recipe.name for recipe in uncosted[:3]) + ("..." if len(uncosted) > 3 else "")
+                self._show_status(f"Ingredient updated; {len(uncosted)} recipe(s) use deleted items and "
+                                  f"weren't recosted: {names}", error=True)
+            elif recosted:
+                names = ", ".join(recipe.name for recipe in recosted[:3]) + ("..." if len(recosted) > 3 else "")
+                self._show_status(f"Ingredient updated; recosted {len(recosted)} recipe(s): {names}", error=False)
+            else:
+                self._show_status("Ingredient updated successfully!", error=False)
             if self.on_refresh_callback:
                 self.on_refresh_callback()
+        elif changed_elsewhere:
+            # Show what is stored now rather than overwrite someone else's change
+            dialog.destroy()
+            self._refresh_ingredients()
+            self._show_status("Ingredient was changed on another terminal; check it and edit again", error=True)
         else:
             self._show_status("Error updating ingredient", error=True)
     
-    def _delete_ingredient(self, index: int):
-        """Delete ingredient at index"""
-        if 0 <= index < len(self.current_ingredients):
-            ingredient_name = self.current_ingredients[index].get("Ingredient Name", "")
-            
-            # Confirm deletion
-            if self._confirm_delete(ingredient_name):
-                if self.data_handler.delete_ingredient(index):
-                    self._refresh_ingredients()
-                    self._show_status(f"'{ingredient_name}' deleted successfully!", error=False)
-                    if self.on_refresh_callback:
-                        self.on_refresh_callback()
-                else:
-                    self._show_status("Error deleting ingredient", error=True)
+    def _delete_ingredient(self, ingredient_id: str):
+        """Delete the ingredient with the given ID"""
+        # The modal confirmation runs its own event loop, so open it once the worker's
+        # result handling has returned rather than from inside it
+        self.worker.submit(
+            self.data_handler.get_ingredient, ingredient_id,
+            on_done=lambda ingredient: ingredient is not None and self.after_idle(
+                self._confirm_and_delete, ingredient_id, ingredient)
+        )
+    
+    def _confirm_and_delete(self, ingredient_id: str, ingredient: Dict[str, str]):
+        ingredient_name = ingredient.get("Ingredient Name", "")
+        
+        # Confirm deletion
+        if self._confirm_delete(ingredient_name):
+            # Saved recipes using the ingredient keep it from being deleted; name them
+            def delete():
+                if self.data_handler.delete_ingredient_by_id(ingredient_id):
+                    return True, []
+                return False, self.data_handler.recipes_using_ingredient(ingredient_id)
+            self.worker.submit(
+                delete,
+                on_done=lambda result: self._on_ingredient_deleted(ingredient_name, *result)
+            )
+    
+    def _on_ingredient_deleted(self, ingredient_name: str, deleted: bool, users: List):
+        if deleted:
+            self._refresh_ingredients()
+            self._show_status(f"'{ingredient_name}' deleted successfully!", error=False)
+            if self.on_refresh_callback:
+                self.on_refresh_callback()
+        elif users:
+            names = ", ".join(recipe.name for recipe in users[:3]) + ("..." if len(users) > 3 else "")
+            self._show_status(f"'{ingredient_name}' is used by {len(users)} recipe(s): {names}", error=True)
+        else:
+            self._show_status("Error deleting ingredient", error=True)
     
     def _confirm_delete(self, ingredient_name: str) -> bool:
         """Show confirmation dialog for deletion"""
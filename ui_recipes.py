@@ -1,14 +1,37 @@
 import customtkinter as ctk
 from typing import Callable, List, Dict
 from data_handler import DataHandler
+from ui_table import VirtualTable
+from ui_search import SearchController
+from ui_worker import BackgroundWorker
+from records import Recipe
 import re
 
 class RecipesFrame(ctk.CTkFrame):
-    def __init__(self, master, data_handler: DataHandler, on_refresh_callback: Callable = None, **kwargs):
+    # Sort menu choice -> (column, descending) for DataHandler.query_recipes
+    SORT_OPTIONS = {
+        "Table order": (None, False),
+        "Best match": (DataHandler.BEST_MATCH, False),
+        "Name (A-Z)": ("Recipe Name", False),
+        "Total Cost (low-high)": ("Total Cost", False),
+        "Total Cost (high-low)": ("Total Cost", True),
+        "Profit (low-high)": ("Profit", False),
+        "Profit (high-low)": ("Profit", True)
+    }
+    
+    def __init__(self, master, data_handler: DataHandler, on_refresh_callback: Callable = None,
+                 worker: BackgroundWorker = None, **kwargs):
         super().__init__(master, **kwargs)
         self.data_handler = data_handler
         self.on_refresh_callback = on_refresh_callback
+        # Runs the data handler calls so the window never waits on storage
+        self.worker = worker if worker is not None else BackgroundWorker(self)
+        # Recipes on screen and the number matching the search
         self.current_recipes = []
+        self.total_matches = 0
+        # Search and (column, descending) order of the table, read by fetches on the worker
+        self.query = ""
+        self.sort = next(iter(self.SORT_OPTIONS.values()))
         
         # Configure grid weights
         self.grid_columnconfigure(0, weight=1)
@@ -39,21 +62,36 @@ class RecipesFrame(ctk.CTkFrame):
             placeholder_text="Search by recipe name...",
             width=300
         )
-        self.search_entry.bind("<KeyRelease>", self._on_search)
-        
-        # Recipes table frame
-        self.table_frame = ctk.CTkFrame(self.card, fg_color="transparent")
-        
-        # Table headers
-        self.headers_frame = ctk.CTkFrame(self.table_frame, fg_color="#3d3d3d")
-        self._create_table_headers()
+        # Search once typing pauses rather than on every keystroke
+        self.search_controller = SearchController(self.search_entry, self._on_search)
+        self.sort_label = ctk.CTkLabel(self.search_frame, text="Sort:", text_color="#ffffff")
+        self.sort_menu = ctk.CTkOptionMenu(
+            self.search_frame,
+            values=list(self.SORT_OPTIONS),
+            command=self._on_sort_change,
+            fg_color="#3d3d3d",
+            button_color="#4cafef",
+            button_hover_color="#3d8bc0",
+            width=190
+        )
         
-        # Recipes scrollable frame
-        self.recipes_container = ctk.CTkScrollableFrame(
-            self.table_frame,
-            fg_color="transparent",
-            height=400
+        # Recipes table; only the rows on screen have widgets
+        self.table = VirtualTable(
+            self.card,
+            columns=[("Recipe Name", 200), ("Total Cost", 120), ("Selling Price", 120), ("Profit", 120),
+                     ("Ingredients", 300)],
+            fetch=self._fetch_recipes,
+            format_row=self._recipe_values,
+            actions=[
+                ("View Details", "#4cafef", "#3d8bc0", self._view_recipe_details_by_recipe),
+                ("Delete", "#ff6b6b", "#e55555", self._confirm_delete_dialog)
+            ],
+            on_scroll=self._on_table_scroll,
+            actions_width=180,
+            height=400,
+            worker=self.worker
         )
+        self.count_label = ctk.CTkLabel(self.card, text="", text_color="#ffffff")
         
         # Status label
         self.status_label = ctk.CTkLabel(
@@ -63,25 +101,6 @@ class RecipesFrame(ctk.CTkFrame):
             font=ctk.CTkFont(size=14)
         )
     
-    def _create_table_headers(self):
-        """Create table header row"""
-        headers = ["Recipe Name", "Total Cost", "Selling Price", "Profit", "Ingredients", "Actions"]
-        widths = [200, 120, 120, 120, 300, 120]
-        
-        # Configure column weights for headers
-        for i in range(len(headers)):
-            self.headers_frame.grid_columnconfigure(i, weight=0, minsize=widths[i])
-        
-        for i, (header, width) in enumerate(zip(headers, widths)):
-            label = ctk.CTkLabel(
-                self.headers_frame,
-                text=header,
-                font=ctk.CTkFont(size=14, weight="bold"),
-                text_color="#ffffff",
-                width=width
-            )
-            label.grid(row=0, column=i, padx=5, pady=8, sticky="w")  # Reduced pady from 10 to 8
-    
     def _setup_layout(self):
         # Configure card grid
         self.card.grid_columnconfigure(0, weight=1)
@@ -94,35 +113,43 @@ class RecipesFrame(ctk.CTkFrame):
         self.search_frame.grid_columnconfigure(1, weight=1)
         self.search_label.grid(row=0, column=0, padx=(15, 8), pady=8)
         self.search_entry.grid(row=0, column=1, padx=(0, 15), pady=8, sticky="ew")
+        self.sort_label.grid(row=0, column=2, padx=(0, 8), pady=8)
+        self.sort_menu.grid(row=0, column=3, padx=(0, 15), pady=8)
         
         # Table section - reduced padding
-        self.table_frame.grid(row=2, column=0, pady=(0, 15), sticky="nsew", padx=15)
-        self.table_frame.grid_columnconfigure(0, weight=1)
-        
-        # Headers
-        self.headers_frame.grid(row=0, column=0, sticky="ew", padx=15)
-        
-        # Recipes container - reduced padding
-        self.recipes_container.grid(row=1, column=0, sticky="nsew", padx=15, pady=(8, 0))
+        self.table.grid(row=2, column=0, pady=(0, 8), sticky="nsew", padx=15)
+        self.count_label.grid(row=3, column=0, pady=(0, 8))
         
         # Status - reduced padding
-        self.status_label.grid(row=3, column=0, pady=(0, 15))
+        self.status_label.grid(row=4, column=0, pady=(0, 15))
     
     def _refresh_recipes(self):
-        """Refresh the recipes display"""
-        # Clear existing recipes
-        for widget in self.recipes_container.winfo_children():
-            widget.destroy()
-        
-        # Get recipes from data handler
-        self.current_recipes = self.data_handler.get_all_recipes()
-        
-        # Create recipe rows
-        for i, recipe in enumerate(self.current_recipes):
-            self._create_recipe_row(i, recipe)
+        """Refresh the recipes display, keeping the scroll position"""
+        self.table.refresh()
+    
+    def _fetch_recipes(self, offset: int, limit: int):
+        """Fetch a window of recipes matching the search, in the chosen order"""
+        sort_key, descending = self.sort
+        return self.data_handler.query_recipes(self.query, sort_key, offset, limit, descending)
+    
+    def _on_table_scroll(self, first: int, shown: int, total: int):
+        """Track the rows on screen and show where they are in the matches"""
+        self.current_recipes = self.table.visible_records()
+        self.total_matches = total
+        if total:
+            self.count_label.configure(text=f"Showing {first + 1}-{first + shown} of {total}")
+        else:
+            self.count_label.configure(text="No recipes")
+    
+    def _on_sort_change(self, choice: str):
+        """Re-sort from the top"""
+        self.sort = self.SORT_OPTIONS[choice]
+        self.table.refresh(reset=True)
     
     def _safe_currency(self, raw):
         """Try to format a raw value (string/number) as currency string like $12.34."""
+        if isinstance(raw, (int, float)):
+            return f"${raw:.2f}"
         try:
             return f"${float(str(raw).replace('$','').strip()):.2f}"
         except Exception:
@@ -141,100 +168,58 @@ class RecipesFrame(ctk.CTkFrame):
                 return v
         return ""
 
-    def _create_recipe_row(self, index: int, recipe: Dict[str, str]):
-        """Create a row for a recipe in the table"""
-        row_frame = ctk.CTkFrame(self.recipes_container, fg_color="#3d3d3d")
-        row_frame.grid(row=index, column=0, sticky="ew", pady=1)
+    def _recipe_values(self, recipe: Dict[str, str]) -> List[str]:
+        """Return the texts shown in a recipe's table row"""
+        if isinstance(recipe, Recipe):
+            # Records from the data handler are parsed once at load and use the canonical fields
+            total_cost_raw = recipe.total_cost
+            selling_price_raw = recipe.selling_price
+            profit_raw = recipe.profit
+            ingredients_raw = recipe.ingredients_used
+        else:
+            # Safely obtain values (handles variations in CSV headers / old files)
+            total_cost_raw = self._find_field(recipe, ["Total Cost", "Total Ingredient Cost", "Total"])
+            selling_price_raw = self._find_field(recipe, ["Suggested Selling Price", "Selling Price", "Suggested Price"])
+            profit_raw = self._find_field(recipe, ["Profit", "Net Profit"])
+            ingredients_raw = self._find_field(recipe, ["Ingredients Used", "Ingredients", "Ingredient List"])
 
-        # Configure column weights for consistent alignment with headers
-        widths = [200, 120, 120, 120, 300, 120]
-        for i in range(len(widths)):
-            row_frame.grid_columnconfigure(i, weight=0, minsize=widths[i])
+            # If ingredients field looks like a numeric value (means columns/headers were shifted),
+            # try to recover a text-like field from the record
+            if ingredients_raw and re.match(r'^\$?\s*[\d\.,]+$', str(ingredients_raw).strip()):
+                # search for any value that contains letters or commas (likely ingredient list)
+                for v in recipe.values():
+                    if v and any(ch.isalpha() for ch in str(v)):
+                        if not re.match(r'^\$?\s*[\d\.,]+$', str(v).strip()):
+                            ingredients_raw = v
+                            break
 
-        # Safely obtain values (handles variations in CSV headers / old files)
-        total_cost_raw = self._find_field(recipe, ["Total Cost", "Total Ingredient Cost", "Total"])
-        selling_price_raw = self._find_field(recipe, ["Suggested Selling Price", "Selling Price", "Suggested Price"])
-        profit_raw = self._find_field(recipe, ["Profit", "Net Profit"])
-        ingredients_raw = self._find_field(recipe, ["Ingredients Used", "Ingredients", "Ingredient List"])
-
-        # If ingredients field looks like a numeric value (means columns/headers were shifted),
-        # try to recover a text-like field from the record
-        if ingredients_raw and re.match(r'^\$?\s*[\d\.,]+$', str(ingredients_raw).strip()):
-            # search for any value that contains letters or commas (likely ingredient list)
-            for v in recipe.values():
-                if v and any(ch.isalpha() for ch in str(v)):
-                    if not re.match(r'^\$?\s*[\d\.,]+$', str(v).strip()):
-                        ingredients_raw = v
-                        break
-
-        labels = [
+        return [
             recipe.get("Recipe Name", ""),
             self._safe_currency(total_cost_raw) if total_cost_raw else "$0.00",
             self._safe_currency(selling_price_raw) if selling_price_raw else "$0.00",
             self._safe_currency(profit_raw) if profit_raw else "$0.00",
             ingredients_raw or ""
         ]
-
-        for i, (label, width) in enumerate(zip(labels, widths[:-1])):  # Exclude Actions column
-            label_widget = ctk.CTkLabel(
-                row_frame,
-                text=label,
-                text_color="#ffffff",
-                width=width
-            )
-            label_widget.grid(row=0, column=i, padx=5, pady=6, sticky="w")
-
-        # Action buttons
-        actions_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
-        actions_frame.grid(row=0, column=5, padx=5, pady=4)
-
-        view_btn = ctk.CTkButton(
-            actions_frame,
-            text="View Details",
-            command=lambda r=recipe: self._view_recipe_details_by_recipe(r),
-            fg_color="#4cafef",
-            hover_color="#3d8bc0",
-            width=80,
-            height=28,
-            font=ctk.CTkFont(size=12)
-        )
-        view_btn.pack(side="left", padx=2)
-
-        delete_btn = ctk.CTkButton(
-            actions_frame,
-            text="Delete",
-            command=lambda r=recipe: self._confirm_delete_dialog(r),
-            fg_color="#ff6b6b",
-            hover_color="#e55555",
-            width=70,
-            height=28,
-            font=ctk.CTkFont(size=12)
-        )
-        delete_btn.pack(side="left", padx=2)
     
-    def _on_search(self, event=None):
-        """Handle search input changes"""
-        query = self.search_entry.get().strip()
-        filtered_recipes = self.data_handler.search_recipes(query)
-        
-        # Clear existing recipes
-        for widget in self.recipes_container.winfo_children():
-            widget.destroy()
-        
-        # Display filtered recipes
-        self.current_recipes = filtered_recipes
-        for i, recipe in enumerate(filtered_recipes):
-            self._create_recipe_row(i, recipe)
+    def _on_search(self, query: str = ""):
+        """Handle a change of the search query"""
+        # Show the matches from the top
+        self.query = query
+        self.table.refresh(reset=True)
     
     def _view_recipe_details(self, index: int):
         """View detailed costing information for a recipe"""
         if 0 <= index < len(self.current_recipes):
             recipe = self.current_recipes[index]
-            self._show_recipe_details_dialog(recipe)
+            self._view_recipe_details_by_recipe(recipe)
     
     def _view_recipe_details_by_recipe(self, recipe: Dict[str, str]):
         """View details when recipe object is known"""
-        self._show_recipe_details_dialog(recipe)
+        # Look up the ingredients on the worker, then open the dialog
+        self.worker.submit(
+            self._ingredients_text, recipe,
+            on_done=lambda ingredients_text: self._show_recipe_details_dialog(recipe, ingredients_text)
+        )
     
     def _confirm_delete_dialog(self, recipe: Dict[str, str]):
         """Show confirmation dialog before deleting a recipe"""
@@ -282,25 +267,43 @@ class RecipesFrame(ctk.CTkFrame):
         if not name:
             self.status_label.configure(text="Invalid recipe selected")
             return
-        try:
-            deleted = False
-            if hasattr(self.data_handler, "delete_recipe"):
-                # DataHandler.delete_recipe(recipe_name) -> bool
-                deleted = self.data_handler.delete_recipe(name)
-            else:
-                # Fallback: remove from current_recipes and attempt to persist via on_refresh_callback
-                self.current_recipes = [r for r in self.current_recipes if r.get("Recipe Name") != name]
-                deleted = True
-
-            if not deleted:
-                self.status_label.configure(text="Recipe not found or could not be deleted")
-                return
-        except Exception as e:
+        recipe_id = recipe.get("ID")
+        if recipe_id and hasattr(self.data_handler, "delete_recipe_by_id"):
+            # Delete exactly this row, even if other recipes share its name
+            delete, key = self.data_handler.delete_recipe_by_id, recipe_id
+        elif hasattr(self.data_handler, "delete_recipe"):
+            # DataHandler.delete_recipe(recipe_name) -> bool
+            delete, key = self.data_handler.delete_recipe, name
+        else:
+            # Fallback: remove from current_recipes and attempt to persist via on_refresh_callback
+            self.current_recipes = [r for r in self.current_recipes if r.get("Recipe Name") != name]
+            self._on_recipe_deleted(True)
+            return
+        
+        # Recipes using this one as a sub-recipe keep it from being deleted; name them
+        def delete_recipe():
+            if delete(key):
+                return True, []
+            if recipe_id and hasattr(self.data_handler, "recipes_using_recipe"):
+                return False, self.data_handler.recipes_using_recipe(recipe_id)
+            return False, []
+        self.worker.submit(
+            delete_recipe,
+            on_done=lambda result: self._on_recipe_deleted(*result),
             # Report error in status label
-            self.status_label.configure(text=f"Error deleting recipe: {e}")
+            on_error=lambda e: self.status_label.configure(text=f"Error deleting recipe: {e}")
+        )
+    
+    def _on_recipe_deleted(self, deleted: bool, users: List = ()):
+        if users:
+            names = ", ".join(recipe.name for recipe in users[:3]) + ("..." if len(users) > 3 else "")
+            self.status_label.configure(text=f"Recipe is used by {len(users)} other recipe(s): {names}")
             return
-
-        # Refresh UI and notify parent
+        if not deleted:
+            self.status_label.configure(text="Recipe not found or could not be deleted")
+            return
+        
+        # Rebind the rows on screen without the deleted recipe; then notify parent
         self._refresh_recipes()
         if self.on_refresh_callback:
             try:
@@ -308,7 +311,7 @@ class RecipesFrame(ctk.CTkFrame):
             except Exception:
                 pass
     
-    def _show_recipe_details_dialog(self, recipe: Dict[str, str]):
+    def _show_recipe_details_dialog(self, recipe: Dict[str, str], ingredients_text: str = None):
         """Show detailed recipe costing dialog"""
         # Create details dialog
         dialog = ctk.CTkToplevel(self)
@@ -524,7 +527,7 @@ class RecipesFrame(ctk.CTkFrame):
         
         ingredients_text = ctk.CTkLabel(
             ingredients_frame,
-            text=recipe.get("Ingredients Used", "No ingredients listed"),
+            text=ingredients_text if ingredients_text is not None else self._ingredients_text(recipe),
             font=ctk.CTkFont(size=14),
             text_color="#cccccc",
             wraplength=500
@@ -543,6 +546,27 @@ class RecipesFrame(ctk.CTkFrame):
         )
         close_button.pack(pady=(0, 20))
     
+    def _ingredients_text(self, recipe: Dict[str, str]) -> str:
+        """List a recipe's ingredients with their grams, and its sub-recipes, from its
+        recipe lines, falling back to the stored Ingredients Used text"""
+        lines = self.data_handler.get_recipe_lines(recipe["ID"]) if recipe.get("ID") else []
+        parts = []
+        for line in lines:
+            if line.sub_recipe_id is not None:
+                sub_recipe = self.data_handler.get_recipe(line.sub_recipe_id)
+                if sub_recipe is not None:
+                    quantity = line.quantity if isinstance(line.quantity, float) else 1.0
+                    parts.append(f"{sub_recipe.name} (sub-recipe x{quantity:g})")
+                continue
+            ingredient = self.data_handler.get_ingredient(line.ingredient_id)
+            if ingredient is None:
+                continue
+            grams_text = f" ({line.grams:.0f} g)" if isinstance(line.grams, float) else ""
+            parts.append(f"{ingredient.name}{grams_text}")
+        if parts:
+            return ", ".join(parts)
+        return recipe.get("Ingredients Used", "") or "No ingredients listed"
+    
     def refresh_display(self):
         """Public method to refresh the display"""
         self._refresh_recipes()
\ No newline at end of file
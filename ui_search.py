@@ -0,0 +1,78 @@
+from typing import Callable, List, Optional
+
+class SearchController:
+    """Debounces a search entry so a burst of typing runs one search.
+    
+    Each keystroke restarts a short timer and only the query left when it fires
+    is searched; the pending search is cancelled whenever a newer one replaces it.
+    Keys that don't change the text, like arrows or Shift, don't search at all."""
+    
+    DELAY_MS = 250
+    
+    def __init__(self, entry, on_search: Callable[[str], None], delay_ms: int = DELAY_MS):
+        self.entry = entry
+        self.on_search = on_search
+        self.delay_ms = delay_ms
+        # Query last searched, and the id of the timer for the next search
+        self.last_query: Optional[str] = None
+        self._pending = None
+        entry.bind("<KeyRelease>", self._on_key)
+    
+    def _on_key(self, event=None):
+        """Schedule a search for the entry's text, replacing any scheduled one"""
+        query = self.entry.get().strip()
+        if query == self.last_query and self._pending is None:
+            return
+        self.cancel()
+        self._pending = self.entry.after(self.delay_ms, self._run)
+    
+    def _run(self):
+        self._pending = None
+        query = self.entry.get().strip()
+        if query == self.last_query:
+            return
+        self.last_query = query
+        self.on_search(query)
+    
+    def cancel(self):
+        """Drop the scheduled search, if any"""
+        if self._pending is not None:
+            self.entry.after_cancel(self._pending)
+            self._pending = None
+    
+    def flush(self):
+        """Run a scheduled search now, e.g. when Enter is pressed"""
+        if self._pending is not None:
+            self.cancel()
+            self._run()
+    
+    def reset(self):
+        """Forget the last query so the next keystroke searches even if the text is unchanged"""
+        self.last_query = None
+
+
+class IncrementalFilter:
+    """Filters a list by a case-insensitive substring of each item's name.
+    
+    A query that extends the previous one (e.g. "choc" -> "chocolate") can only
+    match a subset of its results, so it narrows those instead of rescanning
+    the whole list."""
+    
+    def __init__(self, name: Callable[[object], str]):
+        self.name = name
+        # The list, query and matches of the last filter
+        self._items: Optional[List] = None
+        self._query: Optional[str] = None
+        self._matches: List = []
+    
+    def filter(self, items: List, query: str) -> List:
+        """Return the items whose name contains query; all of them for a blank query"""
+        query = query.strip().lower()
+        if not query:
+            matches = items
+        elif items is self._items and self._query is not None and self._query in query:
+            matches = [item for item in self._matches if query in self.name(item).lower()]
+        else:
+            matches = [item for item in items if query in self.name(item).lower()]
+        self._items, self._query, self._matches = items, query, matches
+        return matches
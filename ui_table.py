@@ -0,0 +1,216 @@
+import customtkinter as ctk
+from typing import Callable, List, Optional, Sequence, Tuple
+
+class VirtualTable(ctk.CTkFrame):
+    """Scrollable table that only builds widgets for the rows on screen.
+    
+    Records are fetched a window at a time through fetch(offset, limit), which
+    returns (records, total) like DataHandler.query_ingredients. A pool of row
+    widgets, as many as fit in the view, is rebound to other records as the
+    table scrolls instead of creating a widget per record. Given a worker, windows
+    are fetched on it and the rows on screen stay until the new window arrives."""
+    
+    ROW_HEIGHT = 40
+    # Extra records fetched on each side of the view, so small scrolls don't query again
+    PREFETCH = 50
+    
+    def __init__(self, master, columns: Sequence[Tuple[str, int]],
+                 fetch: Callable[[int, int], Tuple[List, int]],
+                 format_row: Callable[[object], List[str]],
+                 actions: Sequence[Tuple[str, str, str, Callable]] = (),
+                 on_scroll: Callable[[int, int, int], None] = None,
+                 actions_width: int = 120, height: int = 300, worker=None, **kwargs):
+        """columns are (header, width) pairs and format_row turns a record into one
+        text per column. actions are (text, color, hover color, callback) buttons
+        shown on each row; the callback gets the row's record. on_scroll is called
+        with (first row shown, rows shown, total) whenever the view changes. worker
+        is a BackgroundWorker to fetch on instead of the Tk thread."""
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(master, **kwargs)
+        self.fetch = fetch
+        self.format_row = format_row
+        self.actions = list(actions)
+        self.on_scroll = on_scroll
+        self.worker = worker
+        self.widths = [width for _, width in columns]
+        if self.actions:
+            self.widths.append(actions_width)
+        
+        # Index of the first record shown, number of records and the rows that fit
+        self.first = 0
+        self.total = 0
+        self.visible_count = max(1, height // self.ROW_HEIGHT)
+        # Records fetched around the view and the position of the first of them
+        self._window: Optional[List] = None
+        self._window_offset = 0
+        # Pool of row widgets: (frame, labels, buttons), rebound on every render
+        self._rows = []
+        self._shown_records: List = []
+        
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        
+        # Table headers
+        self.headers_frame = ctk.CTkFrame(self, fg_color="#3d3d3d")
+        self.headers_frame.grid(row=0, column=0, columnspan=2, sticky="ew", padx=15)
+        headers = [header for header, _ in columns] + (["Actions"] if self.actions else [])
+        for i, (header, width) in enumerate(zip(headers, self.widths)):
+            self.headers_frame.grid_columnconfigure(i, weight=0, minsize=width)
+            label = ctk.CTkLabel(
+                self.headers_frame,
+                text=header,
+                font=ctk.CTkFont(size=14, weight="bold"),
+                text_color="#ffffff",
+                width=width
+            )
+            label.grid(row=0, column=i, padx=5, pady=8, sticky="w")
+        
+        # Rows are placed by pixel offset inside a body of fixed height
+        self.body = ctk.CTkFrame(self, fg_color="transparent", height=height)
+        self.body.grid(row=1, column=0, sticky="nsew", padx=(15, 0), pady=(8, 0))
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.body)
+        
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns", padx=(0, 15), pady=(8, 0))
+    
+    # ===== DATA =====
+    
+    def refresh(self, reset: bool = False):
+        """Fetch the records again, e.g. after a change; reset scrolls back to the top"""
+        self._window = None
+        if reset:
+            self.first = 0
+        self._render()
+    
+    def visible_records(self) -> List:
+        """Return the records currently on screen"""
+        return list(self._shown_records)
+    
+    def _records(self, first: int, count: int) -> Optional[List]:
+        """Return count records from position first, fetching a window around them if
+        needed; None while the window is fetched on the worker"""
+        window = self._window
+        window_end = self._window_offset + len(window) if window is not None else 0
+        if (window is None or first < self._window_offset
+                or (first + count > window_end and window_end < self.total)):
+            offset = max(0, first - self.PREFETCH)
+            limit = count + 2 * self.PREFETCH
+            if self.worker is not None:
+                # A newer fetch of this table supersedes any still running
+                self.worker.submit(self.fetch, offset, limit, key=self,
+                                   on_done=lambda result: self._on_fetched(offset, *result))
+                return None
+            window, self.total = self.fetch(offset, limit)
+            self._window, self._window_offset = window, offset
+            if first >= self.total > 0:
+                # Rows were removed since; go back to the last screenful
+                first = self.first = max(0, self.total - self.visible_count)
+                return self._records(first, count)
+        start = first - self._window_offset
+        return window[start:start + count]
+    
+    def _on_fetched(self, offset: int, window: List, total: int):
+        """Show a window fetched on the worker"""
+        self._window, self._window_offset, self.total = window, offset, total
+        self._render()
+    
+    # ===== RENDERING =====
+    
+    def _render(self):
+        """Rebind the row widgets to the records in view"""
+        self.first = max(0, min(self.first, self.total - self.visible_count))
+        records = self._records(self.first, self.visible_count)
+        if records is None:
+            return
+        while len(self._rows) < len(records):
+            self._rows.append(self._create_row())
+        
+        for i, row in enumerate(self._rows):
+            frame, labels, buttons = row
+            if i >= len(records):
+                frame.place_forget()
+                continue
+            record = records[i]
+            for label, text in zip(labels, self.format_row(record)):
+                label.configure(text=text)
+            for button, (_, _, _, callback) in zip(buttons, self.actions):
+                button.configure(command=lambda record=record, callback=callback: callback(record))
+            frame.place(x=0, y=i * self.ROW_HEIGHT, relwidth=1.0)
+        self._shown_records = records
+        
+        if self.total:
+            self.scrollbar.set(self.first / self.total, min(1.0, (self.first + len(records)) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        if self.on_scroll:
+            self.on_scroll(self.first, len(records), self.total)
+    
+    def _create_row(self):
+        """Create one reusable row widget with empty labels and action buttons"""
+        frame = ctk.CTkFrame(self.body, fg_color="#3d3d3d", height=self.ROW_HEIGHT - 2)
+        for i, width in enumerate(self.widths):
+            frame.grid_columnconfigure(i, weight=0, minsize=width)
+        self._bind_wheel(frame)
+        
+        columns = len(self.widths) - (1 if self.actions else 0)
+        labels = []
+        for i, width in enumerate(self.widths[:columns]):
+            label = ctk.CTkLabel(frame, text="", text_color="#ffffff", width=width, anchor="w")
+            label.grid(row=0, column=i, padx=5, pady=6, sticky="w")
+            self._bind_wheel(label)
+            labels.append(label)
+        
+        buttons = []
+        if self.actions:
+            actions_frame = ctk.CTkFrame(frame, fg_color="transparent")
+            actions_frame.grid(row=0, column=columns, padx=5, pady=4)
+            for text, color, hover_color, _ in self.actions:
+                button = ctk.CTkButton(
+                    actions_frame,
+                    text=text,
+                    fg_color=color,
+                    hover_color=hover_color,
+                    width=max(50, 8 * len(text)),
+                    height=28,
+                    font=ctk.CTkFont(size=12)
+                )
+                button.pack(side="left", padx=2)
+                buttons.append(button)
+        return frame, labels, buttons
+    
+    # ===== SCROLLING =====
+    
+    def scroll_to(self, first: int):
+        """Show the records starting at position first"""
+        first = max(0, min(first, self.total - self.visible_count))
+        if first != self.first:
+            self.first = first
+            self._render()
+    
+    def _on_scrollbar(self, action: str, amount, unit: str = "units"):
+        """Handle the scrollbar's moveto/scroll commands"""
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total))
+        elif action == "scroll":
+            step = self.visible_count if unit == "pages" else 1
+            self.scroll_to(self.first + int(amount) * step)
+    
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.first - 3)
+        else:
+            self.scroll_to(self.first + 3)
+    
+    def _bind_wheel(self, widget):
+        """Scroll the table with the mouse wheel over any of its widgets"""
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", self._on_wheel)
+        widget.bind("<Button-5>", self._on_wheel)
+    
+    def _on_resize(self, event):
+        """Fit the number of rows to the body's new height"""
+        visible_count = max(1, event.height // self.ROW_HEIGHT)
+        if visible_count != self.visible_count:
+            self.visible_count = visible_count
+            self._render()
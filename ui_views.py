@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set
+import customtkinter as ctk
+
+class ViewManager:
+    """Builds each view of the main window once and reuses it on later visits.
+    
+    Views are registered with a factory and built the first time they're shown.
+    Showing a view again only calls its refresh_display() method, if it has one,
+    instead of rebuilding its widgets. Views not kept for good are destroyed when
+    more than max_views are built, least recently shown first, or when they have
+    sat unused for longer than evict_idle() allows."""
+    
+    def __init__(self, max_views: int = 4):
+        self.max_views = max_views
+        # View name -> factory building its frame, and the names never evicted
+        self._factories: Dict[str, Callable[[], ctk.CTkFrame]] = {}
+        self._kept: Set[str] = set()
+        # Built views, least recently shown first, and when each was last shown
+        self._views: "OrderedDict[str, ctk.CTkFrame]" = OrderedDict()
+        self._shown_at: Dict[str, float] = {}
+        self.current: Optional[str] = None
+    
+    def register(self, name: str, factory: Callable[[], ctk.CTkFrame], keep: bool = False):
+        """Register a view; keep views that are cheap to hold or costly to lose"""
+        self._factories[name] = factory
+        if keep:
+            self._kept.add(name)
+    
+    def show(self, name: str) -> ctk.CTkFrame:
+        """Show a view in the container, building it if needed, and hide the current one"""
+        if self.current is not None and self.current != name:
+            self._views[self.current].grid_remove()
+        
+        frame = self._views.get(name)
+        if frame is None:
+            frame = self._factories[name]()
+            self._views[name] = frame
+        else:
+            refresh = getattr(frame, "refresh_display", None)
+            if refresh is not None:
+                refresh()
+        self._views.move_to_end(name)
+        self._shown_at[name] = time.monotonic()
+        frame.grid(row=0, column=0, sticky="nsew")
+        self.current = name
+        
+        self._evict(lambda view: len(self._views) > self.max_views)
+        return frame
+    
+    def get(self, name: str) -> Optional[ctk.CTkFrame]:
+        """Return a view if it is built, without showing it"""
+        return self._views.get(name)
+    
+    def evict_idle(self, max_idle_seconds: float):
+        """Destroy the views not shown for longer than max_idle_seconds"""
+        now = time.monotonic()
+        self._evict(lambda view: now - self._shown_at[view] > max_idle_seconds)
+    
+    def _evict(self, should_evict: Callable[[str], bool]):
+        """Destroy evictable views, least recently shown first, while should_evict says so"""
+        for view in list(self._views):
+            if view == self.current or view in self._kept:
+                continue
+            if not should_evict(view):
+                break
+            self._views.pop(view).destroy()
+            del self._shown_at[view]
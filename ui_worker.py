@@ -0,0 +1,100 @@
+import itertools
+import queue
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+class BackgroundWorker:
+    """Runs slow calls, like DataHandler loads, saves and searches, off the Tk thread.
+    
+    Calls are queued to one worker thread, so they run one at a time and in order.
+    Their results come back through a queue that the Tk thread drains with after(),
+    and on_done or on_error is then called on the Tk thread, where widgets can be
+    touched. A call submitted with a key supersedes the earlier calls with the same
+    key: those are skipped if they haven't started, and their results are dropped."""
+    
+    POLL_MS = 20
+    
+    def __init__(self, widget, on_busy: Optional[Callable[[bool], None]] = None):
+        """widget is any widget, used to schedule the draining of results. on_busy is
+        called with True when calls start pending and False once all are done."""
+        self.widget = widget
+        self.on_busy = on_busy
+        self._requests: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._tickets = itertools.count(1)
+        # Key -> ticket of the newest call submitted with it
+        self._latest: Dict[Hashable, int] = {}
+        self._pending = 0
+        self._thread = threading.Thread(target=self._run, name="data-worker", daemon=True)
+        self._thread.start()
+    
+    def submit(self, function: Callable, *args, on_done: Optional[Callable] = None,
+               on_error: Optional[Callable[[Exception], None]] = None,
+               key: Optional[Hashable] = None) -> int:
+        """Queue function(*args) and return its ticket; on_done gets its result"""
+        ticket = next(self._tickets)
+        if key is not None:
+            self._latest[key] = ticket
+        self._requests.put((ticket, key, function, args, on_done, on_error))
+        self._pending += 1
+        if self._pending == 1:
+            if self.on_busy:
+                self.on_busy(True)
+            self.widget.after(self.POLL_MS, self._drain)
+        return ticket
+    
+    def busy(self) -> bool:
+        """Return True while submitted calls haven't all been handled"""
+        return self._pending > 0
+    
+    def stop(self):
+        """Let the worker thread finish the queued calls and exit"""
+        self._requests.put(None)
+    
+    def _is_stale(self, ticket: int, key: Optional[Hashable]) -> bool:
+        return key is not None and self._latest.get(key) != ticket
+    
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            ticket, key, function, args, on_done, on_error = request
+            if self._is_stale(ticket, key):
+                # Superseded before it started
+                self._results.put((ticket, key, None, None, None, None))
+                continue
+            try:
+                result, error = function(*args), None
+            except Exception as e:
+                result, error = None, e
+            self._results.put((ticket, key, result, error, on_done, on_error))
+    
+    def _drain(self):
+        """Hand finished results to their callbacks on the Tk thread"""
+        while True:
+            try:
+                ticket, key, result, error, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if self._is_stale(ticket, key):
+                continue
+            if key is not None:
+                del self._latest[key]
+            try:
+                if error is not None:
+                    if on_error:
+                        on_error(error)
+                    else:
+                        print(f"Error in background task: {error}")
+                elif on_done:
+                    on_done(result)
+            except Exception as e:
+                # e.g. the widget waiting for the result was destroyed meanwhile
+                print(f"Error handling background result: {e}")
+        
+        if self._pending:
+            self.widget.after(self.POLL_MS, self._drain)
+        elif self.on_busy:
+            self.on_busy(False)